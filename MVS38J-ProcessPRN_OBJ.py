@@ -45,11 +45,15 @@
 #and data areas from the object file.
 
 #The 3 data structures (source_code_dict, symdict, and instrdata)
-#are pickeled and written out to the current working directory
-#for later use by S370BALEmulator.py (the S/370 BAL Emulator).
+#and the END card entry address are written out to the program image
+#file program.img (see S370Image.py)
+#in the current working directory for later use by S370BALEmulator.py
+#(the S/370 BAL Emulator).
 
 import sys
-import pickle
+
+from S370Image import IMAGE_FILENAME, write_image
+from S370ObjLoader import load_object_file
 
 fname = sys.argv[1]
 
@@ -96,73 +100,24 @@ prnfile.close()
 print(symdict)
 print(' ')
 
-pickle.dump( symdict, open( "symdict.p", "wb" ) )
-#symdict = pickle.load( open( "symdict.p", "rb" ) )
-
 print(source_code_dict)
 print(' ')
 
-pickle.dump( source_code_dict, open( "sourcecode.p", "wb" ) )
-#source_code_dict = pickle.load( open( "sourcecode.p", "rb" ) )
-
-#read in the OBJ code file
-objfile = open('C:\\MyPython\\' + fname + '.OBJ','rb')
-objbytes = objfile.read()
-objfile.close()
-
-#convert each byte in the obj code file to a 2 char hex string representation 
-objstr = ''.join([hex(b).split('0x')[1].zfill(2).upper() for b in objbytes])
-
-#split on '.TXT '
-TXTlist = objstr.split('02E3E7E340')
-
-#build the instruction/data array from the TXT records
-address_int_prev = -1
-txtlen_prev = 1
-instrdata = []
-
-for txt in TXTlist[1:]:
-    address = '0x' + txt[0:6]
-    address_int = eval('int(' + address + ')')
-    txtlen = eval('int(0x' + txt[10:14] + ')')
-    
-    # pad instrdata where alignment on double, full, or half 
-    # word boundary pushes address higher
-    delta = address_int - (address_int_prev + txtlen_prev)
-    if delta > 0:      
-        for i in range(0,delta):
-            instrdata.append('00')
-
-    print(address + ':  ', end="")
-    i = 0
-    for t in range(22,txtlen*2+22,2):
-        print(txt[t] + txt[t+1] + ' ', end="")
-        # this code handles an ORG as used when building a lookup table
-        if address_int > address_int_prev:
-            instrdata.append(txt[t] + txt[t+1])
-        else:
-            instrdata[address_int + i] = txt[t] + txt[t+1]
-            i = i + 1
-    print(' ')
-    address_int_prev = address_int
-    txtlen_prev = txtlen
-    
-print(' ')
+#load the TXT records of the OBJ code file into storage and apply its RLD relocation
+instrdata, symbols, entry = load_object_file('C:\\MyPython\\' + fname + '.OBJ')
 
 # print out the instrdata following load & cleanup
-i = 0
-print('0x' + hex(i)[2:].zfill(6).upper() + ': ', end="")
-
-for b in instrdata:
-    print(b + ' ', end="")
-    i = i + 1
-    if i % 16 == 0:
-        print(' ')
-        print('0x' + hex(i)[2:].zfill(6).upper() + ': ', end="")
-        
+for i in range(0, len(instrdata), 16):
+    print('0x' + '%06X' % i + ': ' + ' '.join('%02X' % b for b in instrdata[i:i+16]) + ' ')
+
+print(' ')
+
+#execution starts at the END card entry address - 0 when the END card has none
+if entry is None:
+    entry = 0
+print('Entry address: ' + '%06X' % entry)
 print(' ')
 
-pickle.dump( instrdata, open( "instrdata.p", "wb" ) )  
-#instrdata = pickle.load( open( "instrdata.p", "rb" ) )
+write_image(IMAGE_FILENAME, instrdata, source_code_dict, symdict, entry)
  
 exit()
\ No newline at end of file
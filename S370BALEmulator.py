@@ -18,2787 +18,3680 @@
 #
 
 import os
+import re
 import sys
+import struct
 import pickle
+import time
 import curses
+import bisect
 
-# output to file(works on Linux too)
-sys.stdout = open("OUTPUT.TXT", 'w')
+from S370Image import IMAGE_FILENAME, read_image
+from S370ObjLoader import load_object_file
+from S370Decimal import (DecimalException, DATA_EXCEPTION, FIXED_POINT_DIVIDE_EXCEPTION, SIGNS, add_packed, zero_and_add_packed,
+                         compare_packed, multiply_packed, divide_packed, shift_packed, convert_to_binary,
+                         convert_to_decimal, pack, unpack)
 
 
+# Here is a sample program to emulate / debug: 
+#
+# source_code_dict = {'000000': '         BALR  R12,0', 
+#                     '000002': '         LA    R3,AREA1', 
+#                     '000006': '         LA    R4,4', 
+#                     '00000A': "LOOP     MVI   0(R3),C'0'", 
+#                     '00000E': '         LA    R3,1(R3)', 
+#                     '000012': '         BCT   R4,LOOP', 
+#                     '000016': '         LA    R15,0', 
+#                     '00001A': '         BR    R14'}
+#
+# symbol_dict = {'AREA1   ': ('0000001C', '00000004')}
+#
+# instrdata_list (unpickled from instrdata.p and loaded into the storage bytearray) =
+# 000000 ['05', 'C0',             |          BALR  R12,0 
+# 000002                          |          USING *,R12
+# 000002  '41', '30', 'C0', '1A', |          LA    R3,AREA1
+# 000006  '41', '40', '00', '04', |          LA    R4,4
+# 00000A  '92', 'F0', '30', '00', | LOOP     MVI   0(R3),C'0'
+# 00000E  '41', '33', '00', '01', |          LA    R3,1(R3)
+# 000012  '46', '40', 'C0', '08', |          BCT   R4,LOOP
+# 000016  '41', 'F0', '00', '00', |          LA    R15,0
+# 00001A  '07', 'FE',             |          BR    R14
+# 00001C  'FF', 'FF', 'FF', 'FF'] | AREA1    DC    XL4'FFFFFFFF'
+#
+# The 3 data structures: source_code_dict, symbol_dict and instrdata_list
+# are created in Z390-ProcessPRN_OBJ.py or MVS38J-ProcessPRN_OBJ.py.
+# They are created from the TXT object deck and its assembler listing PRN file 
+# produced from the Z390 Portable Mainframe Assembler and Emulator 
+# (Copyright 2011-13 Automated Software Tools Corporation) or the MVS 3.8J assembler.
+#
+# Notes:
+#
+# main storage is a bytearray - one element per byte of storage - accessed
+# through the big-endian halfword / fullword / doubleword accessors below
+#
+# the 16 general registers always hold unsigned 32 bit integers (0 - 0xFFFFFFFF)
+# a signed view of a register is derived with signed32() when an instruction needs one
+# and hex formatting is only done when a register is displayed or traced
+#
+# the emulator is the Machine class below - importing this module has no side effects.
+# Run as a script it loads the 3 pickles from the current directory and writes the
+# program output to OUTPUT.TXT:
+#
+#   machine = Machine(out=open('OUTPUT.TXT', 'w'))
+#   machine.load_directory()
+#   machine.run()
+#
+# a program is loaded from the program image file (program.img - see S370Image.py)
+# written by the pre-processors, or from the 3 pickles if there is no image file.
+# An object deck (.OBJ) can also be run directly - see S370ObjLoader.py
+
+#
+# 31 bit signed integers represented as follows:
+# 80 00 00 00 (-2,147,483,648) ---> 00 00 00 00 (zero) ---> 7F FF FF FF (+2,147,483,647)
+# negative numbers are represented in two's complement form
+# if the sum/difference/product > ABS(2,147,483,647) then overflow
+#
+
+
+# Important:
+#R14 is set initially to 0x0EEEEE' (978,670 dec) as the return address. 
+#If you plan to use R14, then you must save R14 and restore it before a 
+#'BR     14' is performed to exit this program and return control to the OS 
+
+
+ASC2EBC = ['00', '01', '02', '03', '1A', '09', '1A', '7F', '1A', '1A', '1A', '0B', '0C', '0D', '0E', '0F',    # 00 - 0F
+           '10', '11', '12', '13', '3C', '3D', '32', '26', '18', '19', '3F', '27', '1C', '1D', '1E', '1F',    # 10 - 1F
+           '40', '4F', '7F', '7B', '5B', '6C', '50', '7D', '4D', '5D', '5C', '4E', '6B', '60', '4B', '61',    # 20 - 2F
+           'F0', 'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', '7A', '5E', '4C', '7E', '6E', '6F',    # 30 - 3F
+           '7C', 'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9', 'D1', 'D2', 'D3', 'D4', 'D5', 'D6',    # 40 - 4F
+           'D7', 'D8', 'D9', 'E2', 'E3', 'E4', 'E5', 'E6', 'E7', 'E8', 'E9', '4A', 'E0', '5A', '5F', '6D',    # 50 - 5F
+           '79', '81', '82', '83', '84', '85', '86', '87', '88', '89', '91', '92', '93', '94', '95', '96',    # 60 - 6F
+           '97', '98', '99', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'A9', 'C0', '6A', 'D0', 'A1', '07',    # 70 - 7F
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # 80 - 8F
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # 90 - 9F
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # A0 - AF
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # B0 - BF
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # C0 - CF
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # D0 - DF
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # E0 - EF
+           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F']    # F0 - FF
+
+EBC2ASC = ['00', '01', '02', '03', '1A', '09', '1A', '7F', '1A', '1A', '1A', '0B', '0C', '0D', '0E', '0F',    # 00 - 0F
+           '10', '11', '12', '13', '1A', '1A', '08', '1A', '18', '19', '1A', '1A', '1C', '1D', '1E', '1F',    # 10 - 1F
+           '1A', '1A', '1A', '1A', '1A', '0A', '17', '1B', '1A', '1A', '1A', '1A', '1A', '05', '06', '07',    # 20 - 2F
+           '1A', '1A', '16', '1A', '1A', '1A', '1A', '04', '1A', '1A', '1A', '1A', '14', '15', '1A', '1A',    # 30 - 3F
+           '20', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '5B', '2E', '3C', '28', '2B', '21',    # 40 - 4F
+           '26', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '5D', '24', '2A', '29', '3B', '5E',    # 50 - 5F
+           '2D', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '7C', '2C', '25', '5F', '3E', '3F',    # 60 - 6F
+           '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '60', '3A', '23', '40', '27', '3D', '22',    # 70 - 7F
+           '1A', '61', '62', '63', '64', '65', '66', '67', '68', '69', '1A', '1A', '1A', '1A', '1A', '1A',    # 80 - 8F
+           '1A', '6A', '6B', '6C', '6D', '6E', '6F', '70', '71', '72', '1A', '1A', '1A', '1A', '1A', '1A',    # 90 - 9F
+           '1A', '7E', '73', '74', '75', '76', '77', '78', '79', '7A', '1A', '1A', '1A', '1A', '1A', '1A',    # A0 - AF
+           '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A',    # B0 - BF
+           '7B', '41', '42', '43', '44', '45', '46', '47', '48', '49', '1A', '1A', '1A', '1A', '1A', '1A',    # C0 - CF
+           '7D', '4A', '4B', '4C', '4D', '4E', '4F', '50', '51', '52', '1A', '1A', '1A', '1A', '1A', '1A',    # D0 - DF
+           '5C', '1A', '53', '54', '55', '56', '57', '58', '59', '5A', '1A', '1A', '1A', '1A', '1A', '1A',    # E0 - EF
+           '30', '31', '32', '33', '34', '35', '36', '37', '38', '39', '1A', '1A', '1A', '1A', '1A', '1A']    # F0 - FF
+
+#256 byte translate tables built from the above for use with bytes.translate()
+ASC2EBC_TABLE = bytes.fromhex(''.join(ASC2EBC))
+EBC2ASC_TABLE = bytes.fromhex(''.join(EBC2ASC))
+
+
+# Main storage accessors
+# halfwords, fullwords and doublewords are held in storage in big-endian order
+HALFWORD = struct.Struct('>H')
+FULLWORD = struct.Struct('>I')
+DOUBLEWORD = struct.Struct('>Q')
+SIGNED_HALFWORD = struct.Struct('>h')
+SIGNED_FULLWORD = struct.Struct('>i')
+
+
+#Two's complement conversion layer for fullword (32 bit) and doubleword (64 bit) values
+#signedNN() sign extends the rightmost NN bits of x to a signed integer
+#unsignedNN() wraps a signed integer to its NN bit two's complement (unsigned) form
+def signed32(x):
+    return ((x & 0xFFFFFFFF) ^ 0x80000000) - 0x80000000
+
+def signed64(x):
+    return ((x & 0xFFFFFFFFFFFFFFFF) ^ 0x8000000000000000) - 0x8000000000000000
+
+def unsigned32(x):
+    return x & 0xFFFFFFFF
+
+def unsigned64(x):
+    return x & 0xFFFFFFFFFFFFFFFF
+
+
+#Convert a 8, 4 or 2 byte hex string to a signed integer
+def cvthex2int(x):
+    numb = len(x) * 4
+    return ((int(x,16) ^ (1 << (numb - 1))) - (1 << (numb - 1)))
+
+
+#Instruction formats - number of bytes and the fields decoded from each
+#  RR:  OC,R1,R2                 RX:  OC,R1,X2,B2,D2        SI:  OC,I2,B1,D1
+#  RS:  OC,R1,R2,B2,D2           SS:  OC,LL,B1,D1,B3,D3     SS2: OC,L1,L2,B1,D1,B3,D3
+format_length = { 'RR': 2, 'RX': 4, 'SI': 4, 'SS': 6, 'RS': 4, 'SS2': 6 }
+
+#A decoded instruction - built once per storage address and kept in decode_cache
+#Every field sits in the same bit positions in every format, so all of them are
+#filled in and each instruction routine uses the ones that belong to its format
+class Instruction:
+    __slots__ = ('OC', 'format', 'handler', 'length',
+                 'R1', 'R2', 'X2', 'B1', 'D1', 'B2', 'D2', 'LL', 'L1', 'L2', 'B3', 'D3', 'I2')
+
+    count = 1       #instructions executed by the handler - see FusedInstruction
+
+    def __init__(self, mi_bytes, i_format, handler):
+        self.OC = mi_bytes[0]
+        self.format = i_format
+        self.handler = handler
+        self.length = len(mi_bytes)
+        mi_bytes = mi_bytes + bytes(6 - self.length)   #zero fields beyond the instruction length
+        self.R1 = self.L1 = mi_bytes[1] >> 4
+        self.R2 = self.X2 = self.L2 = mi_bytes[1] & 0x0F
+        self.LL = self.I2 = mi_bytes[1]
+        self.B1 = self.B2 = mi_bytes[2] >> 4
+        self.D1 = self.D2 = ((mi_bytes[2] & 0x0F) << 8) | mi_bytes[3]
+        self.B3 = mi_bytes[4] >> 4
+        self.D3 = ((mi_bytes[4] & 0x0F) << 8) | mi_bytes[5]
+
+
+#Here are the machine instructions that are emulated (keyed by operation code)
+#each entry is the instruction format and the name of its Machine instruction routine
+mach_inst = { 0x05: ('RR','BALR'),    0x46: ('RX','BCT'),     0x06: ('RR','BCTR'),    0x47: ('RX','BC'),      0x07: ('RR','BCR'),
+              0x45: ('RX','BAL'),     0x58: ('RX','L'),       0x48: ('RX','LH'),      0x18: ('RR','LR'),      0x41: ('RX','LA'),
+              0xD2: ('SS','MVC'),     0x92: ('SI','MVI'),     0x5A: ('RX','A'),       0x4A: ('RX','AH'),      0x1A: ('RR','AR'),
+              0x5B: ('RX','S'),       0x4B: ('RX','SH'),      0x1B: ('RR','SR'),      0x59: ('RX','C'),       0x49: ('RX','CH'),
+              0x55: ('RX','CL'),      0x15: ('RR','CLR'),     0x95: ('SI','CLI'),     0xD5: ('SS','CLC'),     0xBD: ('RS','CLM'),
+              0x50: ('RX','ST'),      0x42: ('RX','STC'),     0x40: ('RX','STH'),     0x4F: ('RX','CVB'),     0x4E: ('RX','CVD'),
+              0x14: ('RR','NR'),      0x54: ('RX','N'),       0x94: ('SI','NI'),      0xD4: ('SS','NC'),      0x5D: ('RX','D'),
+              0x16: ('RR','OR'),      0x56: ('RX','O'),       0x96: ('SI','OI'),      0xD6: ('SS','OC'),      0x1D: ('RR','DR'),
+              0x17: ('RR','XR'),      0x57: ('RX','X'),       0x97: ('SI','XI'),      0xD7: ('SS','XC'),      0x5C: ('RX','M'),
+              0x43: ('RX','IC'),      0xBF: ('RS','ICM'),     0xBE: ('RS','STCM'),    0x12: ('RR','LTR'),     0x44: ('RX','EX'),
+              0x0A: ('RR','SVC'),     0x19: ('RR','CR'),      0x91: ('SI','TM'),      0xDC: ('SS','TR'),      0xDD: ('SS','TRT'),
+              0xFA: ('SS2','AP'),     0xFB: ('SS2','SP'),     0xFC: ('SS2','MP'),     0xF8: ('SS2','ZAP'),    0x4C: ('RX','MH'),
+              0x1C: ('RR','MR'),      0xF2: ('SS2','PACK'),   0xF3: ('SS2','UNPK'),   0xF9: ('SS2','CP'),     0xFD: ('SS2','DP'),
+              0x90: ('RS','STM'),     0x98: ('RS','LM'),      0x10: ('RR','LPR'),     0x11: ('RR','LNR'),     0x13: ('RR','LCR'),
+              0x5E: ('RX','AL'),      0x1E: ('RR','ALR'),     0x5F: ('RX','SL'),      0x1F: ('RR','SLR'),     0x8B: ('RX','SLA'),
+              0x8F: ('RX','SLDA'),    0x8D: ('RX','SLDL'),    0x89: ('RX','SLL'),     0x8A: ('RX','SRA'),     0x8E: ('RX','SRDA'),
+              0x8C: ('RX','SRDL'),    0x88: ('RX','SRL'),     0xD1: ('SS','MVN'),     0xF1: ('SS2','MVO'),    0xD3: ('SS','MVZ'),
+              0x0F: ('RR','CLCL'),    0x0E: ('RR','MVCL'),    0xBA: ('RS','CS'),      0xBB: ('RS','CDS'),     0xF0: ('SS2','SRP'),
+              0xDE: ('SS','ED'),      0xDF: ('SS','EDMK'),    0x86: ('RS','BXH'),     0x87: ('RS','BXLE') }
+
+
+#Branch mask table - branch_mask[M1][cond_code] is True when a BC / BCR with mask M1 branches
+#mask bits 8, 4, 2, 1 select condition codes 0, 1, 2, 3
+branch_mask = tuple(tuple(bool(M1 & (8 >> cc)) for cc in range(4)) for M1 in range(16))
+
+#Register byte positions (0 - 3, left to right) selected by each CLM mask M3
+mask_bytes = tuple(tuple(i for i in range(4) if M3 & (8 >> i)) for M3 in range(16))
+
+
+#Logical compare of storage fields - op1 and op2 are bytes-like objects of the same length
+#compared as unsigned byte strings, which bytes comparison does in one memcmp()
+
+#Return the condition code of comparing op1 with op2: 0 equal, 1 op1 low, 2 op1 high
+def compare_code(op1, op2):
+    if op1 == op2:
+        return 0
+    return 1 if op1 < op2 else 2
+
+#Return the offset of the first byte that differs in the unequal op1 and op2
+def first_difference(op1, op2):
+    difference = int.from_bytes(op1, 'big') ^ int.from_bytes(op2, 'big')
+    return len(op1) - 1 - (difference.bit_length() - 1) // 8
+
+#Fields up to this many bytes are compared by copying them out of storage, which is
+#the fastest way for short fields. Longer ones (CLCL) are compared in place
+COMPARE_COPY_LIMIT = 4096
+
+#Return the offset of the first byte that differs in the numb byte fields at addr1 and
+#addr2 of storage, or numb if they are equal. A long field is compared in place, halving
+#the part holding the first difference until it is short enough to copy
+def storage_difference(storage, addr1, addr2, numb):
+    lo, hi = 0, numb
+    if numb > COMPARE_COPY_LIMIT:
+        with memoryview(storage) as view:
+            if storage.startswith(view[addr2:addr2+numb], addr1):
+                return numb
+            while hi - lo > COMPARE_COPY_LIMIT:
+                mid = (lo + hi) // 2
+                if storage.startswith(view[addr2+lo:addr2+mid], addr1 + lo):
+                    lo = mid
+                else:
+                    hi = mid
+    op1 = storage[addr1+lo:addr1+hi]
+    op2 = storage[addr2+lo:addr2+hi]
+    if op1 == op2:
+        return numb
+    return lo + first_difference(op1, op2)
+
+#Return the condition code of comparing the numb byte fields at addr1 and addr2 of storage
+def compare_storage(storage, addr1, addr2, numb):
+    if numb <= COMPARE_COPY_LIMIT:
+        return compare_code(storage[addr1:addr1+numb], storage[addr2:addr2+numb])
+    equal = storage_difference(storage, addr1, addr2, numb)
+    if equal == numb:
+        return 0
+    return 1 if storage[addr1+equal] < storage[addr2+equal] else 2
+
+#Return the offset of the first byte of the numb byte field at addr of storage that is
+#not pad, or numb if they all are - a long field is searched in place like storage_difference()
+def pad_difference(storage, addr, numb, pad):
+    lo, hi = 0, numb
+    if numb > COMPARE_COPY_LIMIT:
+        if storage.count(pad, addr, addr + numb) == numb:
+            return numb
+        while hi - lo > COMPARE_COPY_LIMIT:
+            mid = (lo + hi) // 2
+            if storage.count(pad, addr + lo, addr + mid) == mid - lo:
+                lo = mid
+            else:
+                hi = mid
+    rest = storage[addr+lo:addr+hi]
+    return lo + len(rest) - len(rest.lstrip(bytes((pad,))))
+
+
+#ED / EDMK pattern byte classes - digit selector X'20', significance starter X'21',
+#field separator X'22' and every other byte a message character
+ED_DIGIT_SELECTOR, ED_SIGNIFICANCE_STARTER, ED_FIELD_SEPARATOR, ED_MESSAGE = 0, 1, 2, 3
+ed_pattern_class = bytes({0x20: ED_DIGIT_SELECTOR, 0x21: ED_SIGNIFICANCE_STARTER,
+                          0x22: ED_FIELD_SEPARATOR}.get(b, ED_MESSAGE) for b in range(256))
+
+#What replaces a pattern byte: the fill character, the source digit (zoned) or the pattern byte itself
+ED_FILL, ED_DIGIT, ED_KEEP = 0, 1, 2
+
+#Return (result, significance after, first significant digit) for a pattern byte of class cls
+#with the significance indicator sig, a nonzero source digit and a plus sign following the digit
+def ed_transition(cls, sig, nonzero, plus):
+    if cls == ED_FIELD_SEPARATOR:
+        return ED_FILL, 0, False
+    if cls == ED_MESSAGE:
+        return (ED_KEEP if sig else ED_FILL), sig, False
+    result = ED_DIGIT if sig or nonzero else ED_FILL
+    new_sig = 0 if plus else 1 if sig or nonzero or cls == ED_SIGNIFICANCE_STARTER else 0
+    return result, new_sig, not sig and nonzero
+
+#ed_transitions[cls << 3 | sig << 2 | nonzero << 1 | plus] -> ed_transition(cls, sig, nonzero, plus)
+ed_transitions = tuple(ed_transition(i >> 3, (i >> 2) & 1, (i >> 1) & 1, i & 1) for i in range(32))
+
+
+#Arithmetic shifts of the unsigned value of a register (numb 32) or an even/odd register
+#pair (numb 64) - the sign bit is not shifted. Both return (result, condition code)
+
+#SLA / SLDA - a bit unlike the sign shifted out of the numeric bits is an overflow, condition code 3
+def shift_left_arithmetic(value, shift, numb):
+    sign = 1 << (numb - 1)
+    result = (value & sign) | ((value << shift) & (sign - 1))
+    if not -sign <= ((value ^ sign) - sign) << shift < sign:
+        return result, 3
+    return result, 0 if result == 0 else 1 if result & sign else 2
+
+#SRA / SRDA - the sign bit fills the numeric bits vacated on the left
+def shift_right_arithmetic(value, shift, numb):
+    sign = 1 << (numb - 1)
+    result = (((value ^ sign) - sign) >> shift) & ((sign << 1) - 1)
+    return result, 0 if result == 0 else 1 if result & sign else 2
+
+
+#R14 holds this address on entry - a 'BR    14' to it ends the program normally
+END_OF_PROGRAM = 0x0EEEEE
+
+#Abend codes of the program interruptions raised by the instruction routines
+#(S370Decimal raises the decimal ones as DecimalException)
+OPERATION_EXCEPTION = 'S0C1'
+EXECUTE_EXCEPTION = 'S0C3'
+ADDRESSING_EXCEPTION = 'S0C5'
+
+#A program interruption raised by an instruction routine - code is the abend code
+class ProgramException(Exception):
+    def __init__(self, code, reason):
+        super().__init__('%s %s' % (code, reason))
+        self.code = code
+        self.reason = reason
+
+#The instruction and time limits are checked once every LIMIT_CHECK_INTERVAL instructions
+#with a time limit, groups that take longer than LIMIT_CHECK_SECONDS (slow instructions
+#such as MVCL and CLCL of long fields) make the next group smaller
+LIMIT_CHECK_INTERVAL = 10000
+LIMIT_CHECK_SECONDS = 0.05
+
+#The reason of the S322 abend of a program that exceeds its time limit
+TIME_LIMIT_REASON = 'time limit of %g seconds exceeded'
+
+
+# -------------------------------------------------- #
+# Basic block translation
+#
+# run() executes straight-line code a basic block at a time. A block starts at
+# the address execution reaches and runs up to and including the first branch,
+# EX or SVC (BLOCK_END) or MAX_BLOCK_INSTRUCTIONS instructions.
+# Machine.translate_block() writes Python source for the block - the instructions
+# in block_translators with their registers, lengths, displacements and masks folded
+# in as constants, every other instruction as a call to its instruction routine -
+# compiles it once and keeps the resulting closure in Machine.blocks.
+# A store into a translated range drops the blocks it overlaps and ends the block
+# doing the store, so modified instructions are translated again before they run.
+# -------------------------------------------------- #
+
+BLOCK_END = frozenset(('BC', 'BCR', 'BCT', 'BCTR', 'BAL', 'BALR', 'BXH', 'BXLE', 'EX', 'SVC'))
+
+MAX_BLOCK_INSTRUCTIONS = 64
+
+#A block start whose translated block has been dropped this many times by stores into
+#it is left to the interpreter - code that keeps modifying itself is not worth compiling
+MAX_BLOCK_DROPS = 4
+
+#names available to the translated blocks
+block_globals = { 'unpack_fullword': FULLWORD.unpack_from,
+                  'unpack_signed_fullword': SIGNED_FULLWORD.unpack_from,
+                  'unpack_signed_halfword': SIGNED_HALFWORD.unpack_from,
+                  'pack_fullword': FULLWORD.pack_into,
+                  'pack_halfword': HALFWORD.pack_into }
+
+
+#Python expression for the address D(X,B) or D(B) - a constant if there is no base or index
+def address_expr(B, D, X=0):
+    terms = ['regs[%d]' % R for R in (X, B) if R != 0]
+    if not terms:
+        return '0x%06X' % D
+    if D != 0:
+        terms.append('0x%X' % D)
+    return '(%s) & 0xFFFFFF' % ' + '.join(terms)
+
+
+#Python expression for the signed value of register R
+def signed_reg_expr(R):
+    return '((regs[%d] ^ 0x80000000) - 0x80000000)' % R
+
+
+#Python expression for the condition codes in which a branch with mask M1 is taken
+def branch_expr(M1):
+    return 'm.cond_code in %r' % (tuple(cc for cc in range(4) if branch_mask[M1][cc]),)
+
+
+#Source lines that drop the translations a store of numb bytes at a overlaps
+#leave is the statement that ends the block if any were dropped
+def store_check(numb, leave):
+    return ['if a < m.watch_high and a + %d > m.watch_low:' % numb,
+            '    m.invalidate_decode_cache(a, %d)' % numb,
+            '    if m.code_modified: ' + leave]
+
+
+# Each translator is called with the decoded Instruction, the address of the
+# next instruction and the statement that leaves the block after this
+# instruction, and returns the source lines doing the same as the instruction routine.
+# The block's register list, storage and Machine are regs, storage and m.
+
+def translate_LA(ins, next_address, leave):
+    return ['regs[%d] = %s' % (ins.R1, address_expr(ins.B2, ins.D2, ins.X2))]
+
+def translate_L(ins, next_address, leave):
+    return ['regs[%d] = unpack_fullword(storage, %s)[0]' % (ins.R1, address_expr(ins.B2, ins.D2, ins.X2))]
+
+def translate_LH(ins, next_address, leave):
+    return ['regs[%d] = unpack_signed_halfword(storage, %s)[0] & 0xFFFFFFFF' % (ins.R1, address_expr(ins.B2, ins.D2, ins.X2))]
+
+def translate_LR(ins, next_address, leave):
+    return ['regs[%d] = regs[%d]' % (ins.R1, ins.R2)]
+
+def translate_LTR(ins, next_address, leave):
+    return ['v = regs[%d]' % ins.R2,
+            'regs[%d] = v' % ins.R1,
+            'm.cond_code = 0 if v == 0 else 1 if v & 0x80000000 else 2']
+
+def translate_IC(ins, next_address, leave):
+    return ['regs[%d] = (regs[%d] & 0xFFFFFF00) | storage[%s]' % (ins.R1, ins.R1, address_expr(ins.B2, ins.D2, ins.X2))]
+
+def translate_ST(ins, next_address, leave):
+    return (['a = %s' % address_expr(ins.B2, ins.D2, ins.X2),
+             'pack_fullword(storage, a, regs[%d])' % ins.R1] + store_check(4, leave))
+
+def translate_STH(ins, next_address, leave):
+    return (['a = %s' % address_expr(ins.B2, ins.D2, ins.X2),
+             'pack_halfword(storage, a, regs[%d] & 0xFFFF)' % ins.R1] + store_check(2, leave))
+
+def translate_STC(ins, next_address, leave):
+    return (['a = %s' % address_expr(ins.B2, ins.D2, ins.X2),
+             'storage[a] = regs[%d] & 0xFF' % ins.R1] + store_check(1, leave))
+
+def translate_MVI(ins, next_address, leave):
+    return (['a = %s' % address_expr(ins.B1, ins.D1),
+             'storage[a] = 0x%02X' % ins.I2] + store_check(1, leave))
+
+#Add / Subtract - op2 is the expression for the signed second operand
+def translate_add_sub(ins, op, op2):
+    return ['v = %s %s %s' % (signed_reg_expr(ins.R1), op, op2),
+            'm.cond_code = 3 if v > 0x7FFFFFFF or v < -0x80000000 else 0 if v == 0 else 1 if v < 0 else 2',
+            'regs[%d] = v & 0xFFFFFFFF' % ins.R1]
+
+def translate_A(ins, next_address, leave):
+    return translate_add_sub(ins, '+', 'unpack_signed_fullword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_AH(ins, next_address, leave):
+    return translate_add_sub(ins, '+', 'unpack_signed_halfword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_AR(ins, next_address, leave):
+    return translate_add_sub(ins, '+', signed_reg_expr(ins.R2))
+
+def translate_S(ins, next_address, leave):
+    return translate_add_sub(ins, '-', 'unpack_signed_fullword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_SH(ins, next_address, leave):
+    return translate_add_sub(ins, '-', 'unpack_signed_halfword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_SR(ins, next_address, leave):
+    return translate_add_sub(ins, '-', signed_reg_expr(ins.R2))
+
+#Compare - op1 and op2 are the expressions for the two operands
+def translate_compare(op1, op2):
+    return ['v1 = %s' % op1,
+            'v2 = %s' % op2,
+            'm.cond_code = 0 if v1 == v2 else 1 if v1 < v2 else 2']
+
+def translate_C(ins, next_address, leave):
+    return translate_compare(signed_reg_expr(ins.R1), 'unpack_signed_fullword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_CH(ins, next_address, leave):
+    return translate_compare(signed_reg_expr(ins.R1), 'unpack_signed_halfword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_CR(ins, next_address, leave):
+    return translate_compare(signed_reg_expr(ins.R1), signed_reg_expr(ins.R2))
+
+def translate_CL(ins, next_address, leave):
+    return translate_compare('regs[%d]' % ins.R1, 'unpack_fullword(storage, %s)[0]' % address_expr(ins.B2, ins.D2, ins.X2))
+
+def translate_CLR(ins, next_address, leave):
+    return translate_compare('regs[%d]' % ins.R1, 'regs[%d]' % ins.R2)
+
+def translate_CLI(ins, next_address, leave):
+    return translate_compare('storage[%s]' % address_expr(ins.B1, ins.D1), '0x%02X' % ins.I2)
+
+def translate_BC(ins, next_address, leave):
+    if ins.R1 == 0:
+        return ['m.program_counter = 0x%06X' % next_address]
+    if ins.R1 == 15:
+        return ['m.program_counter = %s' % address_expr(ins.B2, ins.D2, ins.X2)]
+    return ['m.program_counter = %s if %s else 0x%06X' % (address_expr(ins.B2, ins.D2, ins.X2), branch_expr(ins.R1), next_address)]
+
+def translate_BCR(ins, next_address, leave):
+    if ins.R1 == 0 or ins.R2 == 0:
+        return ['m.program_counter = 0x%06X' % next_address]
+    if ins.R1 == 15:
+        return ['m.program_counter = regs[%d] & 0xFFFFFF' % ins.R2]
+    return ['m.program_counter = regs[%d] & 0xFFFFFF if %s else 0x%06X' % (ins.R2, branch_expr(ins.R1), next_address)]
+
+def translate_BCT(ins, next_address, leave):
+    return ['t = %s' % address_expr(ins.B2, ins.D2, ins.X2),
+            'v = (regs[%d] - 1) & 0xFFFFFFFF' % ins.R1,
+            'regs[%d] = v' % ins.R1,
+            'm.program_counter = t if v else 0x%06X' % next_address]
+
+def translate_BCTR(ins, next_address, leave):
+    if ins.R2 == 0:
+        return ['regs[%d] = (regs[%d] - 1) & 0xFFFFFFFF' % (ins.R1, ins.R1),
+                'm.program_counter = 0x%06X' % next_address]
+    return ['t = regs[%d] & 0xFFFFFF' % ins.R2,
+            'v = (regs[%d] - 1) & 0xFFFFFFFF' % ins.R1,
+            'regs[%d] = v' % ins.R1,
+            'm.program_counter = t if v else 0x%06X' % next_address]
+
+def translate_BAL(ins, next_address, leave):
+    return ['regs[%d] = 0x%06X' % (ins.R1, next_address),
+            'm.program_counter = %s' % address_expr(ins.B2, ins.D2, ins.X2)]
+
+def translate_BALR(ins, next_address, leave):
+    if ins.R2 == 0:
+        return ['regs[%d] = 0x%06X' % (ins.R1, next_address),
+                'm.program_counter = 0x%06X' % next_address]
+    return ['t = regs[%d] & 0xFFFFFF' % ins.R2,
+            'regs[%d] = 0x%06X' % (ins.R1, next_address),
+            'm.program_counter = t']
+
+
+#instruction routine name -> translator
+block_translators = { 'LA': translate_LA,   'L': translate_L,     'LH': translate_LH,   'LR': translate_LR,
+                      'LTR': translate_LTR, 'IC': translate_IC,   'ST': translate_ST,   'STH': translate_STH,
+                      'STC': translate_STC, 'MVI': translate_MVI, 'A': translate_A,     'AH': translate_AH,
+                      'AR': translate_AR,   'S': translate_S,     'SH': translate_SH,   'SR': translate_SR,
+                      'C': translate_C,     'CH': translate_CH,   'CR': translate_CR,   'CL': translate_CL,
+                      'CLR': translate_CLR, 'CLI': translate_CLI, 'BC': translate_BC,   'BCR': translate_BCR,
+                      'BCT': translate_BCT, 'BCTR': translate_BCTR, 'BAL': translate_BAL, 'BALR': translate_BALR }
+
+
+#Source lines of the function name(m, regs, storage, I) that returns the block closure
+#lines are the body of the block, calls the indexes into the instruction list I of
+#the instructions called through their instruction routine and numb the number of instructions
+def block_function(name, lines, calls, numb):
+    source = ['def %s(m, regs, storage, I):' % name]
+    for k in calls:
+        source.append('    I%d = I[%d]; H%d = I%d.handler' % (k, k, k, k))
+    source.append('    def block():')
+    source.extend('        ' + line for line in lines)
+    source.append('        return %d' % numb)
+    source.append('    return block')
+    return source
+
+
+# -------------------------------------------------- #
+# Superinstructions
+#
+# The interpreter loop in Machine.execute_instructions() runs the common instruction
+# sequences in fusion_patterns as one step. When an instruction is first reached,
+# Machine.fuse_instruction() checks whether it starts one of the sequences and if so
+# builds a FusedInstruction whose handler - a closure made by the sequence's fuse_*
+# function with the registers, displacements and masks of its instructions folded
+# in - does exactly what the instructions would do one after another.
+# The storage clears XC X,X and MVC X+1(n),X are single instructions but are
+# fused the same way, into a handler that only stores the zeros or the byte.
+# Superinstructions are only used by that loop. step() executes one instruction at
+# a time, so the debugger and trace still stop on every instruction of a sequence.
+# -------------------------------------------------- #
+
+#A superinstruction - first is the first Instruction of the sequence and
+#instructions all of them; handler, length and count cover the whole sequence
+class FusedInstruction:
+    __slots__ = ('name', 'handler', 'length', 'count', 'first', 'instructions')
+
+    def __init__(self, name, handler, instructions):
+        self.name = name
+        self.handler = handler
+        self.length = sum(ins.length for ins in instructions)
+        self.count = len(instructions)
+        self.first = instructions[0]
+        self.instructions = instructions
+
+
+#The longest fused sequence in bytes and in instructions - L / A / ST
+MAX_FUSED_LENGTH = 12
+MAX_FUSED_COUNT = 3
+
+
+#Return a function of regs computing the address D(X,B) - registers that are absent are left out
+def address_function(B, D, X=0):
+    if X != 0 and B != 0:
+        return lambda regs: (regs[X] + regs[B] + D) & 0xFFFFFF
+    if X != 0 or B != 0:
+        R = X or B
+        return lambda regs: (regs[R] + D) & 0xFFFFFF
+    return lambda regs: D
+
+
+# Each fuse_ function is called with the Machine, the address of the sequence, its
+# decoded instructions and the one element list counting how often it runs, and
+# returns the handler for the FusedInstruction
+
+#LA  Rx,D(X,B) / BCT  Ry,target
+def fuse_LA_BCT(m, addr, instructions, counter):
+    la, bct = instructions
+    regs = m.regs
+    R1 = la.R1
+    la_address = address_function(la.B2, la.D2, la.X2)
+    R = bct.R1
+    target_address = address_function(bct.B2, bct.D2, bct.X2)
+    next_address = addr + la.length + bct.length
+
+    def LA_BCT(fused):
+        counter[0] += 1
+        regs[R1] = la_address(regs)
+        target = target_address(regs)
+        v = (regs[R] - 1) & 0xFFFFFFFF
+        regs[R] = v
+        return target if v else next_address
+    return LA_BCT
+
+
+#CLI  D(B),I / BC  M,target
+def fuse_CLI_BC(m, addr, instructions, counter):
+    cli, bc = instructions
+    regs = m.regs
+    storage = m.storage
+    operand_address = address_function(cli.B1, cli.D1)
+    I2 = cli.I2
+    taken = branch_mask[bc.R1]
+    target_address = address_function(bc.B2, bc.D2, bc.X2)
+    next_address = addr + cli.length + bc.length
+
+    def CLI_BC(fused):
+        counter[0] += 1
+        op1 = storage[operand_address(regs)]
+        cond_code = 0 if op1 == I2 else 1 if op1 < I2 else 2
+        m.cond_code = cond_code
+        return target_address(regs) if taken[cond_code] else next_address
+    return CLI_BC
+
+
+#CLC  D(L,B),D(B) / BC  M,target
+def fuse_CLC_BC(m, addr, instructions, counter):
+    clc, bc = instructions
+    regs = m.regs
+    storage = m.storage
+    op1_address = address_function(clc.B1, clc.D1)
+    op2_address = address_function(clc.B3, clc.D3)
+    numb = clc.LL + 1
+    taken = branch_mask[bc.R1]
+    target_address = address_function(bc.B2, bc.D2, bc.X2)
+    next_address = addr + clc.length + bc.length
+
+    def CLC_BC(fused):
+        counter[0] += 1
+        addr1 = op1_address(regs)
+        addr2 = op2_address(regs)
+        if addr1 + numb <= len(storage) and addr2 + numb <= len(storage):
+            cond_code = compare_code(storage[addr1:addr1+numb], storage[addr2:addr2+numb])
+            m.cond_code = cond_code
+        else:
+            m.Compare_Logical_code(clc, 'SS')     #an operand runs off the end of storage
+            cond_code = m.cond_code
+        return target_address(regs) if taken[cond_code] else next_address
+    return CLC_BC
+
+
+#L  Rx,op1 / A  Rx,op2 / ST  Rx,op3   and   L  Rx,op1 / S  Rx,op2 / ST  Rx,op3
+#each address is calculated after the instruction before it, which may have changed Rx
+def fuse_L_AorS_ST(m, addr, instructions, counter):
+    l, a, st = instructions
+    regs = m.regs
+    storage = m.storage
+    R = l.R1
+    l_address = address_function(l.B2, l.D2, l.X2)
+    a_address = address_function(a.B2, a.D2, a.X2)
+    st_address = address_function(st.B2, st.D2, st.X2)
+    sign = 1 if a.handler.__name__ == 'A' else -1
+    next_address = addr + l.length + a.length + st.length
+    unpack_fullword = FULLWORD.unpack_from
+    unpack_signed_fullword = SIGNED_FULLWORD.unpack_from
+    pack_fullword = FULLWORD.pack_into
+
+    def L_AorS_ST(fused):
+        counter[0] += 1
+        regs[R] = unpack_fullword(storage, l_address(regs))[0]
+        v = signed32(regs[R]) + sign * unpack_signed_fullword(storage, a_address(regs))[0]
+        m.cond_code = 3 if v > 0x7FFFFFFF or v < -0x80000000 else 0 if v == 0 else 1 if v < 0 else 2
+        v = v & 0xFFFFFFFF
+        regs[R] = v
+        a = st_address(regs)
+        pack_fullword(storage, a, v)
+        if a < m.watch_high and a + 4 > m.watch_low:
+            m.invalidate_decode_cache(a, 4)
+        return next_address
+    return L_AorS_ST
+
+
+#XC  D(L,B),D(B) with both operands the same field - clears it
+def fuse_XC_clear(m, addr, instructions, counter):
+    xc, = instructions
+    regs = m.regs
+    op_address = address_function(xc.B1, xc.D1)
+    zeros = bytes(xc.LL + 1)
+    next_address = addr + xc.length
+
+    def XC_CLEAR(fused):
+        counter[0] += 1
+        m.store_bytes(op_address(regs), zeros)
+        m.cond_code = 0
+        return next_address
+    return XC_CLEAR
+
+
+#MVC  D+1(L,B),D(B) - propagates the byte at D through the field
+def fuse_MVC_fill(m, addr, instructions, counter):
+    mvc, = instructions
+    regs = m.regs
+    storage = m.storage
+    source_address = address_function(mvc.B3, mvc.D3)
+    numb = mvc.LL + 1
+    next_address = addr + mvc.length
+
+    def MVC_FILL(fused):
+        counter[0] += 1
+        a = source_address(regs)
+        m.store_bytes(a + 1, bytes((storage[a],)) * numb)
+        return next_address
+    return MVC_FILL
+
+
+#Return True if the instructions all use the same register R1 - L Rx / A Rx / ST Rx
+def same_register(instructions):
+    return len(set(ins.R1 for ins in instructions)) == 1
+
+
+#Return True if both operands of the SS instruction are the same field - XC X,X
+def same_field(instructions):
+    ins, = instructions
+    return ins.B1 == ins.B3 and ins.D1 == ins.D3
+
+
+#Return True if the first operand of the SS instruction starts one byte after the second - MVC X+1(n),X
+def next_byte_field(instructions):
+    ins, = instructions
+    return ins.B1 == ins.B3 and ins.D1 == ins.D3 + 1
+
+
+#The instruction sequences fused into superinstructions, keyed by the routine name of
+#their first instruction. Each entry is (routine names, condition or None, name, fuse_ function)
+fusion_patterns = { 'LA': ((('LA', 'BCT'), None, 'LA_BCT', fuse_LA_BCT),),
+                    'CLI': ((('CLI', 'BC'), None, 'CLI_BC', fuse_CLI_BC),),
+                    'CLC': ((('CLC', 'BC'), None, 'CLC_BC', fuse_CLC_BC),),
+                    'XC': ((('XC',), same_field, 'XC_CLEAR', fuse_XC_clear),),
+                    'MVC': ((('MVC',), next_byte_field, 'MVC_FILL', fuse_MVC_fill),),
+                    'L': ((('L', 'A', 'ST'), same_register, 'L_A_ST', fuse_L_AorS_ST),
+                          (('L', 'S', 'ST'), same_register, 'L_S_ST', fuse_L_AorS_ST)) }
+
+
+#An emulated S/370 machine: main storage, the 16 general registers, the PSW
+#(program counter and condition code), the SVC handler table and the decoded
+#instruction cache. Nothing is done at import time - a program is loaded with
+#load(), load_image(), load_directory() or load_pickles() and executed with step() or run().
+#All program output (SVCs, trace, end of program messages) is written to out.
+#max_instructions and max_seconds limit the instructions executed and the wall clock
+#time spent in run() - exceeding either one ends the program with an S322 abend.
+#translate=False runs every instruction through the interpreter instead of
+#translating basic blocks. fuse=False stops the interpreter from running common
+#instruction sequences as superinstructions.
+class Machine:
+
+    def __init__(self, out=None, debug=False, trace=False, max_instructions=None, max_seconds=None,
+                 translate=True, fuse=True):
+        self.out = sys.stdout if out is None else out
+        self.debug = debug      #SVC output goes to the debugger command window
+        self.trace = trace      #print each instruction as it is executed
+        self.stop_check = None  #stop_check(machine) -> True stops run() - see execute_instrumented()
+        self.translate = translate
+        self.fuse = fuse
+        self.max_instructions = max_instructions
+        self.max_seconds = max_seconds
+
+        #operation code -> (instruction format, bound instruction routine)
+        self.mach_inst = {oc: (i_format, getattr(self, name)) for oc, (i_format, name) in mach_inst.items()}
+
+        #SVC number -> bound SVC routine - add entries to provide further services
+        self.svc_table = { 255: self.svc_print_data,   254: self.svc_print_signed, 253: self.svc_print_hex,
+                           252: self.svc_print_cond_code, 251: self.svc_print_regs, 250: self.svc_sleep,
+                           249: self.svc_open,          248: self.svc_close,        247: self.svc_get,
+                           246: self.svc_put }
+
+        self.source_code_dict = {}
+        self.symbol_dict = {}
+        self.file_handle_dict = {}
+        self.term_output = ''
+        self.load(b'')
+
+
+    #Load a program into main storage and reset the registers and PSW
+    #program is a bytes-like object or the list of 2 digit hex strings from instrdata.p
+    def load(self, program, source_code_dict=None, symbol_dict=None):
+        if isinstance(program, (list, tuple)):
+            program = bytes.fromhex(''.join(program))
+        self.storage = bytearray(program)
+
+        if source_code_dict is not None:
+            self.source_code_dict = source_code_dict
+        if symbol_dict is not None:
+            self.symbol_dict = symbol_dict
+
+        self.regs = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, END_OF_PROGRAM, 15]
+        self.cond_code = 0
+        self.program_counter = 0
+
+        self.decode_cache = {}
+        self.execute_cache = {}     #storage address -> {OR byte: Instruction} - the targets of EX
+        self.decode_cache_low = 0x7FFFFFFF
+        self.decode_cache_high = 0
+        self.table_low = 0x7FFFFFFF     #bounds of the TR / TRT tables in translate_tables
+        self.table_high = 0
+        self.watch_low = 0x7FFFFFFF     #bounds of both - every store is checked against these first
+        self.watch_high = 0
+
+        self.fusion_cache = {}      #storage address -> FusedInstruction or Instruction run by the interpreter loop
+        #superinstruction name -> one element list counting how often it has run
+        self.fusion_counters = {name: [0] for patterns in fusion_patterns.values()
+                                for names, condition, name, fuse in patterns}
+
+        self.blocks = {}            #storage address -> (translated block, number of instructions)
+        self.block_map = {}         #storage address -> start addresses of the blocks covering it
+        self.block_ends = {}        #block start address -> the address following the block
+        self.block_drops = {}       #block start address -> times its block has been dropped
+        self.code_modified = False  #set when a store drops a translated block
+
+        self.translate_tables = {}  #storage address -> 256 byte TR / TRT table copied from storage
+        self.test_patterns = {}     #storage address -> regex finding the argument bytes a TRT table stops at
+
+        self.running = True
+        self.completion = None      #end of program message once the program has ended
+        self.stopped = False        #run() returned because stop_check() returned True
+        self.abend_code = None      #abend code (e.g. 'S322') if the program was abended
+        self.instruction_count = 0
+        self.run_seconds = 0.0      #wall clock time spent in run()
+        self.deadline = None        #perf_counter() time the time limit is reached at, during run()
+
+
+    #Load a program image file written by Z390-ProcessPRN_OBJ.py or MVS38J-ProcessPRN_OBJ.py
+    #execution starts at the entry address stored in the image
+    def load_image(self, filename):
+        storage, source_code_dict, symbol_dict, entry = read_image(filename)
+        self.load(storage, source_code_dict, symbol_dict)
+        self.program_counter = entry
+
+
+    #Load an object deck (.OBJ) - execution starts at its END card entry address
+    #there is no listing, so the source code and symbol dictionaries are empty
+    def load_object(self, filename):
+        storage, symbols, entry = load_object_file(filename)
+        self.load(storage, {}, {})
+        if entry is not None:
+            self.program_counter = entry
+
+
+    #Load a program file - an object deck if filename ends in .OBJ, otherwise a program image file
+    def load_file(self, filename):
+        if filename.upper().endswith('.OBJ'):
+            self.load_object(filename)
+        else:
+            self.load_image(filename)
+
+
+    #Load the program in directory - its program image file if there is one, otherwise
+    #the 3 pickles instrdata.p, sourcecode.p and symdict.p
+    def load_directory(self, directory='.'):
+        image_filename = os.path.join(directory, IMAGE_FILENAME)
+        if os.path.isfile(image_filename):
+            self.load_image(image_filename)
+        else:
+            self.load_pickles(directory)
+
+
+    #Load the three pickles created by S370BALAsm (or older versions of the pre-processors)
+    def load_pickles(self, directory='.'):
+        with open(os.path.join(directory, 'sourcecode.p'), 'rb') as f:
+            source_code_dict = pickle.load(f)
+        with open(os.path.join(directory, 'symdict.p'), 'rb') as f:
+            symbol_dict = pickle.load(f)
+        with open(os.path.join(directory, 'instrdata.p'), 'rb') as f:
+            instrdata_list = pickle.load(f)
+        self.load(instrdata_list, source_code_dict, symbol_dict)
+
+
+    # Main storage accessors
+    # halfwords, fullwords and doublewords are held in storage in big-endian order
+    def fetch_halfword(self, addr):
+        return HALFWORD.unpack_from(self.storage, addr)[0]
+
+    def fetch_fullword(self, addr):
+        return FULLWORD.unpack_from(self.storage, addr)[0]
+
+    def fetch_doubleword(self, addr):
+        return DOUBLEWORD.unpack_from(self.storage, addr)[0]
+
+    def fetch_signed_halfword(self, addr):
+        return SIGNED_HALFWORD.unpack_from(self.storage, addr)[0]
+
+    def fetch_signed_fullword(self, addr):
+        return SIGNED_FULLWORD.unpack_from(self.storage, addr)[0]
+
+    def store_byte(self, addr, value):
+        self.storage[addr] = value & 0xFF
+        self.invalidate_decode_cache(addr, 1)
+
+    def store_halfword(self, addr, value):
+        HALFWORD.pack_into(self.storage, addr, value & 0xFFFF)
+        self.invalidate_decode_cache(addr, 2)
+
+    def store_fullword(self, addr, value):
+        FULLWORD.pack_into(self.storage, addr, value & 0xFFFFFFFF)
+        self.invalidate_decode_cache(addr, 4)
+
+    def store_doubleword(self, addr, value):
+        DOUBLEWORD.pack_into(self.storage, addr, value & 0xFFFFFFFFFFFFFFFF)
+        self.invalidate_decode_cache(addr, 8)
+
+    #Store a bytes-like object into storage starting at addr
+    def store_bytes(self, addr, data):
+        end = addr + len(data)
+        if end > len(self.storage):
+            raise IndexError('storage address out of range')
+        self.storage[addr:end] = data
+        if addr < self.watch_high and end > self.watch_low:
+            self.invalidate_decode_cache(addr, len(data))
+
+    #Move numb bytes from source to dest as if one byte at a time, left to right
+    #when dest starts inside the source field the bytes before dest are moved again and
+    #again, so they repeat through the target - MVC 1(n,R),0(R) propagates one byte
+    def move_characters(self, dest, source, numb):
+        storage = self.storage
+        if dest + numb > len(storage) or source + numb > len(storage):
+            raise IndexError('storage address out of range')
+        distance = dest - source
+        if 0 < distance < numb:
+            if distance == 1:
+                storage[dest:dest+numb] = bytes((storage[source],)) * numb
+            else:
+                storage[dest:dest+numb] = (storage[source:dest] * (numb // distance + 1))[:numb]
+        else:
+            storage[dest:dest+numb] = storage[source:source+numb]
+        self.invalidate_decode_cache(dest, numb)
+
+    #Move the bits in mask (0x0F numerics, 0xF0 zones) of numb bytes from source to dest
+    #as if one byte at a time, left to right
+    def move_nibbles(self, dest, source, numb, mask):
+        storage = self.storage
+        if dest + numb > len(storage) or source + numb > len(storage):
+            raise IndexError('storage address out of range')
+        if 0 < dest - source < numb:
+            #overlap where bytes already stored are used as source again
+            keep = mask ^ 0xFF
+            for i in range(numb):
+                storage[dest+i] = (storage[dest+i] & keep) | (storage[source+i] & mask)
+        else:
+            bits = int.from_bytes(bytes((mask,)) * numb, 'big')
+            value = ((int.from_bytes(storage[source:source+numb], 'big') & bits) |
+                     (int.from_bytes(storage[dest:dest+numb], 'big') & ~bits))
+            storage[dest:dest+numb] = value.to_bytes(numb, 'big')
+        self.invalidate_decode_cache(dest, numb)
+
+
+    # Decoded instruction cache
+    # decode_cache maps a storage address to its decoded Instruction record so
+    # that each instruction is decoded only once. decode_cache_low/high bound the
+    # cached addresses.
+    # Any store that touches a cached instruction drops it from the cache so
+    # self-modifying code is re-decoded on its next fetch.
+    # The bounds also cover the translated blocks - a store into one drops every
+    # block covering the stored bytes and sets code_modified - and the superinstructions
+    # in fusion_cache, which are built from cached instructions. The TR / TRT tables in
+    # translate_tables and test_patterns have their own bounds, table_low/high, so data
+    # between the code and a table is not checked byte by byte. watch_low/high cover
+    # both, so a store outside the code and the tables costs two compares.
+
+    #Widen watch_low/high to cover storage low to high-1
+    def watch(self, low, high):
+        if low < self.watch_low:
+            self.watch_low = low
+        if high > self.watch_high:
+            self.watch_high = high
+
+    #Drop any cached instruction, superinstruction, translated block or translate table
+    #overlapping storage addr to addr+numb-1
+    def invalidate_decode_cache(self, addr, numb):
+        if addr >= self.watch_high or addr + numb <= self.watch_low:
+            return
+
+        if addr < self.decode_cache_high and addr + numb > self.decode_cache_low:
+            decode_cache = self.decode_cache
+            #an instruction is at most 6 bytes long, so one starting up to 5 bytes before addr can overlap
+            for i in range(max(addr - 5, self.decode_cache_low), min(addr + numb, self.decode_cache_high)):
+                if i in decode_cache:
+                    del decode_cache[i]
+
+            if self.execute_cache:
+                execute_cache = self.execute_cache
+                for i in range(max(addr - 5, self.decode_cache_low), min(addr + numb, self.decode_cache_high)):
+                    if i in execute_cache:
+                        del execute_cache[i]
+
+            if self.fusion_cache:
+                fusion_cache = self.fusion_cache
+                for i in range(max(addr - MAX_FUSED_LENGTH + 1, self.decode_cache_low), min(addr + numb, self.decode_cache_high)):
+                    if i in fusion_cache:
+                        del fusion_cache[i]
+
+            if self.block_map:
+                block_map = self.block_map
+                for i in range(max(addr, self.decode_cache_low), min(addr + numb, self.decode_cache_high)):
+                    starts = block_map.get(i)
+                    if starts is not None:
+                        for start in starts[:]:
+                            self.drop_block(start)
+
+        if addr < self.table_high and addr + numb > self.table_low and self.translate_tables:
+            for table_addr in [t for t in self.translate_tables if t < addr + numb and addr < t + 256]:
+                del self.translate_tables[table_addr]
+                self.test_patterns.pop(table_addr, None)
+
+
+    #Drop the translated block starting at start from blocks and from block_map over its whole range
+    #and set code_modified - after MAX_BLOCK_DROPS drops start is no longer translated
+    def drop_block(self, start):
+        del self.blocks[start]
+        block_map = self.block_map
+        for i in range(start, self.block_ends.pop(start)):
+            starts = block_map[i]
+            starts.remove(start)
+            if not starts:
+                del block_map[i]
+        self.block_drops[start] = self.block_drops.get(start, 0) + 1
+        self.code_modified = True
+
+
+    #Return the 256 byte TR / TRT table at storage address addr, or None if it runs off the end of storage
+    #the table is copied once and kept until a store into it
+    def translate_table(self, addr):
+        table = self.translate_tables.get(addr)
+        if table is None:
+            if addr + 256 > len(self.storage):
+                return None
+            table = bytes(self.storage[addr:addr+256])
+            self.translate_tables[addr] = table
+            if addr < self.table_low:
+                self.table_low = addr
+            if addr + 256 > self.table_high:
+                self.table_high = addr + 256
+            self.watch(addr, addr + 256)
+        return table
+
+
+    #Return a regex matching the argument bytes that have a non-zero function byte in the TRT table
+    #at storage address addr, or None if the table runs off the end of storage
+    def test_pattern(self, addr):
+        pattern = self.test_patterns.get(addr)
+        if pattern is None:
+            table = self.translate_table(addr)
+            if table is None:
+                return None
+            stops = bytes(i for i in range(256) if table[i] != 0)
+            pattern = re.compile(b'[' + re.escape(stops) + b']' if stops else b'(?!)')
+            self.test_patterns[addr] = pattern
+        return pattern
+
+
+    #Decode the instruction at offset addr of buf
+    #raises KeyError for an invalid operation code and IndexError if the instruction
+    #runs off the end of buf
+    def decode(self, buf, addr):
+        i_format, handler = self.mach_inst[buf[addr]]
+        i_length = format_length[i_format]
+        mi_bytes = bytes(buf[addr:addr+i_length])
+        if len(mi_bytes) < i_length:
+            raise IndexError('instruction extends beyond end of storage')
+        return Instruction(mi_bytes, i_format, handler)
+
+
+    #Decode the instruction at storage address addr and add it to decode_cache
+    def decode_and_cache(self, addr):
+        ins = self.decode(self.storage, addr)
+        self.decode_cache[addr] = ins
+        if addr < self.decode_cache_low:
+            self.decode_cache_low = addr
+        if addr + ins.length > self.decode_cache_high:
+            self.decode_cache_high = addr + ins.length
+        self.watch(addr, addr + ins.length)
+        return ins
+
+
+    #Return the superinstruction starting at storage address addr if the instructions
+    #there match one of fusion_patterns, otherwise the instruction at addr, and add it
+    #to fusion_cache - returns None if the instruction at addr cannot be decoded
+    def fuse_instruction(self, addr):
+        if addr == END_OF_PROGRAM:
+            return None
+
+        ins = self.decode_cache.get(addr)
+        if ins is None:
+            try:
+                ins = self.decode_and_cache(addr)
+            except (IndexError, KeyError):
+                return None
+
+        for names, condition, name, fuse in fusion_patterns.get(ins.handler.__name__, ()):
+            instructions = [ins]
+            pc = addr + ins.length
+            for routine_name in names[1:]:
+                following = self.decode_cache.get(pc)
+                if following is None:
+                    try:
+                        following = self.decode_and_cache(pc)
+                    except (IndexError, KeyError):
+                        break
+                if following.handler.__name__ != routine_name:
+                    break
+                instructions.append(following)
+                pc = pc + following.length
+            else:
+                if condition is None or condition(instructions):
+                    handler = fuse(self, addr, instructions, self.fusion_counters[name])
+                    ins = FusedInstruction(name, handler, instructions)
+                    break
+
+        self.fusion_cache[addr] = ins
+        return ins
+
+
+    #Write the Python source for the basic block starting at storage address addr
+    #returns (lines, instructions, calls, end) - the body of the block, its decoded
+    #instructions, the indexes of those run by calling their instruction routine and
+    #the address following the block - or None if the instruction at addr cannot be
+    #decoded, which is left to the interpreter
+    def block_source(self, addr):
+        if addr == END_OF_PROGRAM:
+            return None
+
+        instructions = []
+        calls = []          #indexes of the instructions run by calling their instruction routine
+        lines = []
+        pc = addr
+        while len(instructions) < MAX_BLOCK_INSTRUCTIONS:
+            try:
+                ins = self.decode(self.storage, pc)
+            except (IndexError, KeyError):
+                break       #end the block before an instruction the interpreter has to reject
+            name = ins.handler.__name__
+            k = len(instructions)
+            next_address = pc + ins.length
+            leave = 'm.code_modified = False; m.program_counter = 0x%06X; return %d' % (next_address, k + 1)
+
+            source = self.source_code_dict.get('%06X' % pc)
+            if source is not None:
+                lines.append('# %06X %s' % (pc, source.replace('\r', ' ').replace('\n', ' ')))
+
+            translator = block_translators.get(name)
+            if translator is not None:
+                lines.extend(translator(ins, next_address, leave))
+            else:
+                #call the instruction routine - it expects the program counter to be its address
+                calls.append(k)
+                lines.append('m.program_counter = 0x%06X' % pc)
+                if name in BLOCK_END:
+                    lines.append('m.program_counter = H%d(I%d)' % (k, k))
+                else:
+                    lines.append('H%d(I%d)' % (k, k))
+                    lines.append('if m.code_modified: ' + leave)
+
+            instructions.append(ins)
+            pc = next_address
+            if name in BLOCK_END:
+                break
+
+        if not instructions:
+            return None
+        if instructions[-1].handler.__name__ not in BLOCK_END:
+            lines.append('m.program_counter = 0x%06X' % pc)      #fall through to the next block
+
+        return lines, instructions, calls, pc
+
+
+    #Translate the basic block starting at storage address addr and add it to blocks
+    #returns (block, number of instructions) or None if the instruction at addr
+    #cannot be decoded or its block keeps being dropped - that is left to the interpreter
+    def translate_block(self, addr):
+        if self.block_drops.get(addr, 0) >= MAX_BLOCK_DROPS:
+            return None
+        block = self.block_source(addr)
+        if block is None:
+            return None
+        lines, instructions, calls, end = block
+
+        namespace = dict(block_globals)
+        source = block_function('make_block', lines, calls, len(instructions))
+        exec(compile('\n'.join(source), '<block %06X>' % addr, 'exec'), namespace)
+        return self.add_block(addr, namespace['make_block'], instructions, end)
+
+
+    #Add the block made by make_block for the instructions from addr up to end to blocks
+    #returns (block, number of instructions)
+    def add_block(self, addr, make_block, instructions, end):
+        entry = (make_block(self, self.regs, self.storage, instructions), len(instructions))
+
+        self.blocks[addr] = entry
+        self.block_ends[addr] = end
+        block_map = self.block_map
+        for i in range(addr, end):
+            block_map.setdefault(i, []).append(addr)
+        if addr < self.decode_cache_low:
+            self.decode_cache_low = addr
+        if end > self.decode_cache_high:
+            self.decode_cache_high = end
+        self.watch(addr, end)
+        return entry
+
+
+    # Important:
+    # A zero in any of the X2, B1, or B2 fields indicates
+    # the absence of the corresponding address component.
+    # For the absent component, a zero is used in
+    # forming the address, regardless of the contents of
+    # general register 0. A displacement of zero has no
+    # special significance.
+
+    #Calculate an integer address - D(X,B) or D(B)
+    #the sum is truncated to a 24 bit address
+    def calc_address(self, B, D, X=0):
+        addr = D
+
+        if X != 0:
+            addr = addr + self.regs[X]
+
+        if B != 0:
+            addr = addr + self.regs[B]
+
+        return addr & 0xFFFFFF
+
+
+    #Return the program counter as a 6 digit hex string and the source line assembled there
+    def source_line(self, addr):
+        screen_program_counter = '%06X' % addr
+        return screen_program_counter, self.source_code_dict.get(screen_program_counter, '????')
+
+
+    #End the program, writing the end of program message to out
+    def end_program(self, message):
+        self.running = False
+        self.completion = message
+        print(message, file=self.out)
+
+
+    #Abend the program with abend code code, writing the reason and a dump to out
+    def abend(self, code, reason):
+        self.abend_code = code
+        self.end_program('Abnormal Program End - %s %s' % (code, reason))
+        for line in self.dump():
+            print(line, file=self.out)
+
+
+    #Return the PSW, instruction count and registers formatted as lines of text
+    def dump(self):
+        lines = ['PSW  CC=%d  INSTRUCTION ADDRESS=%06X  INSTRUCTIONS EXECUTED=%d' %
+                 (self.cond_code, self.program_counter, self.instruction_count)]
+        for i in range(0, 16, 4):
+            lines.append(('R%d-R%d' % (i, i + 3)).ljust(8) + ' '.join('%08X' % reg for reg in self.regs[i:i+4]))
+        return lines
+
+
+    #Fetch, decode and execute the instruction at the program counter
+    #returns False once the program has ended
+    def execute_next(self):
+        if not self.running:
+            return False
+
+        program_counter = self.program_counter
+
+        if program_counter == END_OF_PROGRAM:     #handle a 'BR    14' to normally exit this program
+            self.end_program('Normal Program End')
+            return False
+
+        ins = self.decode_cache.get(program_counter)
+        if ins is None:
+            try:
+                ins = self.decode_and_cache(program_counter)
+            except (IndexError, KeyError):
+                self.end_program('Abnormal Program End')
+                return False
+
+        if self.trace:
+            print('** Trace **: ', *self.source_line(program_counter), file=self.out)
+
+        self.program_counter = ins.handler(ins)
+        return True
+
+
+    #Execute one instruction - returns False once the program has ended
+    def step(self):
+        try:
+            if self.execute_next():
+                self.instruction_count += 1
+                return True
+        except (DecimalException, ProgramException) as e:
+            self.abend(e.code, e.reason)
+        return False
+
+
+    #Run until the program ends, a limit is reached, stop_check() stops it or max_instructions
+    #more instructions have been executed - returns the number of instructions executed
+    #the limits are only checked between groups of up to LIMIT_CHECK_INTERVAL instructions
+    #so they add nothing to the cost of each instruction. With a time limit the groups shrink
+    #to what runs in about LIMIT_CHECK_SECONDS, and an SVC 250 sleep stops at the limit
+    def run(self, max_instructions=None):
+        start = time.perf_counter()
+        deadline = None
+        if self.max_seconds is not None:
+            deadline = start + self.max_seconds - self.run_seconds
+        self.deadline = deadline
+        group = LIMIT_CHECK_INTERVAL        #instructions in the next group
+
+        self.stopped = False
+        count = 0
+        while self.running and not self.stopped:
+            numb = group
+            if max_instructions is not None:
+                numb = min(numb, max_instructions - count)
+                if numb <= 0:
+                    break
+
+            if self.max_instructions is not None:
+                remaining = self.max_instructions - self.instruction_count
+                if remaining <= 0:
+                    if self.program_counter == END_OF_PROGRAM:
+                        self.execute_next()      #a 'BR    14' is not counted - end normally
+                    else:
+                        self.abend('S322', 'instruction limit of %d exceeded' % self.max_instructions)
+                    break
+                numb = min(numb, remaining)
+
+            if deadline is not None:
+                group_start = time.perf_counter()
+                if group_start > deadline:
+                    self.abend('S322', TIME_LIMIT_REASON % self.max_seconds)
+                    break
+
+            executed = self.execute_instructions(numb)
+            self.instruction_count += executed
+            count = count + executed
+
+            if deadline is not None:
+                elapsed = time.perf_counter() - group_start
+                if elapsed > LIMIT_CHECK_SECONDS:
+                    group = max(1, int(executed * LIMIT_CHECK_SECONDS / elapsed))
+                else:
+                    group = min(group * 2, LIMIT_CHECK_INTERVAL)
+
+        self.deadline = None
+        self.run_seconds += time.perf_counter() - start
+        return count
+
+
+    #Execute up to numb instructions - returns the number executed
+    #tracing or a stop_check selects the instrumented loop, otherwise one of the bare loops runs,
+    #which do nothing per instruction but dispatch it. The choice is made again for each group
+    #of instructions run() executes, so trace and stop_check can be switched during a run
+    def execute_instructions(self, numb):
+        if self.trace or self.stop_check is not None:
+            return self.execute_instrumented(numb)
+        if self.translate:
+            return self.execute_blocks(numb)
+        if self.fuse:
+            return self.execute_fused(numb)
+        return self.execute_decoded(numb)
+
+
+    #Abend the program for the program interruption e after count instructions
+    #returns count
+    def program_interruption(self, e, count):
+        self.abend(e.code, e.reason)
+        return count
+
+
+    #Execute up to numb instructions one at a time through execute_next(), which prints
+    #each one when tracing. stop_check(machine) is called after each instruction - when it
+    #returns True the loop and run() stop before the next instruction, with stopped set
+    def execute_instrumented(self, numb):
+        count = 0
+        try:
+            while count != numb:
+                if not self.execute_next():
+                    break
+                count = count + 1
+                if self.stop_check is not None and self.stop_check(self):
+                    self.stopped = True
+                    break
+            return count
+        except (DecimalException, ProgramException) as e:
+            return self.program_interruption(e, count)
+
+
+    #Execute up to numb instructions a translated block per dispatch - what is not translated
+    #(the end of the program, an invalid instruction) and a block that would overrun numb
+    #go through execute_next()
+    def execute_blocks(self, numb):
+        count = 0
+        start = self.program_counter        #the address the block being run started at
+        blocks = self.blocks
+        try:
+            while count < numb:
+                start = self.program_counter
+                entry = blocks.get(start)
+                if entry is None:
+                    entry = self.translate_block(start)
+                if entry is None or count + entry[1] > numb:
+                    if not self.execute_next():
+                        break
+                    count = count + 1
+                else:
+                    count = count + entry[0]()
+            return count
+        except (DecimalException, ProgramException) as e:
+            #count the instructions of the block that ran before the interruption
+            return self.program_interruption(e, count + self.instructions_between(start, self.program_counter))
+
+
+    #Fetch - Decode - Execute Loop
+    #instructions already in the decode cache are executed directly; everything else
+    #(a cache miss, the end of the program) goes through execute_next()
+    def execute_decoded(self, numb):
+        count = 0
+        decode_cache = self.decode_cache
+        try:
+            while count != numb:
+                ins = decode_cache.get(self.program_counter)
+                if ins is None:
+                    if not self.execute_next():
+                        break
+                else:
+                    self.program_counter = ins.handler(ins)
+                count = count + 1
+            return count
+        except (DecimalException, ProgramException) as e:
+            return self.program_interruption(e, count)
+
+
+    #The same loop over fusion_cache, which runs a superinstruction as one step
+    #the last few instructions before numb are run one at a time so that no
+    #superinstruction overruns it
+    def execute_fused(self, numb):
+        count = 0
+        fusion_cache = self.fusion_cache
+        last = numb - MAX_FUSED_COUNT
+        try:
+            while count <= last:
+                ins = fusion_cache.get(self.program_counter)
+                if ins is None:
+                    ins = self.fuse_instruction(self.program_counter)
+                    if ins is None:
+                        if not self.execute_next():
+                            return count
+                        count = count + 1
+                        continue
+                self.program_counter = ins.handler(ins)
+                count = count + ins.count
+
+            while count != numb and self.execute_next():
+                count = count + 1
+            return count
+        except (DecimalException, ProgramException) as e:
+            return self.program_interruption(e, count)
+
+
+    #Return the number of instructions from storage address start up to end
+    def instructions_between(self, start, end):
+        numb = 0
+        while start < end:
+            start = start + format_length[self.mach_inst[self.storage[start]][0]]
+            numb = numb + 1
+        return numb
+
+
+    #Return {superinstruction name: number of times it has run}
+    def fusion_counts(self):
+        return {name: counter[0] for name, counter in sorted(self.fusion_counters.items())}
+
+
+    #Return how often each superinstruction has been run as lines of text
+    def fusion_report(self):
+        return ['%-8s %d' % (name, numb) for name, numb in self.fusion_counts().items()]
+
+
+    # -------------------------------------------------- #
+    # Instruction routines - each is called with its decoded Instruction
+    # and returns the address of the next instruction to execute
+    # -------------------------------------------------- #
+
+
+    #Add / Add Halfword / Add Register code
+    #Subtract / Subtract Halfword / Subtract Register code
+    def Add_Sub_code(self, ins, numb, AorS):
+        op1 = signed32(self.regs[ins.R1])
+
+        if numb == 4:
+            op2 = self.fetch_signed_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        elif numb == 2:
+            op2 = self.fetch_signed_halfword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        else:
+            op2 = signed32(self.regs[ins.R2])
+
+        if AorS == '+':
+            op1 = op1 + op2
+        elif AorS == '-':
+            op1 = op1 - op2
+
+        if op1 > 2147483647 or op1 < -2147483648:
+            self.cond_code = 3
+        elif op1 == 0:
+            self.cond_code = 0
+        elif op1 < 0:
+            self.cond_code = 1
+        elif op1 > 0:
+            self.cond_code = 2
+
+        self.regs[ins.R1] = op1 & 0xFFFFFFFF
+
+        return
+
+
+    #Add Logical / Add Logical Register code
+    #Subtract Logical / Subtract Logical Register code
+    def Add_Sub_Logical_code(self, ins, numb, AorS):
+        op1 = self.regs[ins.R1]
+
+        if numb != 0:
+            op2 = self.fetch_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        else:
+            op2 = self.regs[ins.R2]
+
+        #subtraction is performed by adding the one's complement of op2 plus one
+        if AorS == '+':
+            op1 = op1 + op2
+        elif AorS == '-':
+            op1 = op1 + (op2 ^ 0xFFFFFFFF) + 1
+
+        with_carry = op1 > 0xFFFFFFFF
+        op1 = op1 & 0xFFFFFFFF
+
+        if op1 != 0 and with_carry:
+            self.cond_code = 3
+        elif op1 == 0 and with_carry:
+            self.cond_code = 2
+        elif op1 != 0 and not with_carry:
+            self.cond_code = 1
+        else:
+            self.cond_code = 0
+
+        self.regs[ins.R1] = op1
+
+        return
+
+
+    #Compare / Compare Halfword / Compare Register
+    def Compare_code(self, ins, numb):
+        op1 = signed32(self.regs[ins.R1])
+
+        if numb == 4:
+            op2 = self.fetch_signed_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        elif numb == 2:
+            op2 = self.fetch_signed_halfword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        else:
+            op2 = signed32(self.regs[ins.R2])
+
+        if op1 == op2:
+            self.cond_code = 0
+        elif op1 < op2:
+            self.cond_code = 1
+        elif op1 > op2:
+            self.cond_code = 2
+
+        return
+
+
+    #Compare Logical / Compare Logical Immediate / Compare Logical Characters / Compare Logical Register
+    def Compare_Logical_code(self, ins, fmt):
+        self.cond_code = 0   #assume equal until proven otherwise
+
+        if fmt == 'RR':
+            op1 = self.regs[ins.R1]
+            op2 = self.regs[ins.R2]
+        elif fmt == 'RX':
+            op1 = self.regs[ins.R1]
+            op2 = self.fetch_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+        elif fmt == 'SI':
+            op1 = self.storage[self.calc_address(ins.B1, ins.D1)]
+            op2 = ins.I2
+        elif fmt == 'SS':
+            addr1 = self.calc_address(ins.B1, ins.D1)
+            addr2 = self.calc_address(ins.B3, ins.D3)
+            #only the bytes of both operands that are in storage are compared
+            numb = min(ins.LL + 1, len(self.storage) - addr1, len(self.storage) - addr2)
+            self.cond_code = compare_storage(self.storage, addr1, addr2, numb)
+            return
+
+        #unsigned comparison
+        if op1 < op2:
+            self.cond_code = 1
+        elif op1 > op2:
+            self.cond_code = 2
+
+        return
+
+
+    #Store / Store Character / Store Halfword
+    def Store_code(self, ins, numb):
+        dest = self.calc_address(ins.B2, ins.D2, ins.X2)
+
+        op1 = self.regs[ins.R1]
+
+        if numb == 4:
+            self.store_fullword(dest, op1)
+        elif numb == 2:
+            self.store_halfword(dest, op1)
+        elif numb == 1:
+            self.store_byte(dest, op1)
+
+        return
+
+
+    #AND / AND Character / AND Immediate / AND Register
+    #OR / OR Character / OR Immediate / OR Register
+    #XOR / XOR Character / XOR Immediate / XOR Register
+    #the operands are worked on whole as integers - up to 256 bytes for NC / OC / XC
+    def And_Or_Xor_code(self, ins, fmt, op):
+        if fmt == 'SS':
+            addr1 = self.calc_address(ins.B1, ins.D1)
+            addr2 = self.calc_address(ins.B3, ins.D3)
+            numb = ins.LL + 1
+            if addr1 == addr2 and op == '^':
+                #XC of a field with itself - the usual way of clearing it
+                self.store_bytes(addr1, bytes(numb))
+                self.cond_code = 0
+                return
+            op1 = int.from_bytes(self.storage[addr1:addr1+numb], 'big')
+            op2 = int.from_bytes(self.storage[addr2:addr2+numb], 'big')
+        elif fmt == 'SI':
+            addr1 = self.calc_address(ins.B1, ins.D1)
+            op1 = self.storage[addr1]
+            op2 = ins.I2
+        else:
+            op1 = self.regs[ins.R1]
+            if fmt == 'RR':
+                op2 = self.regs[ins.R2]
+            elif fmt == 'RX':
+                op2 = self.fetch_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+
+        if op == '&':
+            result = op1 & op2
+        elif op == '|':
+            result = op1 | op2
+        else:
+            result = op1 ^ op2
+
+        self.cond_code = 1 if result else 0
+
+        if fmt == 'SS':
+            self.store_bytes(addr1, result.to_bytes(numb, 'big'))
+        elif fmt == 'SI':
+            self.store_byte(addr1, result)
+        else:
+            self.regs[ins.R1] = result
+
+        return
+
+
+    #AP / SP / MP / ZAP
+    def Add_Sub_Mul_Packed_code(self, ins, op):
+        addr1 = self.calc_address(ins.B1, ins.D1)
+        op1 = self.storage[addr1:addr1+ins.L1+1]
+
+        addr2 = self.calc_address(ins.B3, ins.D3)
+        op2 = self.storage[addr2:addr2+ins.L2+1]
+
+        if op == '*':
+            result = multiply_packed(op1, op2)      #the condition code is unchanged
+        elif op == 'z':
+            result, self.cond_code = zero_and_add_packed(op1, op2)
+        else:
+            result, self.cond_code = add_packed(op1, op2, op == '-')
+
+        self.store_bytes(addr1, result)
+
+        return
+
+
+    #D / DR
+    def Divide_code(self, ins, fmt):
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
+
+        #the dividend is the 64 bit signed value held in the even/odd register pair
+        dividend = signed64((self.regs[even_reg] << 32) | self.regs[odd_reg])
+
+        dividend_is_positive = dividend >= 0
+        divisor_is_positive = True
+
+        if fmt == 'RR':
+            divisor = signed32(self.regs[ins.R2])
+        elif fmt == 'RX':
+            divisor = self.fetch_signed_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+
+        if divisor < 0:
+            divisor_is_positive = False
+
+        quotient = abs(dividend) // abs(divisor)
+        remainder = abs(dividend) % abs(divisor)
+
+        if (dividend_is_positive and (not divisor_is_positive)) or ((not dividend_is_positive) and divisor_is_positive):
+            quotient = quotient * -1
+
+        if not dividend_is_positive:
+            remainder = remainder * -1
+
+        self.regs[even_reg] = unsigned32(remainder)
+        self.regs[odd_reg] = unsigned32(quotient)
+
+        return
+
+
+    #M / MR
+    def Multiply_code(self, ins, fmt, numb):
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
+
+        multiplicand = signed32(self.regs[odd_reg])
+
+        if fmt == 'RR':
+            multiplier = signed32(self.regs[ins.R2])
+        elif fmt == 'RX':
+            multiplier = self.fetch_signed_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+
+        product = unsigned64(multiplicand * multiplier)
+
+        self.regs[even_reg] = product >> 32
+        self.regs[odd_reg] = product & 0xFFFFFFFF
+
+        return
+
+
+    #BXH / BXLE
+    def Branch_on_Index_code(self, ins, HorLE):
+        op1 = signed32(self.regs[ins.R1])
+
+        #if op3 (R2) is even, then a register pair are used as the increment and the compare value
+        if (ins.R2 % 2) == 0:
+            op3_increment_reg = ins.R2
+            op3_compare_reg = ins.R2 + 1
+        #if op3 (R2) is odd, then a single register is used as both the increment and the compare value
+        else:
+            op3_increment_reg = ins.R2
+            op3_compare_reg = ins.R2
+
+        op3_increment_val = signed32(self.regs[op3_increment_reg])
+
+        #the compare value is fetched before R1 is updated, since R1 may be the compare register
+        op3_compare_val = signed32(self.regs[op3_compare_reg])
+
+        sum = signed32((op1 + op3_increment_val) & 0xFFFFFFFF)
+        self.regs[ins.R1] = sum & 0xFFFFFFFF
+
+        if HorLE == 'H':
+            if (sum - op3_compare_val) <= 0:
+                return self.program_counter + ins.length
+            else:
+                return self.calc_address(ins.B2, ins.D2)
+        elif HorLE == 'LE':
+            if (sum - op3_compare_val) <= 0:
+                return self.calc_address(ins.B2, ins.D2)
+            else:
+                return self.program_counter + ins.length
+
+
+
+    #ED / EDMK
+    #each pattern byte after the fill character is replaced as ed_transitions gives for its class,
+    #the significance indicator, the source digit and the sign - see ed_transition()
+    def ED_EDMK_code(self, ins, EDorEDMK):
+        pattern_addr = self.calc_address(ins.B1, ins.D1)
+        pattern_len = ins.LL + 1
+        result = self.storage[pattern_addr:pattern_addr+pattern_len]
+        fill_char = result[0]
+
+        storage = self.storage
+        source_addr = self.calc_address(ins.B3, ins.D3)
+
+        sig = 0                     #significance indicator
+        right_digit = -1            #the right digit of the source byte, once its left digit is used
+        plus = 0                    #1 if the source byte in use ends in a plus sign
+        field_nonzero = False       #a nonzero source digit has been fetched since the last field separator
+        first_significant = 0       #EDMK - offset of the first significant digit
+
+        for pp in range(1, pattern_len):
+            cls = ed_pattern_class[result[pp]]
+            if cls > ED_SIGNIFICANCE_STARTER:
+                action, sig, mark = ed_transitions[cls << 3 | sig << 2]
+                if cls == ED_FIELD_SEPARATOR:
+                    field_nonzero = False
+                if action == ED_FILL:
+                    result[pp] = fill_char
+                continue
+
+            #the next source digit - a right digit A - F is the sign of the left digit
+            if right_digit >= 0:
+                digit = right_digit
+                right_digit = -1
+            else:
+                source_byte = storage[source_addr]
+                source_addr = source_addr + 1
+                digit = source_byte >> 4
+                if digit > 9:
+                    raise DecimalException(DATA_EXCEPTION, 'invalid digit')
+                if source_byte & 0x0F > 9:
+                    plus = SIGNS[source_byte] > 0
+                    field_nonzero = field_nonzero or digit != 0
+                else:
+                    plus = 0
+                    right_digit = source_byte & 0x0F
+                    field_nonzero = field_nonzero or source_byte != 0
+
+            action, sig, mark = ed_transitions[cls << 3 | sig << 2 | (digit != 0) << 1 | plus]
+            if action == ED_DIGIT:
+                result[pp] = 0xF0 | digit
+            elif action == ED_FILL:
+                result[pp] = fill_char
+            if mark and not first_significant:
+                first_significant = pp
+
+        self.store_bytes(pattern_addr, result)
+
+        if not field_nonzero:
+            self.cond_code = 0
+        elif plus:
+            self.cond_code = 2
+        else:
+            self.cond_code = 1
+
+        if EDorEDMK == 'EDMK' and first_significant:
+            #for EDMK instruction - the address of the first significant digit is
+            #recorded in bits 8-31 of general register 1, which is left unchanged
+            #when no nonzero digit turned significance on
+            self.regs[1] = (self.regs[1] & 0xFF000000) | (pattern_addr + first_significant)
+
+        return
+
+    # -------------------------------------------------- #
+
+    #Add
+    def A(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_code(ins, 4, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Add Halfword
+    def AH(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_code(ins, 2, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Add Logical
+    def AL(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_Logical_code(ins, 4, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Add Logical Register
+    def ALR(self, ins):
+        #OC,R1,R2
+        self.Add_Sub_Logical_code(ins, 0, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Add Register
+    def AR(self, ins):
+        #OC,R1,R2
+        self.Add_Sub_code(ins, 0, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Add Packed
+    def AP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+        self.Add_Sub_Mul_Packed_code(ins, '+')
+
+        return self.program_counter + ins.length
+
+
+    #Branch and Link
+    def BAL(self, ins):
+        #OC,R1,X2,B2,D2
+        self.regs[ins.R1] = self.program_counter + ins.length
+
+        return self.calc_address(ins.B2, ins.D2, ins.X2)
+
+
+    #Branch and Link (Register)
+    def BALR(self, ins):
+        #OC,R1,R2
+        next_address = self.program_counter + ins.length
+        target = self.regs[ins.R2] & 0xFFFFFF    #fetched before linking in case R1 == R2
+        self.regs[ins.R1] = next_address
+        if ins.R2 == 0:
+            return next_address
+        else:
+            return target
+
+
+    #Branch on Condition
+    def BC(self, ins):
+        #OC,R1,X2,B2,D2
+        if branch_mask[ins.R1][self.cond_code]:   # R1 = mask1
+            return self.calc_address(ins.B2, ins.D2, ins.X2)
+
+        return self.program_counter + ins.length
+
+
+    #Branch on Condition (Register)
+    def BCR(self, ins):
+        #OC,R1,R2
+        if ins.R2 != 0 and branch_mask[ins.R1][self.cond_code]:   # R1 = mask1
+            return self.regs[ins.R2] & 0xFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Branch on Count
+    def BCT(self, ins):
+        #OC,R1,X2,B2,D2
+        target = self.calc_address(ins.B2, ins.D2, ins.X2)
+        self.regs[ins.R1] = (self.regs[ins.R1] - 1) & 0xFFFFFFFF
+
+        if self.regs[ins.R1] == 0:
+            return self.program_counter + ins.length
+        else:
+            return target
+
+
+    #Branch on Count Register
+    def BCTR(self, ins):
+        #OC,R1,R2
+        target = self.regs[ins.R2] & 0xFFFFFF
+        self.regs[ins.R1] = (self.regs[ins.R1] - 1) & 0xFFFFFFFF
+
+        if self.regs[ins.R1] == 0:
+            return self.program_counter + ins.length
+        else:
+            if ins.R2 == 0:
+                return self.program_counter + ins.length
+            else:
+                return target
+
+
+    #Branch on Index High
+    def BXH(self, ins):
+        #OC,R1,R2,B2,D2
+
+        return self.Branch_on_Index_code(ins, 'H')
+
+
+    #Branch on Index Low or Equal
+    def BXLE(self, ins):
+        #OC,R1,R2,B2,D2
+
+        return self.Branch_on_Index_code(ins, 'LE')
+
+
+    #Compare
+    def C(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Compare_code(ins, 4)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Halfword
+    def CH(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Compare_code(ins, 2)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical
+    def CL(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Compare_Logical_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical Characters
+    def CLC(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.Compare_Logical_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical Characters Long
+    def CLCL(self, ins):
+        #OC,R1,R2
+
+        first_op_addr = self.regs[ins.R1] & 0xFFFFFF
+        first_op_len = self.regs[ins.R1+1] & 0xFFFFFF
+        secnd_op_addr = self.regs[ins.R2] & 0xFFFFFF
+        pad_char = self.regs[ins.R2+1] >> 24
+        secnd_op_len = self.regs[ins.R2+1] & 0xFFFFFF
+
+        storage = self.storage
+        if first_op_addr + first_op_len > len(storage) or secnd_op_addr + secnd_op_len > len(storage):
+            raise IndexError('storage address out of range')
+
+        #compare the bytes both operands have, then the rest of the longer one with the pad byte
+        numb = min(first_op_len, secnd_op_len)
+        equal = storage_difference(storage, first_op_addr, secnd_op_addr, numb)
+        if equal < numb:
+            self.cond_code = 1 if storage[first_op_addr+equal] < storage[secnd_op_addr+equal] else 2
+        else:
+            if first_op_len > secnd_op_len:
+                rest_addr, rest_len = first_op_addr + numb, first_op_len - numb
+            else:
+                rest_addr, rest_len = secnd_op_addr + numb, secnd_op_len - numb
+            padded = pad_difference(storage, rest_addr, rest_len, pad_char)
+            equal = numb + padded
+            if padded == rest_len:
+                self.cond_code = 0
+            elif (storage[rest_addr+padded] < pad_char) == (first_op_len > secnd_op_len):
+                self.cond_code = 1
+            else:
+                self.cond_code = 2
+
+        #the addresses step past and the lengths count down the bytes that compared equal,
+        #an operand used up while padding stops at its end - bits 0-7 of R1+1 and R2+1 are unchanged
+        first_used = min(equal, first_op_len)
+        secnd_used = min(equal, secnd_op_len)
+        self.regs[ins.R1] = (first_op_addr + first_used) & 0xFFFFFF
+        self.regs[ins.R1+1] = (self.regs[ins.R1+1] & 0xFF000000) | (first_op_len - first_used)
+        self.regs[ins.R2] = (secnd_op_addr + secnd_used) & 0xFFFFFF
+        self.regs[ins.R2+1] = (self.regs[ins.R2+1] & 0xFF000000) | (secnd_op_len - secnd_used)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical Immediate
+    def CLI(self, ins):
+        #OC,I2,B1,D1
+        self.Compare_Logical_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical under Mask
+    def CLM(self, ins):
+        #OC,R1,R2,B2,D2
+
+        positions = mask_bytes[ins.R2]   #R2 = M3
+
+        if not positions:
+            self.cond_code = 0
+            return self.program_counter + ins.length
+
+        reg_bytes = self.regs[ins.R1].to_bytes(4, 'big')
+        op1 = bytes([reg_bytes[i] for i in positions])   #the register bytes selected by the mask
+
+        addr = self.calc_address(ins.B2, ins.D2)
+        op2 = self.storage[addr:addr+len(positions)]
+        if len(op2) != len(op1):
+            raise IndexError('storage address out of range')
+
+        self.cond_code = compare_code(op1, op2)
+
+        return self.program_counter + ins.length
+
+
+    #Compare Logical Register
+    def CLR(self, ins):
+        #OC,R1,R2
+        self.Compare_Logical_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Compared Packed
+    def CP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+
+        addr1 = self.calc_address(ins.B1, ins.D1)
+        addr2 = self.calc_address(ins.B3, ins.D3)
+
+        self.cond_code = compare_packed(self.storage[addr1:addr1+ins.L1+1], self.storage[addr2:addr2+ins.L2+1])
+
+        return self.program_counter + ins.length
+
+
+    #Compare Register
+    def CR(self, ins):
+        #OC,R1,R2
+        self.Compare_code(ins, 0)
+
+        return self.program_counter + ins.length
+
+
+    #Compare and Swap
+    def CS(self, ins):
+        #OC,R1,R2,B2,D2
+
+        op1 = self.regs[ins.R1]
+
+        addr = self.calc_address(ins.B2, ins.D2)
+        op2 = self.fetch_fullword(addr)
+
+        if op1 == op2:
+            self.store_fullword(addr, self.regs[ins.R2])
+            self.cond_code = 0
+        else:
+            self.regs[ins.R1] = op2
+            self.cond_code = 1
+
+        return self.program_counter + ins.length
+
+
+    #Compare Double and Swap
+    def CDS(self, ins):
+        #OC,R1,R2,B2,D2
+
+        op1 = (self.regs[ins.R1] << 32) | self.regs[ins.R1+1]
+
+        addr = self.calc_address(ins.B2, ins.D2)
+        op2 = self.fetch_doubleword(addr)
+
+        if op1 == op2:
+            op3 = (self.regs[ins.R2] << 32) | self.regs[ins.R2+1]
+
+            self.store_doubleword(addr, op3)
+            self.cond_code = 0
+        else:
+            self.regs[ins.R1] = op2 >> 32
+            self.regs[ins.R1+1] = op2 & 0xFFFFFFFF
+            self.cond_code = 1
+
+        return self.program_counter + ins.length
+
+
+    #Convert to Binary
+    def CVB(self, ins):
+        #OC,R1,X2,B2,D2
+
+        addr = self.calc_address(ins.B2, ins.D2, ins.X2)
+        op2_int, fits = convert_to_binary(self.storage[addr:addr+8])
+
+        self.regs[ins.R1] = op2_int & 0xFFFFFFFF
+        if not fits:
+            raise DecimalException(FIXED_POINT_DIVIDE_EXCEPTION, 'CVB result too large')
+
+        return self.program_counter + ins.length
+
+
+    #Convert to Decimal
+    def CVD(self, ins):
+        #OC,R1,X2,B2,D2
+
+        self.store_bytes(self.calc_address(ins.B2, ins.D2, ins.X2), convert_to_decimal(signed32(self.regs[ins.R1])))
+
+        return self.program_counter + ins.length
+
+
+    #Divide
+    def D(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Divide_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Divide Packed
+    def DP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+
+        addr1 = self.calc_address(ins.B1, ins.D1)
+        addr2 = self.calc_address(ins.B3, ins.D3)
+
+        self.store_bytes(addr1, divide_packed(self.storage[addr1:addr1+ins.L1+1], self.storage[addr2:addr2+ins.L2+1]))
+
+        return self.program_counter + ins.length
+
+
+    #Divide Register
+    def DR(self, ins):
+        #OC,R1,R2
+        self.Divide_code(ins, ins.format)
+
+        return self.program_counter + ins.length
+
+
+    #Edit
+    def ED(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.ED_EDMK_code(ins, 'ED')
+
+        return self.program_counter + ins.length
+
+
+    #Edit and Mark
+    def EDMK(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.ED_EDMK_code(ins, 'EDMK')
+
+        return self.program_counter + ins.length
+
+
+    #Insert Character
+    def IC(self, ins):
+        #OC,R1,X2,B2,D2
+
+        op2 = self.storage[self.calc_address(ins.B2, ins.D2, ins.X2)]
+
+        self.regs[ins.R1] = (self.regs[ins.R1] & 0xFFFFFF00) | op2
+
+        return self.program_counter + ins.length
+
+
+    #Insert Character under Mask
+    def ICM(self, ins):
+            #OC,R1,R2,B2,D2
+
+        self.cond_code = 0   #force cc to - All inserted bits are zeros, or mask is zero
+
+    # Note: NOT implementing cond_code setting at this time -
+    #  "The resulting condition code is based on the mask
+    #  and on the value of the bits inserted. When the mask
+    #  is zero or when all inserted bits are zero, the condition
+    #  code is made O. When all inserted bits are not
+    #  zero, the code is set according to the leftmost bit of
+    #  the storage operand: if this bit is one, the code is
+    #  made 1 to indicate a negative algebraic value; if this
+    #  bit is zero, the code is made 2, reflecting a positive
+    #  algebraic value."
+
+        _M3 = ins.R2
+
+        mask = list(bin(_M3).lstrip('0b').rjust(4,'0'))
+        numb = mask.count('1')
+
+        if numb == 0:
+            return self.program_counter + ins.length
+
+        op1_list = bytearray(self.regs[ins.R1].to_bytes(4, 'big'))  #make list of ins.R1 bytes
+
+        addr = self.calc_address(ins.B2, ins.D2)
+        op2_list = self.storage[addr:addr+numb]   #make list storage bytes
+
+        j = 0
+        for i in range(0,4):
+            if mask[i] == '1':
+                op1_list[i] = op2_list[j]
+                j = j + 1
+
+        self.regs[ins.R1] = int.from_bytes(op1_list, 'big')
+
+        return self.program_counter + ins.length
+
+
+    #Load
+    def L(self, ins):
+        #OC,R1,X2,B2,D2
+        self.regs[ins.R1] = self.fetch_fullword(self.calc_address(ins.B2, ins.D2, ins.X2))
+
+        return self.program_counter + ins.length
+
+
+    #Load Address
+    def LA(self, ins):
+        #OC,R1,X2,B2,D2
+        self.regs[ins.R1] = self.calc_address(ins.B2, ins.D2, ins.X2)
+
+        return self.program_counter + ins.length
+
+
+    #Load Complement
+    def LCR(self, ins):
+        #OC,R1,R2
+
+        op2 = signed32(self.regs[ins.R2]) * -1
+
+        if op2 == 0:
+            self.cond_code = 0    #Result is zero
+        elif op2 == 2147483648:
+            self.cond_code = 3    #Overflow, the maximum negative number is unchanged
+        elif op2 < 0:
+            self.cond_code = 1    #Result is less than zero
+        elif op2 > 0:
+            self.cond_code = 2    #Result is greater than zero
+
+        self.regs[ins.R1] = op2 & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Load Halfword
+    def LH(self, ins):
+        #OC,R1,X2,B2,D2
+        #the halfword is extended to a fullword by propagating the sign bit
+        self.regs[ins.R1] = self.fetch_signed_halfword(self.calc_address(ins.B2, ins.D2, ins.X2)) & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Load Multiple
+    def LM(self, ins):
+        #OC,R1,R2,B2,D2
+
+        addr = self.calc_address(ins.B2, ins.D2)
+
+        starting_reg = ins.R1
+        ending_reg = ins.R2
+
+        j = starting_reg
+
+        while True:
+            self.regs[j] = self.fetch_fullword(addr)
+            addr = addr + 4
+            j = j + 1
+            if j > 15:
+                j = 0
+            if j == ending_reg+1:
+                break
+
+        return self.program_counter + ins.length
+
+
+    #Load Negative
+    def LNR(self, ins):
+        #OC,R1,R2
+
+        op2 = signed32(self.regs[ins.R2])
+
+        if op2 == 0:
+            self.regs[ins.R1] = 0
+            self.cond_code = 0   #Result is zero
+        elif op2 < 0:
+            self.regs[ins.R1] = self.regs[ins.R2]
+            self.cond_code = 1   #Result is less than zero
+        elif op2 > 0:
+            self.regs[ins.R1] = (op2 * -1) & 0xFFFFFFFF
+            self.cond_code = 1   #Result is less than zero
+
+        return self.program_counter + ins.length
+
+
+    #Load Positive
+    def LPR(self, ins):
+        #OC,R1,R2
+
+        op2 = signed32(self.regs[ins.R2])
+
+        if op2 == 0:
+            self.regs[ins.R1] = 0
+            self.cond_code = 0   #Result is zero
+        elif op2 > 0:
+            self.regs[ins.R1] = op2
+            self.cond_code = 2   #Result is greater than zero
+        elif op2 < 0:
+            if op2 == -2147483648:
+                self.cond_code = 3    #Overflow
+            else:
+                self.cond_code = 2   #Result is greater than zero
+            self.regs[ins.R1] = (op2 * -1) & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Load (Register)
+    def LR(self, ins):
+        #OC,R1,R2
+        self.regs[ins.R1] = self.regs[ins.R2]
+
+        return self.program_counter + ins.length
+
+
+    #Load and Test Register
+    def LTR(self, ins):
+        #OC,R1,R2
+        if ins.R1 != ins.R2:
+            self.regs[ins.R1] = self.regs[ins.R2]
+
+        op1 = signed32(self.regs[ins.R1])
+
+        if op1 == 0:
+            self.cond_code = 0
+        elif op1 < 0:
+            self.cond_code = 1
+        elif op1 > 0:
+            self.cond_code = 2
+
+        return self.program_counter + ins.length
+
+
+    #Multiply
+    def M(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Multiply_code(ins, ins.format, 4)
+
+        return self.program_counter + ins.length
+
+
+    #Multiply halfword
+    def MH(self, ins):
+        #OC,R1,X2,B2,D2
+
+        multiplicand = signed32(self.regs[ins.R1])
+
+        multiplier = self.fetch_signed_halfword(self.calc_address(ins.B2, ins.D2, ins.X2))
+
+        #only the rightmost 32 bits of the product are kept
+        self.regs[ins.R1] = (multiplicand * multiplier) & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Multiply Packed
+    def MP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+        self.Add_Sub_Mul_Packed_code(ins, '*')
+
+        return self.program_counter + ins.length
+
+
+    #Multiply Register
+    def MR(self, ins):
+        #OC,R1,R2
+        self.Multiply_code(ins, ins.format, 4)
+
+        return self.program_counter + ins.length
+
+
+    #Move Characters
+    def MVC(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.move_characters(self.calc_address(ins.B1, ins.D1), self.calc_address(ins.B3, ins.D3), ins.LL+1)
+
+        return self.program_counter + ins.length
+
+
+    #Move Long
+    def MVCL(self, ins):
+        #OC,R1,R2
+
+        first_op_addr = self.regs[ins.R1] & 0xFFFFFF
+        first_op_len = self.regs[ins.R1+1] & 0xFFFFFF
+        secnd_op_addr = self.regs[ins.R2] & 0xFFFFFF
+        pad_char = self.regs[ins.R2+1] >> 24
+        secnd_op_len = self.regs[ins.R2+1] & 0xFFFFFF
+        moved = min(first_op_len, secnd_op_len)
+
+        #Destructive overlap - the first operand starts inside the part of the second operand
+        #that is moved, so bytes would be moved again after being stored into: nothing is moved
+        if 0 < ((first_op_addr - secnd_op_addr) & 0xFFFFFF) < moved:
+            self.cond_code = 3
+            return self.program_counter + ins.length
+
+        if first_op_len == secnd_op_len:
+            self.cond_code = 0
+        elif first_op_len < secnd_op_len:
+            self.cond_code = 1
+        else:
+            self.cond_code = 2
+
+        if first_op_len > 0:
+            end = first_op_addr + first_op_len
+            if end > len(self.storage) or secnd_op_addr + moved > len(self.storage):
+                raise IndexError('storage address out of range')
+            #any other overlap moves as if one byte at a time, which a copy of the second operand gives
+            self.storage[first_op_addr:first_op_addr+moved] = self.storage[secnd_op_addr:secnd_op_addr+moved]
+            self.storage[first_op_addr+moved:end] = bytes((pad_char,)) * (first_op_len - moved)
+            self.invalidate_decode_cache(first_op_addr, first_op_len)
+
+        #the addresses step past the bytes used, the lengths count down and bits 0-7 of R1+1 and R2+1 are unchanged
+        self.regs[ins.R1] = (first_op_addr + first_op_len) & 0xFFFFFF
+        self.regs[ins.R1+1] = self.regs[ins.R1+1] & 0xFF000000
+        self.regs[ins.R2] = (secnd_op_addr + moved) & 0xFFFFFF
+        self.regs[ins.R2+1] = (self.regs[ins.R2+1] & 0xFF000000) | (secnd_op_len - moved)
+
+        return self.program_counter + ins.length
+
+
+    #Move Immediate
+    def MVI(self, ins):
+        #OC,I2,B1,D1
+        self.store_byte(self.calc_address(ins.B1, ins.D1), ins.I2)
+
+        return self.program_counter + ins.length
+
+
+    #Move Numerics
+    def MVN(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.move_nibbles(self.calc_address(ins.B1, ins.D1), self.calc_address(ins.B3, ins.D3), ins.LL+1, 0x0F)
+
+        return self.program_counter + ins.length
+
+
+    #Move Offset
+    def MVO(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+        dest = self.calc_address(ins.B1, ins.D1)
+        source = self.calc_address(ins.B3, ins.D3)
+        numb = ins.L1 + 1
+        #the second operand shifted left 4 bits over the sign of the first operand, high-order digits that do not fit are lost
+        value = (int.from_bytes(self.storage[source:source+ins.L2+1], 'big') << 4) | (self.storage[dest+ins.L1] & 0x0F)
+        self.store_bytes(dest, (value & ((1 << (numb * 8)) - 1)).to_bytes(numb, 'big'))
+
+        return self.program_counter + ins.length
+
+
+    #Move Zones
+    def MVZ(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.move_nibbles(self.calc_address(ins.B1, ins.D1), self.calc_address(ins.B3, ins.D3), ins.LL+1, 0xF0)
+
+        return self.program_counter + ins.length
+
+
+    #AND
+    def N(self, ins):
+        #OC,R1,X2,B2,D2
+        self.And_Or_Xor_code(ins, ins.format, '&')
+
+        return self.program_counter + ins.length
+
+
+    #AND Characters
+    def NC(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.And_Or_Xor_code(ins, ins.format, '&')
+
+        return self.program_counter + ins.length
+
+
+    #AND Immediate
+    def NI(self, ins):
+        #OC,I2,B1,D1
+        self.And_Or_Xor_code(ins, ins.format, '&')
+
+        return self.program_counter + ins.length
+
+
+    #AND Register
+    def NR(self, ins):
+        #OC,R1,R2
+        self.And_Or_Xor_code(ins, ins.format, '&')
+
+        return self.program_counter + ins.length
+
+
+    #OR
+    def O(self, ins):
+        #OC,R1,X2,B2,D2
+        self.And_Or_Xor_code(ins, ins.format, '|')
+
+        return self.program_counter + ins.length
+
+
+    #OR Characters
+    def OC(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.And_Or_Xor_code(ins, ins.format, '|')
+
+        return self.program_counter + ins.length
+
+
+    #OR Immediate
+    def OI(self, ins):
+        #OC,I2,B1,D1
+        self.And_Or_Xor_code(ins, ins.format, '|')
+
+        return self.program_counter + ins.length
+
+
+    #OR Register
+    def OR(self, ins):
+        #OC,R1,R2
+        self.And_Or_Xor_code(ins, ins.format, '|')
+
+        return self.program_counter + ins.length
+
+
+    #Pack
+    def PACK(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+
+        addr1 = self.calc_address(ins.B1, ins.D1)
+        addr2 = self.calc_address(ins.B3, ins.D3)
+
+        self.store_bytes(addr1, pack(self.storage[addr2:addr2+ins.L2+1], ins.L1+1))
+
+        return self.program_counter + ins.length
+
+
+    #Subtract
+    def S(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_code(ins, 4, '-')
+
+        return self.program_counter + ins.length
+
+
+    #Subtract Halfword
+    def SH(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_code(ins, 2, '-')
+
+        return self.program_counter + ins.length
+
+
+    #Subtract Logical
+    def SL(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Add_Sub_Logical_code(ins, 4, '-')
+
+        return self.program_counter + ins.length
+
+
+    #Shift Left Single
+    def SLA(self, ins):
+        #OC,R1,X2,B2,D2
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        self.regs[ins.R1], self.cond_code = shift_left_arithmetic(self.regs[ins.R1], shift, 32)
+
+        return self.program_counter + ins.length
+
+
+    #Shift Left Double
+    def SLDA(self, ins):
+        #OC,R1,X2,B2,D2
+
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
+
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        r64, self.cond_code = shift_left_arithmetic((self.regs[even_reg] << 32) | self.regs[odd_reg], shift, 64)
+
+        self.regs[even_reg] = r64 >> 32
+        self.regs[odd_reg] = r64 & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Shift Left Double Logical
+    def SLDL(self, ins):
+        #OC,R1,X2,B2,D2
+
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
+
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        r64 = (((self.regs[even_reg] << 32) | self.regs[odd_reg]) << shift) & 0xFFFFFFFFFFFFFFFF
+
+        self.regs[even_reg] = r64 >> 32
+        self.regs[odd_reg] = r64 & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Shift Left Single Logical
+    def SLL(self, ins):
+        #OC,R1,X2,B2,D2
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        self.regs[ins.R1] = (self.regs[ins.R1] << shift) & 0xFFFFFFFF
+
+        return self.program_counter + ins.length
+
+
+    #Subtract Logical Register
+    def SLR(self, ins):
+        #OC,R1,R2
+        self.Add_Sub_Logical_code(ins, 0, '-')
+
+        return self.program_counter + ins.length
+
 
-#unpickle the source code dictionary 
-source_code_dict = pickle.load( open( "sourcecode.p", "rb" ) )
+    #Subtract Packed
+    def SP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+        self.Add_Sub_Mul_Packed_code(ins, '-')
 
-#unpickle the symbol dictionary 
-symbol_dict = pickle.load( open( "symdict.p", "rb" ) )
+        return self.program_counter + ins.length
 
-#unpickle the instructions and data list 
-instrdata_list = pickle.load( open( "instrdata.p", "rb" ) )
 
+    #Subtract Register
+    def SR(self, ins):
+        #OC,R1,R2
+        self.Add_Sub_code(ins, 0, '-')
 
-# Here is a sample program to emulate / debug: 
-#
-# source_code_dict = {'000000': '         BALR  R12,0', 
-#                     '000002': '         LA    R3,AREA1', 
-#                     '000006': '         LA    R4,4', 
-#                     '00000A': "LOOP     MVI   0(R3),C'0'", 
-#                     '00000E': '         LA    R3,1(R3)', 
-#                     '000012': '         BCT   R4,LOOP', 
-#                     '000016': '         LA    R15,0', 
-#                     '00001A': '         BR    R14'}
-#
-# symbol_dict = {'AREA1   ': ('0000001C', '00000004')}
-#
-# instrdata_list =
-# 000000 ['05', 'C0',             |          BALR  R12,0 
-# 000002                          |          USING *,R12
-# 000002  '41', '30', 'C0', '1A', |          LA    R3,AREA1
-# 000006  '41', '40', '00', '04', |          LA    R4,4
-# 00000A  '92', 'F0', '30', '00', | LOOP     MVI   0(R3),C'0'
-# 00000E  '41', '33', '00', '01', |          LA    R3,1(R3)
-# 000012  '46', '40', 'C0', '08', |          BCT   R4,LOOP
-# 000016  '41', 'F0', '00', '00', |          LA    R15,0
-# 00001A  '07', 'FE',             |          BR    R14
-# 00001C  'FF', 'FF', 'FF', 'FF'] | AREA1    DC    XL4'FFFFFFFF'
-#
-# The 3 data structures: source_code_dict, symbol_dict and instrdata_list
-# are created in Z390-ProcessPRN_OBJ.py or MVS38J-ProcessPRN_OBJ.py.
-# They are created from the TXT object deck and its assembler listing PRN file 
-# produced from the Z390 Portable Mainframe Assembler and Emulator 
-# (Copyright 2011-13 Automated Software Tools Corporation) or the MVS 3.8J assembler.
-#
-# Notes:
-#
-# addresses are represented as positive integers in a register
-# all other values in registers are represented as 4 byte hex strings or signed integers
-# depending on what instruction last operated on the register
+        return self.program_counter + ins.length
 
-#
-# 31 bit signed integers represented as follows:
-# 80 00 00 00 (-2,147,483,648) ---> 00 00 00 00 (zero) ---> 7F FF FF FF (+2,147,483,647)
-# negative numbers are represented in two's complement form
-# if the sum/difference/product > ABS(2,147,483,647) then overflow
-#
 
-regs = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, '000EEEEE', 15]
+    #Shift Right Single
+    def SRA(self, ins):
+        #OC,R1,X2,B2,D2
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        self.regs[ins.R1], self.cond_code = shift_right_arithmetic(self.regs[ins.R1], shift, 32)
 
-# Important:
-#R14 is set initially to 0x0EEEEE' (978,670 dec) as the return address. 
-#If you plan to use R14, then you must save R14 and restore it before a 
-#'BR     14' is performed to exit this program and return control to the OS 
+        return self.program_counter + ins.length
 
-cond_code = ['0','0','0','0']
- 
-program_counter = 0 
 
-save_program_counter = 0
+    #Shift Right Double
+    def SRDA(self, ins):
+        #OC,R1,X2,B2,D2
 
-Execute_list = []
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
 
-Debug = False
-Trace = False
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        r64, self.cond_code = shift_right_arithmetic((self.regs[even_reg] << 32) | self.regs[odd_reg], shift, 64)
 
-term_output = ''
+        self.regs[even_reg] = r64 >> 32
+        self.regs[odd_reg] = r64 & 0xFFFFFFFF
 
-# Process Command Line parameters
-#  -debug  enables the interactive Curses-based debugger
-#  -trace  enables the trace facility
-if len(sys.argv)-1 > 0:
-    if '-debug' in sys.argv:
-        Debug = True
-    if '-trace' in sys.argv:
-        Trace = True
-        
-# Important:
-# A zero in any of the X2, B1, or B2 fields indicates
-# the absence of the corresponding address component.
-# For the absent component, a zero is used in
-# forming the address, regardless of the contents of
-# general register 0. A displacement of zero has no
-# special significance.
-
-#Calculate an integer address - D(X,B) or D(B) 
-def calc_address(B, D, X=0):
-    addr = D
-    
-    if X != 0:
-        addr = addr + cast_to_type(regs[X],int)
-            
-    if B != 0:
-        addr = addr + cast_to_type(regs[B],int)
-            
-    return addr
-
-
-#Convert 8, 4 or 2 byte hex string in two's complement format to a negative signed integer
-def cvt2scomp(x):
-    #x in format: 'FFFFFFFFFFFFFFFD' (doubleword) or 'FFFFFFFD' (fullword) or 'FFFD' (halfword)
-    #convert x to binary string
-    b = bin(int(x,16))[2:]
-    if len(b) == 16:
-        b = b[0]*16 + b   #expand halfword by propagating the leftmost (sign) bit 16 positions to the left.
-    #flip the bits in b creating num1 
-    num1 = ''
-    for bit in b:
-        if bit == '0':
-            num1 = num1 + '1'
-        else:
-            num1 = num1 + '0'
-    return (int(num1,2) + int('0001',2)) * -1   #note: the 2 indicates base 2
+        return self.program_counter + ins.length
 
 
-#Convert a 8, 4 or 2 byte hex string to a signed integer
-def cvthex2int(x):
-    #interogate 1st byte to see if string represents a two's complement neg integer
-    if x[0] in '8ABCDEF':
-        return cvt2scomp(x)
-    else:
-        return int(x,16)    #note: the 16 indicates base 16
-
-
-#Convert a negative signed integer to a 4 or 8 byte hex string in two's complement format
-def cvtint2scomp(x, numb=32):
-    t = bin(x)[3:]
-    b = '0'*(numb-len(t)) + t   #expand by propagating a '0' out to 32 or 64 bits
-    #flip the bits in b creating num1 
-    num1 = ''
-    for bit in b:
-        if bit == '0':
-            num1 = num1 + '1'
-        else:
-            num1 = num1 + '0'
-    return hex(int(num1,2) + int('0001',2))[2:].upper()
-
-
-#Convert a signed integer to a 4 byte hex string 
-def cvtint2hex(x):
-    if x < 0:
-        return cvtint2scomp(x)
-    else:
-        return hex(x).lstrip('0x').rjust(8,'0').upper()
-
-        
-#Convert integer to packed decimal
-def cvtint2pdec(i, pdlen):
-    str_i = str(i)    
-    if str_i[0] == '-':
-        sign = 'D'
-        str_i = str_i[1:]
-    else:
-        sign = 'C'
-    return str_i.rjust(pdlen-1,'0') + sign
-    
-    
-#Convert packed decimal to integer
-def cvtpdec2int(pd):
-    pd_len = len(pd)
-    if pd.endswith(('A','C','E','F')):
-        sign = '+'
-    elif pd.endswith(('B','D')):
-        sign = '-'
-    else:
-        print('cvtpdec2int: Invalid Sign')
-    digits = pd[0:pd_len-1]
-    return int(sign + digits)
-
-
-#Convert from 8, 4 or 2 byte hex string to a signed integer
-#or convert a signed integer to a 4 byte hex string 
-#depending on the desired type
-def cast_to_type(x, desired_type):
-    if isinstance(x, desired_type):
-        return x
-    else:
-        if desired_type == int:
-            return cvthex2int(x)
-        elif desired_type == str:
-            return cvtint2hex(x)
-        else:
-            print('Invalid desired_type')
-
-
-#Add / Add Halfword / Add Register code
-#Subtract / Subtract Halfword / Subtract Register code
-def Add_Sub_code(numb, AorS):
-    global regs, cond_code
-    
-    cond_code = ['0','0','0','0']   #clear condition code
-
-    op1 = cast_to_type(regs[_R1],int)
-        
-    if numb != 0: 
-        addr = calc_address(_B2, _D2, _X2)
-        op2 = cvthex2int(''.join(instrdata_list[addr:addr+numb]))
-    else:
-        op2 = cast_to_type(regs[_R2],int)
-            
-    if AorS == '+':
-        op1 = op1 + op2
-    elif AorS == '-':
-        op1 = op1 - op2
-    
-    if abs(op1) > 2147483647:
-        cond_code[3] = '1'
-    elif op1 == 0:
-        cond_code[0] = '1'
-    elif op1 < 0:
-        cond_code[1] = '1'
-    elif op1 > 0:
-        cond_code[2] = '1'
-        
-    regs[_R1] = cvtint2hex(op1)
-    
-    return
-
-
-#Add Logical / Add Logical Register code
-#Subtract Logical / Subtract Logical Register code
-def Add_Sub_Logical_code(numb, AorS):
-    global regs, cond_code
-    
-    cond_code = ['0','0','0','0']   #clear condition code
-
-    op1 = cast_to_type(regs[_R1],int)
-        
-    if numb != 0: 
-        addr = calc_address(_B2, _D2, _X2)
-        op2 = cvthex2int(''.join(instrdata_list[addr:addr+numb]))
-    else:
-        op2 = cast_to_type(regs[_R2],int)
-            
-    if AorS == '+':
-        with_carry = False
-        if op2 < 0:
-            with_carry = True
-    else:        
-        with_carry = True
-        if op2 < 0:
-            with_carry = False
-            
-    if AorS == '+':
-        op1 = op1 + op2
-    elif AorS == '-':
-        op1 = op1 - op2
-        
-    result_is_zero = False
-    if op1 == 0:
-        result_is_zero = True
-
-    if AorS == '+':
-        if (not result_is_zero) and with_carry:
-            cond_code = ['0','0','0','1']
-        elif result_is_zero and with_carry:
-            cond_code = ['0','0','1','0']
-        elif (not result_is_zero) and (not with_carry):
-            cond_code = ['0','1','0','0']
-        elif result_is_zero and (not with_carry):
-            cond_code = ['1','0','0','0']
-
-    if AorS == '-':
-        if (not result_is_zero) and with_carry:
-            cond_code = ['0','0','0','1']
-        elif result_is_zero and with_carry:
-            cond_code = ['0','0','1','0']
-        elif (not result_is_zero) and (not with_carry):
-            cond_code = ['0','1','0','0']
-            
-    regs[_R1] = cvtint2hex(op1)
-    
-    return
-
-
-#Compare / Compare Halfword / Compare Register
-def Compare_code(numb):
-    global cond_code
-    
-    cond_code = ['0','0','0','0']   #clear condition code
-
-    op1 = cast_to_type(regs[_R1],int)
-        
-    if numb != 0:
-        addr = calc_address(_B2, _D2, _X2)
-        op2 = cvthex2int(''.join(instrdata_list[addr:addr+numb]))
-    else:
-        op2 = cast_to_type(regs[_R2],int)
+    #Shift Right Double Logical
+    def SRDL(self, ins):
+        #OC,R1,X2,B2,D2
 
-    if op1 == op2:
-        cond_code[0] = '1'
-    elif op1 < op2:
-        cond_code[1] = '1'
-    elif op1 > op2:
-        cond_code[2] = '1'
-    
-    return
-
-
-#Compare Logical / Compare Logical Immediate / Compare Logical Characters / Compare Logical Register
-def Compare_Logical_code(fmt):
-    global cond_code
-    
-    cond_code = ['1','0','0','0']   #assume equal until proven otherwise
-    
-    numb = 4
-    
-    if fmt.startswith('R'):
-        op1 = cast_to_type(regs[_R1],str)
-    if fmt == 'RR':
-        op2 = cast_to_type(regs[_R2],str)
-    elif fmt == 'RX':
-        addr = calc_address(_B2, _D2, _X2)
-        op2 = ''.join(instrdata_list[addr:addr+numb])
-    elif fmt == 'SI':
-        op1 = instrdata_list[calc_address(_B1, _D1)]
-        op2 = _I2
-        numb = 1
-    elif fmt == 'SS':
-        addr1 = calc_address(_B1, _D1)
-        addr2 = calc_address(_B3, _D3)
-        numb = _LL + 1
-        op1 = ''.join(instrdata_list[addr1:addr1+numb])
-        op2 = ''.join(instrdata_list[addr2:addr2+numb])
-        
-    for i in range(0,numb*2,2):
-        field1 = int(op1[i:i+2],16)
-        field2 = int(op2[i:i+2],16)
-            
-        if field1 == field2:
-            continue
-        elif field1 < field2:
-            cond_code[0] = '0'
-            cond_code[1] = '1'
-            break
-        elif field1 > field2:
-            cond_code[0] = '0'
-            cond_code[2] = '1'
-            break
-            
-    return
-
-    
-#Store / Store Character / Store Halfword    
-def Store_code(numb):
-    global instrdata_list
-    
-    dest = calc_address(_B2, _D2, _X2)
-
-    op1 = cast_to_type(regs[_R1],str)
-    
-    if numb == 4 or numb == 2:
-        if numb == 4:
-            j = 0
-        else:
-            j = 4
-        for i in range(0,numb):
-            instrdata_list[dest + i] = op1[j:j+2]
-            j = j + 2
-    elif numb == 1:
-        instrdata_list[dest] = op1[6:8]
-
-    return
-
-
-#AND / AND Character / AND Immediate / AND Register
-#OR / OR Character / OR Immediate / OR Register
-#XOR / XOR Character / XOR Immediate / XOR Register    
-def And_Or_Xor_code(fmt, op):
-    global cond_code
-    
-    cond_code = ['1','0','0','0']   #assume result is zero until proven otherwise
-    
-    numb = 4
-    
-    if fmt.startswith('R'):
-        op1 = cast_to_type(regs[_R1],str)
-    if fmt == 'RR':
-        op2 = cast_to_type(regs[_R2],str)
-    elif fmt == 'RX':
-        addr = calc_address(_B2, _D2, _X2)
-        op2 = ''.join(instrdata_list[addr:addr+numb])
-    elif fmt == 'SI':
-        op1 = instrdata_list[calc_address(_B1, _D1)]
-        op2 = _I2
-        numb = 1
-    elif fmt == 'SS':
-        addr1 = calc_address(_B1, _D1)
-        addr2 = calc_address(_B3, _D3)
-        numb = _LL + 1
-        op1 = ''.join(instrdata_list[addr1:addr1+numb])
-        op2 = ''.join(instrdata_list[addr2:addr2+numb])
-
-    result = ''
-    not_zero = False
-    for i in range(0,numb*2,2):
-        t = hex(eval('0x' + op1[i:i+2] + op + '0x' + op2[i:i+2]))[2:].zfill(2).upper()
-        if t != '00':
-            not_zero = True
-        result = result + t
-
-    if not_zero:
-        cond_code[0] = '0'
-        cond_code[1] = '1'
-
-    if fmt.startswith('R'):
-        regs[_R1] = result
-    elif fmt == 'SI':
-        instrdata_list[calc_address(_B1, _D1)] = result
-    elif fmt == 'SS':
-        z = 0
-        for i in range(0,numb*2,2):
-            instrdata_list[addr1+z] = result[i:i+2]
-            z = z + 1
-
-    return
-    
-    
-#AP / SP / MP / ZAP
-def Add_Sub_Mul_Packed_code(op):
-    global instrdata_list, cond_code
-
-    addr1 = calc_address(_B1, _D1)
-    numb1 = _L1 + 1
-    if op != 'z':
-        op1 = ''.join(instrdata_list[addr1:addr1+numb1])
-        op1_int = cvtpdec2int(op1)
-
-    addr2 = calc_address(_B3, _D3)
-    numb2 = _L2 + 1
-    op2 = ''.join(instrdata_list[addr2:addr2+numb2])    
-    op2_int = cvtpdec2int(op2)
-
-    if op == '+':
-        op1_int = op1_int + op2_int
-    elif op == '-':
-        op1_int = op1_int - op2_int
-    elif op == '*':
-        op1_int = op1_int * op2_int    
-    elif op == 'z':
-        op1_int = 0 + op2_int
-        
-    #Set cond_code only for Add and Sub   
-    #Note: Overflow is not detected    
-    if op != '*':
-        if op1_int == 0:
-            cond_code = ['1','0','0','0']
-        elif op1_int < 0:
-            cond_code = ['0','1','0','0']
-        elif op1_int > 0:
-            cond_code = ['0','0','1','0']
-
-    str_op1 = cvtint2pdec(op1_int,numb1*2)
-    
-    for i in range(0,numb1*2,2):
-        instrdata_list[addr1] = str_op1[i:i+2]
-        addr1 = addr1 + 1    
-    
-    return 
-
-
-#D / DR
-def Divide_code(fmt):
-    global regs
-    
-    even_reg = _R1
-    odd_reg = _R1 + 1
-
-    op1_e = cast_to_type(regs[even_reg],str)
-    op1_o = cast_to_type(regs[odd_reg],str)    
-        
-    dividend_is_positive = True
-    divisor_is_positive = True
-    
-    if op1_e[0] in '8ABCDEF':
-        #Handle a negative dividend
-        dividend = cvt2scomp(op1_e + op1_o)
-        dividend_is_positive = False
-    else:
-        #Handle a positve dividend
-        dividend = int(op1_e + op1_o,16)
-            
-    if fmt == 'RR':
-        divisor = cast_to_type(regs[_R2],int)
-    elif fmt == 'RX':
-        addr = calc_address(_B2, _D2, _X2)
-        divisor = cvthex2int(''.join(instrdata_list[addr:addr+4]))
-
-    if divisor < 0:
-        divisor_is_positive = False
-        
-    quotient = abs(dividend) // abs(divisor)
-    remainder = abs(dividend) % abs(divisor)
-    
-    if (dividend_is_positive and (not divisor_is_positive)) or ((not dividend_is_positive) and divisor_is_positive):
-        quotient = quotient * -1
-        
-    if not dividend_is_positive:
-        remainder = remainder * -1
-            
-    regs[even_reg] = cvtint2hex(remainder)
-    regs[odd_reg] = cvtint2hex(quotient)
-    
-    return
-
-
-#M / MR
-def Multiply_code(fmt, numb):
-    global regs
-    
-    even_reg = _R1
-    odd_reg = _R1 + 1
-    
-    multiplicand = cast_to_type(regs[odd_reg],int)   
-            
-    if fmt == 'RR':
-        multiplier = cast_to_type(regs[_R2],int)
-    elif fmt == 'RX':
-        addr = calc_address(_B2, _D2, _X2)
-        multiplier = cvthex2int(''.join(instrdata_list[addr:addr+numb]))
-        
-    product = multiplicand * multiplier
-    
-    if product >= 0:
-        #Handle a positve product
-        p64 = hex(product).lstrip('0x').rjust(16,'0').upper()
-    elif product < 0:
-        #Handle a negative product
-        p64 = cvtint2scomp(product, numb=64)
-
-    regs[even_reg] = p64[0:8]
-    regs[odd_reg] = p64[8:16]
-    
-    return
-
-    
-#BXH / BXLE    
-def Branch_on_Index_code(HorLE):
-    global regs
-    
-    op1 = cast_to_type(regs[_R1],int)
-    
-    #if op3 (R2) is even, then a register pair are used as the increment and the compare value
-    if (_R2 % 2) == 0:
-        op3_increment_reg = _R2
-        op3_compare_reg = _R2 + 1
-    #if op3 (R2) is odd, then a single register is used as both the increment and the compare value
-    else:
-        op3_increment_reg = _R2
-        op3_compare_reg = _R2
-
-    op3_increment_val = cast_to_type(regs[op3_increment_reg],int)
-
-    op3_compare_val = cast_to_type(regs[op3_compare_reg],int)
-
-    sum = op1 + op3_increment_val
-    regs[_R1] = sum
-    
-    if HorLE == 'H':
-        if (sum - op3_compare_val) <= 0:
-            return program_counter + i_field_num_bytes
-        else:
-            return calc_address(_B2, _D2)
-    elif HorLE == 'LE':
-        if (sum - op3_compare_val) <= 0:
-            return calc_address(_B2, _D2)
-        else:
-            return program_counter + i_field_num_bytes
+        even_reg = ins.R1
+        odd_reg = ins.R1 + 1
 
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        r64 = ((self.regs[even_reg] << 32) | self.regs[odd_reg]) >> shift
 
+        self.regs[even_reg] = r64 >> 32
+        self.regs[odd_reg] = r64 & 0xFFFFFFFF
 
-# Function to wrap text and add it to the window
-def wrap_and_addstr(window, y, x, text, width):
-    start = 0
-    while start < len(text):
-        window.addstr(y, x, text[start:start + width])
-        y += 1
-        start += width
+        return self.program_counter + ins.length
 
 
+    #Shift Right Single Logical
+    def SRL(self, ins):
+        #OC,R1,X2,B2,D2
+        shift = self.calc_address(ins.B2, ins.D2) & 0x3F
+        self.regs[ins.R1] = self.regs[ins.R1] >> shift
 
-#ED / EDMK
-def ED_EDMK_code(EDorEDMK):
-    global regs, instrdata_list, cond_code
-
-    pattern_addr = calc_address(_B1, _D1)
-    pattern_len = _LL + 1
-    pattern = instrdata_list[pattern_addr:pattern_addr+pattern_len]
-    
-    source_addr = calc_address(_B3, _D3)
-    
-    digit_selector = '20'
-    sig_starter = '21'
-    field_sep = '22'
-    msg_char = "not in ['20','21','22']"
-    sig_indicator = 'OFF'
-    fill_char = pattern[0]
-    last_field_digits = ''
-    only_once_sw = True
-    sav_pp = 0
-    
-    pp = 0    #pattern pointer
-    si = 0    #source index
-    sdp = 2   #source digit pointer
-
-    while True:
-        pp = pp + 1
-        if pp == pattern_len:
-            break
-            
-        if sdp == 2:
-            source_byte = instrdata_list[source_addr+si]
-            si = si + 1
-            if source_byte[1] in 'ABCDEF':
-                last_field_digits = last_field_digits + source_byte[0]
-            else:
-                last_field_digits = last_field_digits + source_byte
-            sdp = 0
-            if source_byte[1] in 'ACEF':
-                plus_sign_in_low_order_sd = True
-            else:
-                plus_sign_in_low_order_sd = False
-                
-        source_digit = source_byte[sdp]
-             
-        if pattern[pp] == digit_selector and sig_indicator == 'OFF' and source_digit == '0':
-            pattern[pp] = fill_char
-            sig_indicator = 'OFF'
-            sdp = sdp + 1
-            
-        elif pattern[pp] == digit_selector and sig_indicator == 'OFF' and source_digit > '0' and plus_sign_in_low_order_sd == False:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'ON'
-            sdp = sdp + 1
-            if only_once_sw:
-                sav_pp = pp
-                only_once_sw = False
-            
-        elif pattern[pp] == digit_selector and sig_indicator == 'OFF' and source_digit > '0' and plus_sign_in_low_order_sd == True:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'OFF'
-            sdp = sdp + 1            
-            
-        elif pattern[pp] == digit_selector and sig_indicator == 'ON' and source_digit >= '0' and plus_sign_in_low_order_sd == False:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'ON'
-            sdp = sdp + 1                        
-
-        elif pattern[pp] == digit_selector and sig_indicator == 'ON' and source_digit >= '0' and plus_sign_in_low_order_sd == True:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'OFF'
-            sdp = sdp + 1         
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'OFF' and source_digit == '0' and plus_sign_in_low_order_sd == False:
-            pattern[pp] = fill_char
-            sig_indicator = 'ON'
-            sdp = sdp + 1         
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'OFF' and source_digit == '0' and plus_sign_in_low_order_sd == True:
-            pattern[pp] = fill_char
-            sig_indicator = 'OFF'
-            sdp = sdp + 1         
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'OFF' and source_digit > '0' and plus_sign_in_low_order_sd == False:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'ON'
-            sdp = sdp + 1         
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'OFF' and source_digit > '0' and plus_sign_in_low_order_sd == True:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'OFF'
-            sdp = sdp + 1         
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'ON' and source_digit >= '0' and plus_sign_in_low_order_sd == False:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'ON'
-            sdp = sdp + 1    
-
-        elif pattern[pp] == sig_starter and sig_indicator == 'ON' and source_digit >= '0' and plus_sign_in_low_order_sd == True:
-            pattern[pp] = 'F' + source_digit
-            sig_indicator = 'OFF'
-            sdp = sdp + 1    
-
-        elif pattern[pp] == field_sep:
-            pattern[pp] = fill_char
-            sig_indicator = 'OFF'
-            last_field_digits = ''
-
-        elif pattern[pp] not in ['20','21','22']  and sig_indicator == 'OFF':
-            pattern[pp] = fill_char
-            sig_indicator = 'OFF'
-
-        elif pattern[pp] not in ['20','21','22']  and sig_indicator == 'ON':
-            #result char is the message char at pattern[pp]
-            sig_indicator = 'ON'
-
-    for i in range(0,pattern_len):
-        instrdata_list[pattern_addr+i] = pattern[i]
-        
-    if last_field_digits.count('0') == len(last_field_digits):
-        cond_code = ['1','0','0','0']
-    elif plus_sign_in_low_order_sd:
-        cond_code = ['0','0','1','0']
-    else:
-        cond_code = ['0','1','0','0']
-        
-    if EDorEDMK == 'EDMK':
-        #for EDMK instruction - address of each first significant result 
-        #character is recorded in general register 1    
-        regs[1] = pattern_addr + sav_pp
-        
-    return
+        return self.program_counter + ins.length
 
-# -------------------------------------------------- #
 
-#Add
-def A():
-    #OC,R1,X2,B2,D2
-    Add_Sub_code(4, '+')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Add Halfword
-def AH():
-    #OC,R1,X2,B2,D2
-    Add_Sub_code(2, '+')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Add Logical
-def AL():
-    #OC,R1,X2,B2,D2
-    Add_Sub_Logical_code(4, '+')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Add Logical Register
-def ALR():
-    #OC,R1,R2
-    Add_Sub_Logical_code(0, '+')
-    
-    return program_counter + i_field_num_bytes
-
-        
-#Add Register
-def AR():
-    #OC,R1,R2
-    Add_Sub_code(0, '+')
-    
-    return program_counter + i_field_num_bytes
-    
-
-#Add Packed
-def AP():
-    #OC,L1,L2,B1,D1,B3,D3
-    Add_Sub_Mul_Packed_code('+')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Branch and Link
-def BAL():
-    global regs
-    #OC,R1,X2,B2,D2
-    regs[_R1] = program_counter + i_field_num_bytes
-    
-    return calc_address(_B2, _D2, _X2)
-
-    
-#Branch and Link (Register)
-def BALR():
-    global regs
-    #OC,R1,R2
-    regs[_R1] = program_counter + i_field_num_bytes
-    if _R2 == 0:
-        return regs[_R1]
-    else:
-        return cast_to_type(regs[_R2],int)
-
-
-#Branch on Condition
-def BC():
-    #OC,R1,X2,B2,D2
-    _M1 = _R1   # _M1 = mask1
-        
-    if _M1 == 0xF:
-        return calc_address(_B2, _D2, _X2)
-    elif _M1 == 0x0:
-        return program_counter + i_field_num_bytes
-    else:
-        mask = list(bin(_M1).lstrip('0b').rjust(4, '0'))
-        for i in range(0,4):
-            if mask[i] == '1' and (cond_code[i] == mask[i]):
-                return calc_address(_B2, _D2, _X2)
-                
-    return program_counter + i_field_num_bytes
-
-    
-#Branch on Condition (Register)
-def BCR():
-    #OC,R1,R2   
-    _M1 = _R1   # _M1 = mask1
-    
-    R2_int = cast_to_type(regs[_R2],int)
-        
-    if _M1 == 0xF:
-        return R2_int
-    elif _M1 == 0x0:
-        return program_counter + i_field_num_bytes
-    else:
-        mask = list(bin(_M1).lstrip('0b').rjust(4,'0'))
-        for i in range(0,4):
-            if mask[i] == '1' and cond_code[i] == mask[i]:
-                return R2_int
-                
-    return program_counter + i_field_num_bytes
-
-
-#Branch on Count  
-def BCT():
-    global regs
-    #OC,R1,X2,B2,D2
-    regs[_R1] = cast_to_type(regs[_R1],int) - 1
-
-    if regs[_R1] == 0:
-        return program_counter + i_field_num_bytes
-    else:
-        return calc_address(_B2, _D2, _X2)
-        
-        
-#Branch on Count Register
-def BCTR():
-    global regs
-    #OC,R1,R2
-    regs[_R1] = cast_to_type(regs[_R1],int) - 1
-
-    if regs[_R1] == 0:
-        return program_counter + i_field_num_bytes
-    else:
-        if _R2 == 0:
-            return program_counter + i_field_num_bytes
-        else:
-            return cast_to_type(regs[_R2],int)
-
-
-#Branch on Index High
-def BXH():
-    #OC,R1,R2,B2,D2
-    
-    return Branch_on_Index_code('H')
-    
-    
-#Branch on Index Low or Equal
-def BXLE():
-    #OC,R1,R2,B2,D2
-    
-    return Branch_on_Index_code('LE')
-
-
-#Compare
-def C():
-    #OC,R1,X2,B2,D2
-    Compare_code(4)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Compare Halfword
-def CH():
-    #OC,R1,X2,B2,D2
-    Compare_code(2)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Compare Logical
-def CL():
-    #OC,R1,X2,B2,D2
-    Compare_Logical_code(i_format)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Compare Logical Characters
-def CLC():
-    #OC,LL,B1,D1,B3,D3
-    Compare_Logical_code(i_format)
-    
-    return program_counter + i_field_num_bytes 
-
-
-#Compare Logical Characters Long
-def CLCL():
-    global cond_code
-    #OC,R1,R2
-    
-    if isinstance(regs[_R1],int):
-        first_op_addr = int(cvtint2hex(regs[_R1])[2:],16)
-    else:
-        first_op_addr = int(regs[_R1][2:],16)
-
-    if isinstance(regs[_R1+1],int):
-        first_op_len = int(cvtint2hex(regs[_R1+1])[2:],16)
-    else:
-        first_op_len = int(regs[_R1+1][2:],16) 
-        
-    if isinstance(regs[_R2],int):
-        secnd_op_addr = int(cvtint2hex(regs[_R2])[2:],16)
-    else:
-        secnd_op_addr = int(regs[_R2][2:],16) 
-        
-    t = cast_to_type(regs[_R2+1],str)
-    pad_char = t[0:2]
-    secnd_op_len = int(t[2:],16)     
-    
-    if first_op_len >= secnd_op_len:
-        comp_len = first_op_len
-    else:
-        comp_len = secnd_op_len
-        
-    cond_code = ['1','0','0','0']    
-    if first_op_len == 0 and secnd_op_len == 0:
-        pass
-    else:    
-        op1 = instrdata_list[first_op_addr:first_op_addr+first_op_len]
-        op2 = instrdata_list[secnd_op_addr:secnd_op_addr+secnd_op_len]
-
-        while len(op1) > len(op2):
-            op2.append(pad_char)
-        while len(op2) > len(op1):
-            op1.append(pad_char)
-
-        for i in range(0,comp_len):
-            if op1[i] != op2[i]:
-                op1_int = int(op1[i],16)
-                op2_int = int(op2[i],16)
-                if op1_int < op2_int:
-                    cond_code = ['0','1','0','0']
-                else:
-                    cond_code = ['0','0','1','0']
-                break
- 
-    return program_counter + i_field_num_bytes 
-
-
-#Compare Logical Immediate
-def CLI():
-    #OC,I2,B1,D1
-    Compare_Logical_code(i_format)
-    
-    return program_counter + i_field_num_bytes
-    
-    
-#Compare Logical under Mask
-def CLM():
-    #OC,R1,R2,B2,D2
-    global cond_code
-
-    cond_code = ['1','0','0','0']   #assume equal until proven otherwise
-
-    _M3 = _R2
-    
-    mask = list(bin(_M3).lstrip('0b').rjust(4,'0'))
-    numb = mask.count('1')
-    
-    if numb == 0:
-        return program_counter + i_field_num_bytes 
-
-    op1 = cast_to_type(regs[_R1],str)
-   
-    op1_list = [op1[i:i+2] for i in range(0,8,2)]   #make list of _R1 bytes
-    
-    addr = calc_address(_B2, _D2)    
-    op2_list = instrdata_list[addr:addr+numb]   #make list storage bytes
-
-    j = 0
-    for i in range(0,4):
-        if mask[i] == '1':
-            field1 = int(op1_list[i],16)
-            field2 = int(op2_list[j],16)
-            j = j + 1            
-            if field1 == field2:
-                continue
-            elif field1 < field2:
-                cond_code[0] = '0'
-                cond_code[1] = '1'
-                break
-            elif field1 > field2:
-                cond_code[0] = '0'
-                cond_code[2] = '1'
-                break
+    #Shift and Round Decimal
+    def SRP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
 
-    return program_counter + i_field_num_bytes 
+        addr = self.calc_address(ins.B1, ins.D1)
 
+        #the shift is the rightmost 6 bits of the second operand address, a signed number of digits
+        num_to_shift = self.calc_address(ins.B3, ins.D3) & 0x3F
+        if num_to_shift > 31:
+            num_to_shift = num_to_shift - 0x40
 
-#Compare Logical Register
-def CLR():
-    #OC,R1,R2
-    Compare_Logical_code(i_format)
-    
-    return program_counter + i_field_num_bytes  
+        result, self.cond_code = shift_packed(self.storage[addr:addr+ins.L1+1], num_to_shift, ins.L2)   #L2 = I3, the rounding digit
+        self.store_bytes(addr, result)
 
+        return self.program_counter + ins.length
 
-#Compared Packed
-def CP():
-    global cond_code
-    #OC,L1,L2,B1,D1,B3,D3
-    
-    addr1 = calc_address(_B1, _D1)
-    numb1 = _L1 + 1
-    op1 = ''.join(instrdata_list[addr1:addr1+numb1])
-    op1_int = cvtpdec2int(op1)
 
-    addr2 = calc_address(_B3, _D3)
-    numb2 = _L2 + 1
-    op2 = ''.join(instrdata_list[addr2:addr2+numb2])    
-    op2_int = cvtpdec2int(op2)
+    #Store
+    def ST(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Store_code(ins, 4)
 
-    if op1_int == op2_int:
-        cond_code = ['1','0','0','0']
-    elif op1_int < op2_int:
-        cond_code = ['0','1','0','0']
-    elif op1_int > op2_int:
-        cond_code = ['0','0','1','0']
+        return self.program_counter + ins.length
 
-    return program_counter + i_field_num_bytes
 
+    #Store Character
+    def STC(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Store_code(ins, 1)
 
-#Compare Register
-def CR():
-    #OC,R1,R2
-    Compare_code(0)
-    
-    return program_counter + i_field_num_bytes
+        return self.program_counter + ins.length
 
 
-#Compare and Swap
-def CS():
-    global regs, instrdata_list, cond_code
-    #OC,R1,R2,B2,D2
+    #Store Halfword
+    def STH(self, ins):
+        #OC,R1,X2,B2,D2
+        self.Store_code(ins, 2)
 
-    op1 = cast_to_type(regs[_R1],str)
+        return self.program_counter + ins.length
 
-    addr = calc_address(_B2, _D2)
-    op2 = ''.join(instrdata_list[addr:addr+4])
 
-    if op1 == op2:
-        op3 = cast_to_type(regs[_R2],str)
-        j = 0
-        for i in range(0,4):
-            instrdata_list[addr + i] = op3[j:j+2]
-            j = j + 2
-        cond_code = ['1','0','0','0']
-    else:
-        regs[_R1] = op2
-        cond_code = ['0','1','0','0']
-        
-    return program_counter + i_field_num_bytes
+    #Store Characters under Mask
+    def STCM(self, ins):
+        #OC,R1,R2,B2,D2
 
+        _M3 = ins.R2
 
-#Compare Double and Swap
-def CDS():
-    global regs, instrdata_list, cond_code
-    #OC,R1,R2,B2,D2
+        mask = list(bin(_M3).lstrip('0b').rjust(4,'0'))
+        numb = mask.count('1')
 
-    op1_e = cast_to_type(regs[_R1],str)
-    op1_o = cast_to_type(regs[_R1+1],str)
+        if numb == 0:
+            return self.program_counter + ins.length
 
-    op1 = op1_e + op1_o
-    
-    addr = calc_address(_B2, _D2)
-    op2 = ''.join(instrdata_list[addr:addr+8])
+        op1_list = self.regs[ins.R1].to_bytes(4, 'big')  #make list of ins.R1 bytes
 
-    if op1 == op2:
-        op3_e = cast_to_type(regs[_R2],str)
-        op3_o = cast_to_type(regs[_R2+1],str)        
+        addr = self.calc_address(ins.B2, ins.D2)
 
-        op3 = op3_e + op3_o
-        
         j = 0
-        for i in range(0,8):
-            instrdata_list[addr + i] = op3[j:j+2]
-            j = j + 2
-        cond_code = ['1','0','0','0']
-    else:
-        regs[_R1] = op2[0:8]
-        regs[_R1+1] = op2[8:16]
-        cond_code = ['0','1','0','0']
-        
-    return program_counter + i_field_num_bytes
-
-
-#Convert to Binary
-def CVB():
-    #OC,R1,X2,B2,D2
-    global regs
-    
-    addr = calc_address(_B2, _D2, _X2)
-    op2 = ''.join(instrdata_list[addr:addr+8])
-
-    op2_int = cvtpdec2int(op2)
-    
-    regs[_R1] = cvtint2hex(op2_int)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Convert to Decimal
-def CVD():
-    #OC,R1,X2,B2,D2
-    global instrdata_list
-    
-    op1 = cast_to_type(regs[_R1],int)
-    
-    str_op1 = cvtint2pdec(op1, 16)
-
-    addr = calc_address(_B2, _D2, _X2)
-
-    for i in range(0,16,2):
-        instrdata_list[addr] = str_op1[i:i+2]
-        addr = addr + 1
-
-    return program_counter + i_field_num_bytes
-
-
-#Divide
-def D():
-    #OC,R1,X2,B2,D2
-    Divide_code(i_format)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Divide Packed
-def DP():
-    global instrdata_list
-    #OC,L1,L2,B1,D1,B3,D3
-    
-    addr1 = calc_address(_B1, _D1)
-    numb1 = _L1 + 1
-    op1 = ''.join(instrdata_list[addr1:addr1+numb1])
-    dividend = cvtpdec2int(op1)
-
-    addr2 = calc_address(_B3, _D3)
-    numb2 = _L2 + 1
-    op2 = ''.join(instrdata_list[addr2:addr2+numb2])    
-    divisor = cvtpdec2int(op2)
-
-    quotient = dividend // divisor
-    remainder = dividend % divisor
-    
-    str_remainder = cvtint2pdec(remainder,numb2*2)
-    str_quotient = cvtint2pdec(quotient,(numb1-numb2)*2)
-    
-    str_op1 =  str_quotient + str_remainder
-    
-    for i in range(0,numb1*2,2):
-        instrdata_list[addr1] = str_op1[i:i+2]
-        addr1 = addr1 + 1    
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Divide Register
-def DR():
-    #OC,R1,R2
-    Divide_code(i_format)
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Edit
-def ED():   
-    #OC,LL,B1,D1,B3,D3
-    ED_EDMK_code('ED')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Edit and Mark
-def EDMK():   
-    #OC,LL,B1,D1,B3,D3
-    ED_EDMK_code('EDMK')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Insert Character
-def IC():
-    global regs
-    #OC,R1,X2,B2,D2
-    
-    op1 = cast_to_type(regs[_R1],str)
-    
-    addr = calc_address(_B2, _D2, _X2)
-    op2 = instrdata_list[addr]
-    
-    regs[_R1] = op1[0:6] + op2
-    
-    return program_counter + i_field_num_bytes
-
-
-#Insert Character under Mask
-def ICM():
-    global regs, cond_code
+        for i in range(0,4):
+            if mask[i] == '1':
+                self.storage[addr+j] = op1_list[i]
+                j = j + 1
+        self.invalidate_decode_cache(addr, numb)
+
+        return self.program_counter + ins.length
+
+
+    #Store Multiple
+    def STM(self, ins):
         #OC,R1,R2,B2,D2
-        
-    cond_code = ['1','0','0','0']   #force cc to - All inserted bits are zeros, or mask is zero
-    
-# Note: NOT implementing cond_code setting at this time -    
-#  "The resulting condition code is based on the mask
-#  and on the value of the bits inserted. When the mask
-#  is zero or when all inserted bits are zero, the condition
-#  code is made O. When all inserted bits are not
-#  zero, the code is set according to the leftmost bit of
-#  the storage operand: if this bit is one, the code is
-#  made 1 to indicate a negative algebraic value; if this
-#  bit is zero, the code is made 2, reflecting a positive
-#  algebraic value."    
-
-    _M3 = _R2
-    
-    mask = list(bin(_M3).lstrip('0b').rjust(4,'0'))
-    numb = mask.count('1')
-    
-    if numb == 0:
-        return program_counter + i_field_num_bytes 
-        
-    op1 = cast_to_type(regs[_R1],str)    
-        
-    op1_list = [op1[i:i+2] for i in range(0,8,2)]  #make list of _R1 bytes
-
-    addr = calc_address(_B2, _D2)    
-    op2_list = instrdata_list[addr:addr+numb]   #make list storage bytes
-    
-    j = 0
-    for i in range(0,4):
-        if mask[i] == '1':
-            op1_list[i] = op2_list[j]
+
+        addr = self.calc_address(ins.B2, ins.D2)
+
+        starting_reg = ins.R1
+        ending_reg = ins.R2
+
+        j = starting_reg
+
+        while True:
+            self.store_fullword(addr, self.regs[j])
+            addr = addr + 4
             j = j + 1
+            if j > 15:
+                j = 0
+            if j == ending_reg+1:
+                break
+
+        return self.program_counter + ins.length
+
+
+    #Test under Mask
+    def TM(self, ins):
+        #OC,I2,B1,D1
+
+        self.cond_code = 0   #assume Selected bits all zeros, or the mask is all zeros
+
+        _M1 = ins.I2
+
+        mask = list(bin(_M1).lstrip('0b').rjust(8,'0'))
+        numb = mask.count('1')
+
+        if numb == 0:
+            return self.program_counter + ins.length
+
+        op1 = self.storage[self.calc_address(ins.B1, ins.D1)]
+        op1_list = list(bin(op1).lstrip('0b').rjust(8,'0'))
 
-    regs[_R1] = ''.join(op1_list)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Load
-def L():
-    global regs
-    #OC,R1,X2,B2,D2  
-    addr = calc_address(_B2, _D2, _X2)
-    regs[_R1] = ''.join(instrdata_list[addr:addr+4])
-        
-    return program_counter + i_field_num_bytes
-    
-    
-#Load Address
-def LA():
-    global regs
-    #OC,R1,X2,B2,D2  
-    regs[_R1] = calc_address(_B2, _D2, _X2)
-        
-    return program_counter + i_field_num_bytes
-
-
-#Load Complement
-def LCR():
-    global regs, cond_code
-    #OC,R1,R2
-    
-    op2 = cast_to_type(regs[_R2],int) * -1
-        
-    if op2 == 0:
-        cond_code = ['1','0','0','0']    #Result is zero
-    elif op2 < 0:
-        cond_code = ['0','1','0','0']    #Result is less than zero
-        if op2 == -2147483648:
-            cond_code = ['0','0','0','1']    #Overflow
-    elif op2 > 0:
-        cond_code = ['0','0','1','0']    #Result is greater than zero
-            
-    regs[_R1] = op2
-        
-    return program_counter + i_field_num_bytes
-    
-    
-#Load Halfword
-def LH():
-    global regs
-    #OC,R1,X2,B2,D2  
-    addr = calc_address(_B2, _D2, _X2)
-    t = ''.join(instrdata_list[addr:addr+2])
-    #extend halfword to fullword by propagating sign bit 
-    if t[0] in '8ABCDEF':
-        regs[_R1] = 'FFFF' + t
-    else:
-        regs[_R1] = '0000' + t
-        
-    return program_counter + i_field_num_bytes
-
-
-#Load Multiple
-def LM():
-    global instrdata_list
-    #OC,R1,R2,B2,D2
-    
-    addr = calc_address(_B2, _D2)
-    
-    starting_reg = _R1
-    ending_reg = _R2
-    
-    j = starting_reg
-
-    while True:
-        regs[j] = cvthex2int(''.join(instrdata_list[addr:addr+4]))
-        addr = addr + 4
-        j = j + 1
-        if j > 15:
-            j = 0
-        if j == ending_reg+1:
-            break
-
-    return program_counter + i_field_num_bytes    
-
-
-#Load Negative
-def LNR():
-    global regs, cond_code
-    #OC,R1,R2
-    
-    op2 = cast_to_type(regs[_R2],int)
-        
-    if op2 == 0:
-        regs[_R1] = op2
-        cond_code = ['1','0','0','0']   #Result is zero
-    elif op2 < 0:
-        regs[_R1] = op2
-        cond_code = ['0','1','0','0']   #Result is less than zero
-    elif op2 > 0:
-        regs[_R1] = op2 * -1
-        
-    return program_counter + i_field_num_bytes
-
-
-#Load Positive
-def LPR():
-    global regs, cond_code
-    #OC,R1,R2
-    
-    op2 = cast_to_type(regs[_R2],int)
-        
-    if op2 == 0:
-        regs[_R1] = op2
-        cond_code = ['1','0','0','0']   #Result is zero
-    elif op2 > 0:
-        regs[_R1] = op2
-        cond_code = ['0','0','1','0']   #Result is greater than zero
-    elif op2 < 0:
-        if op2 == -2147483648:
-            cond_code = ['0','0','0','1']    #Overflow
-        regs[_R1] = op2 * -1
-        
-    return program_counter + i_field_num_bytes
-    
-
-#Load (Register)
-def LR():
-    global regs
-    #OC,R1,R2
-    regs[_R1] = regs[_R2]
-        
-    return program_counter + i_field_num_bytes
-
-
-#Load and Test Register
-def LTR():
-    global regs, cond_code
-    #OC,R1,R2
-    if _R1 != _R2:
-        regs[_R1] = regs[_R2]
-        
-    op1 = cast_to_type(regs[_R1],int)    
-        
-    if op1 == 0:
-        cond_code = ['1','0','0','0']
-    elif op1 < 0:
-        cond_code = ['0','1','0','0']
-    elif op1 > 0:
-        cond_code = ['0','0','1','0'] 
-        
-    return program_counter + i_field_num_bytes
-
-
-#Multiply
-def M():
-    #OC,R1,X2,B2,D2
-    Multiply_code(i_format, 4)
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Multiply halfword
-def MH():
-    global regs
-    #OC,R1,X2,B2,D2
-    
-    multiplicand = cast_to_type(regs[_R1],int)
-          
-    addr = calc_address(_B2, _D2, _X2) 
-    multiplier = cvthex2int(''.join(instrdata_list[addr:addr+2]))
-        
-    product = cvtint2hex(multiplicand * multiplier)
-    
-    regs[_R1] = product
-    
-    return program_counter + i_field_num_bytes
-
-        
-#Multiply Packed
-def MP():
-    #OC,L1,L2,B1,D1,B3,D3
-    Add_Sub_Mul_Packed_code('*')
-    
-    return program_counter + i_field_num_bytes    
-
-    
-#Multiply Register
-def MR():
-    #OC,R1,R2
-    Multiply_code(i_format, 4)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Move Characters
-def MVC():
-    global instrdata_list
-    #OC,LL,B1,D1,B3,D3
-    dest = calc_address(_B1, _D1)
-    source = calc_address(_B3, _D3)
-    for i in range(0,_LL+1):
-        instrdata_list[dest+i] = instrdata_list[source+i]
-    
-    return program_counter + i_field_num_bytes   
-
-
-#Move Long
-def MVCL():
-    global regs, instrdata_list, cond_code
-    #OC,R1,R2
-    
-    if isinstance(regs[_R1],int):
-        first_op_addr = int(cvtint2hex(regs[_R1])[2:],16)
-    else:
-        first_op_addr = int(regs[_R1][2:],16)
-
-    if isinstance(regs[_R1+1],int):
-        first_op_len = int(cvtint2hex(regs[_R1+1])[2:],16)
-    else:
-        first_op_len = int(regs[_R1+1][2:],16) 
-        
-    if isinstance(regs[_R2],int):
-        secnd_op_addr = int(cvtint2hex(regs[_R2])[2:],16)
-    else:
-        secnd_op_addr = int(regs[_R2][2:],16) 
-        
-    t = cast_to_type(regs[_R2+1],str)
-    pad_char = t[0:2]
-    secnd_op_len = int(t[2:],16)
-    
-    if first_op_len == secnd_op_len:
-        cond_code = ['1','0','0','0']
-    elif first_op_len < secnd_op_len:
-        cond_code = ['0','1','0','0']
-    elif first_op_len > secnd_op_len:
-        cond_code = ['0','0','1','0']
-    #Note: No movement performed because of destructive overlap (cc = 3) not detected 
-
-    i = 0
-    j = first_op_len
-    k = secnd_op_len
-    while j > 0:
-        if k < 1:
-            instrdata_list[first_op_addr+i] = pad_char
+        zeroct = 0
+        for i in range(0,8):
+            if mask[i] == '1':
+                if op1_list[i] == '0':
+                    zeroct = zeroct + 1
+
+        if zeroct == numb:
+            pass
+        elif zeroct == 0:
+            self.cond_code = 3
         else:
-            instrdata_list[first_op_addr+i] = instrdata_list[secnd_op_addr+i]
-        i = i + 1
-        j = j - 1
-        k = k - 1
-    
-    regs[_R1] = first_op_addr + first_op_len
-    regs[_R1+1] = 0
-    regs[_R2] = secnd_op_addr + secnd_op_len
-    regs[_R2+1] = 0
-
-    return program_counter + i_field_num_bytes 
-
-   
-#Move Immediate
-def MVI():
-    global instrdata_list
-    #OC,I2,B1,D1 
-    instrdata_list[calc_address(_B1, _D1)] = _I2
-    
-    return program_counter + i_field_num_bytes
-
-
-#Move Numerics
-def MVN():
-    global instrdata_list
-    #OC,LL,B1,D1,B3,D3
-    dest = calc_address(_B1, _D1)
-    source = calc_address(_B3, _D3)
-    for i in range(0,_LL+1):
-        instrdata_list[dest+i] = instrdata_list[dest+i][0] + instrdata_list[source+i][1]
-    
-    return program_counter + i_field_num_bytes   
-
-
-#Move Offset
-def MVO():
-    global instrdata_list
-    #OC,L1,L2,B1,D1,B3,D3
-    dest = calc_address(_B1, _D1)
-    source = calc_address(_B3, _D3)
-    sign_byte = instrdata_list[dest+_L1]
-    t = ''.join(instrdata_list[source:source+_L2+1]) + sign_byte[1] 
-    mvo_bytes = t.rjust((_L1+1)*2,'0')
-    j = 0
-    for i in range(0,_L1+1):
-        instrdata_list[dest+i] = mvo_bytes[j:j+2]
-        j = j + 2
-    
-    return program_counter + i_field_num_bytes   
-
-
-#Move Zones
-def MVZ():
-    global instrdata_list
-    #OC,LL,B1,D1,B3,D3
-    dest = calc_address(_B1, _D1)
-    source = calc_address(_B3, _D3)
-    for i in range(0,_LL+1):
-        instrdata_list[dest+i] =  instrdata_list[source+i][0] + instrdata_list[dest+i][1]
-    
-    return program_counter + i_field_num_bytes   
-    
-    
-#AND
-def N():
-    #OC,R1,X2,B2,D2
-    And_Or_Xor_code(i_format, ' & ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#AND Characters
-def NC():
-    #OC,LL,B1,D1,B3,D3
-    And_Or_Xor_code(i_format, ' & ')
-    
-    return program_counter + i_field_num_bytes 
-
-
-#AND Immediate
-def NI():
-    #OC,I2,B1,D1
-    And_Or_Xor_code(i_format, ' & ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#AND Register
-def NR():
-    #OC,R1,R2
-    And_Or_Xor_code(i_format, ' & ')
-    
-    return program_counter + i_field_num_bytes  
-
-
-#OR
-def O():
-    #OC,R1,X2,B2,D2
-    And_Or_Xor_code(i_format, ' | ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#OR Characters
-def OC():
-    #OC,LL,B1,D1,B3,D3
-    And_Or_Xor_code(i_format, ' | ')
-    
-    return program_counter + i_field_num_bytes 
-
-
-#OR Immediate
-def OI():
-    #OC,I2,B1,D1
-    And_Or_Xor_code(i_format, ' | ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#OR Register
-def OR():
-    #OC,R1,R2
-    And_Or_Xor_code(i_format, ' | ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Pack
-def PACK():
-    global instrdata_list
-    #OC,L1,L2,B1,D1,B3,D3
-    
-    addr1 = calc_address(_B1, _D1)
-    numb1 = _L1 + 1
-
-    addr2 = calc_address(_B3, _D3)
-    numb2 = _L2 + 1
-    
-    op2 = ''.join(instrdata_list[addr2:addr2+numb2])    
-
-    if op2[-2] == 'F' or op2[-2] == 'C':
-        sign = 'C'  #positive number
-    else:
-        sign = 'D'  #negative number
-
-    packed_result = (op2.replace('F','') + sign).rjust(numb1*2, '0')
-    
-    j = 0
-    for i in range(0,numb1*2,2):
-        instrdata_list[addr1+j] = packed_result[i:i+2]
-        j = j + 1
-
-    return program_counter + i_field_num_bytes    
-    
-    
-#Subtract
-def S():
-    #OC,R1,X2,B2,D2
-    Add_Sub_code(4, '-')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Subtract Halfword
-def SH():
-    #OC,R1,X2,B2,D2
-    Add_Sub_code(2, '-')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Subtract Logical
-def SL():
-    #OC,R1,X2,B2,D2
-    Add_Sub_Logical_code(4, '-')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Shift Left Single
-def SLA():
-    global regs, cond_code
-    #OC,R1,X2,B2,D2
-    
-    op1 = cast_to_type(regs[_R1],str)
-        
-    b = bin(int(op1,16)).lstrip('0b').rjust(32,'0')
-    
-    sign_bit = b[0]
-    numerics = b[1:]
-   
-    numerics_list = list(numerics)
-    
-    overflow = False
-    
-    for i in range(0,_D2):
-        shifted_out_bit = numerics_list.pop(0)
-        if shifted_out_bit != sign_bit:
-            overflow = True
-        numerics_list.append('0')
-    
-    numerics_list.insert(0, sign_bit)    #put the sign back
-    
-    regs[_R1] = hex(int(''.join(numerics_list),2)).lstrip('0x').rjust(8,'0').upper()
-    result = cvthex2int(regs[_R1])
-    
-    if overflow:
-        cond_code = ['0','0','0','1']
-    elif result == 0:
-        cond_code = ['1','0','0','0']
-    elif result < 0:
-        cond_code = ['0','1','0','0']
-    elif result > 0:
-        cond_code = ['0','0','1','0']
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Left Double
-def SLDA():
-    global regs, cond_code
-    #OC,R1,X2,B2,D2
-
-    even_reg = _R1
-    odd_reg = _R1 + 1
-    
-    op1_e = cast_to_type(regs[even_reg],str)
-    op1_o = cast_to_type(regs[odd_reg],str)    
-        
-    b = bin(int(op1_e + op1_o,16)).lstrip('0b').rjust(64,'0')
-    
-    sign_bit = b[0]
-    numerics = b[1:]
-   
-    numerics_list = list(numerics)
-    
-    overflow = False
-    
-    for i in range(0,_D2):
-        shifted_out_bit = numerics_list.pop(0)
-        if shifted_out_bit != sign_bit:
-            overflow = True
-        numerics_list.append('0')
-    
-    numerics_list.insert(0, sign_bit)    #put the sign back
-    
-    r64 = hex(int(''.join(numerics_list),2)).lstrip('0x').rjust(16,'0').upper()
-    
-    regs[even_reg] = r64[0:8]
-    regs[odd_reg] = r64[8:16]
-    
-    result = cvthex2int(r64)
-    
-    if overflow:
-        cond_code = ['0','0','0','1']
-    elif result == 0:
-        cond_code = ['1','0','0','0']
-    elif result < 0:
-        cond_code = ['0','1','0','0']
-    elif result > 0:
-        cond_code = ['0','0','1','0']
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Left Double Logical
-def SLDL():
-    global regs
-    #OC,R1,X2,B2,D2
-
-    even_reg = _R1
-    odd_reg = _R1 + 1
-    
-    op1_e = cast_to_type(regs[even_reg],str)
-    op1_o = cast_to_type(regs[odd_reg],str) 
-       
-    op1_e_o_bin = bin(int(op1_e + op1_o,16)).lstrip('0b').rjust(64,'0')
-    op1_e_o_list = list(op1_e_o_bin)
-    
-    for i in range(0,_D2):
-        op1_e_o_list.pop(0)
-        op1_e_o_list.append('0')
-    
-    r64 = hex(int(''.join(op1_e_o_list),2)).lstrip('0x').rjust(16,'0').upper()
-    
-    regs[even_reg] = r64[0:8]
-    regs[odd_reg] = r64[8:16]
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Left Single Logical
-def SLL():
-    global regs
-    #OC,R1,X2,B2,D2
-    
-    op1 = cast_to_type(regs[_R1],str)
-        
-    op1_bin = bin(int(op1,16)).lstrip('0b').rjust(32,'0')
-    op1_list = list(op1_bin)
-    
-    for i in range(0,_D2):
-        op1_list.pop(0)
-        op1_list.append('0')
-    
-    regs[_R1] = hex(int(''.join(op1_list),2)).lstrip('0x').rjust(8,'0').upper()
-        
-    return program_counter + i_field_num_bytes
-
-
-#Subtract Logical Register
-def SLR():
-    #OC,R1,R2
-    Add_Sub_Logical_code(0, '-')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Subtract Packed
-def SP():
-    #OC,L1,L2,B1,D1,B3,D3
-    Add_Sub_Mul_Packed_code('-')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Subtract Register
-def SR():
-    #OC,R1,R2
-    Add_Sub_code(0, '-')
-    
-    return program_counter + i_field_num_bytes
-
-
-#Shift Right Single
-def SRA():
-    global regs, cond_code
-    #OC,R1,X2,B2,D2
-    
-    op1 = cast_to_type(regs[_R1],str)
-        
-    b = bin(int(op1,16)).lstrip('0b').rjust(32,'0')
-    
-    sign_bit = b[0]
-    numerics = b[1:]
-   
-    numerics_list = list(numerics)
-    
-    for i in range(0,_D2):
-        numerics_list.pop()
-        numerics_list.insert(0, sign_bit)
-        
-    numerics_list.insert(0, sign_bit)    #put the sign back
-    
-    regs[_R1] = hex(int(''.join(numerics_list),2)).lstrip('0x').rjust(8,'0').upper()
-    result = cvthex2int(regs[_R1])
-    
-    cond_code = ['0','0','0','0']
-    if result == 0:
-        cond_code = ['1','0','0','0']
-    elif result < 0:
-        cond_code = ['0','1','0','0']
-    elif result > 0:
-        cond_code = ['0','0','1','0']
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Right Double
-def SRDA():
-    global regs, cond_code
-    #OC,R1,X2,B2,D2
-
-    even_reg = _R1
-    odd_reg = _R1 + 1
-    
-    op1_e = cast_to_type(regs[even_reg],str)
-    op1_o = cast_to_type(regs[odd_reg],str)
-     
-    b = bin(int(op1_e + op1_o,16)).lstrip('0b').rjust(64,'0')
-    
-    sign_bit = b[0]
-    numerics = b[1:]
-   
-    numerics_list = list(numerics)
-    
-    for i in range(0,_D2):
-        numerics_list.pop()
-        numerics_list.insert(0, sign_bit)
-        
-    numerics_list.insert(0, sign_bit)    #put the sign back
-    
-    r64 = hex(int(''.join(numerics_list),2)).lstrip('0x').rjust(16,'0').upper()
-    regs[even_reg] = r64[0:8]
-    regs[odd_reg] = r64[8:16]
-
-    result = cvthex2int(r64)
-    
-    cond_code = ['0','0','0','0']
-    if result == 0:
-        cond_code = ['1','0','0','0']
-    elif result < 0:
-        cond_code = ['0','1','0','0']
-    elif result > 0:
-        cond_code = ['0','0','1','0']
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Right Double Logical
-def SRDL():
-    global regs
-    #OC,R1,X2,B2,D2
-
-    even_reg = _R1
-    odd_reg = _R1 + 1
-    
-    op1_e = cast_to_type(regs[even_reg],str)
-    op1_o = cast_to_type(regs[odd_reg],str) 
-        
-    op1_e_o_bin = bin(int(op1_e + op1_o,16)).lstrip('0b').rjust(64,'0')
-    op1_e_o_list = list(op1_e_o_bin)
-    
-    for i in range(0,_D2):
-        op1_e_o_list.pop()
-        op1_e_o_list.insert(0, '0')
-        
-    r64 = hex(int(''.join(op1_e_o_list),2)).lstrip('0x').rjust(16,'0').upper()
-    regs[even_reg] = r64[0:8]
-    regs[odd_reg] = r64[8:16]
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift Right Single Logical
-def SRL():
-    global regs, cond_code
-    #OC,R1,X2,B2,D2
-    
-    op1 = cast_to_type(regs[_R1],str)
-        
-    op1_bin = bin(int(op1,16)).lstrip('0b').rjust(32,'0')
-    op1_list = list(op1_bin)
-    
-    for i in range(0,_D2):
-        op1_list.pop()
-        op1_list.insert(0, '0')
-        
-    regs[_R1] = hex(int(''.join(op1_list),2)).lstrip('0x').rjust(8,'0').upper()
-        
-    return program_counter + i_field_num_bytes
-
-
-#Shift and Round Decimal
-def SRP():
-    global instrdata_list, cond_code
-    #OC,L1,L2,B1,D1,B3,D3
-    
-    addr = calc_address(_B1, _D1)
-    op1 = ''.join(instrdata_list[addr:addr+_L1+1])
-    
-    sign = op1[-1]
-    digits = list(op1[0:-1])
-    
-    rounding_digit = _L2
-    num_to_shift = _D3
-
-    if num_to_shift > 31:   #indicates a negative value, convert 2s comp to - signed integer
-        t  = bin(num_to_shift).lstrip('0b').rjust(16,'1')
-        num_to_shift = cvt2scomp(hex(int(t,2)).lstrip('0x').upper())
-        
-    overflow = False
-    t = digits
-    if num_to_shift > 0:
-        #shift left
-        for i in range(0,num_to_shift):
-            d = digits.pop(0)
-            if d != '0':
-                overflow = True
-            digits.append('0')
-        t = ''.join(digits)    
-    elif num_to_shift < 0:
-        #shift right
-        for i in range(0,abs(num_to_shift)):
-            d = digits.pop()
-            digits.insert(0,'0')
-        t = ''.join(digits)
-        #round if sum of last digit shifted + the rounding digit result in a carry 
-        if int(d) + rounding_digit > 9:
-            t = str(int(t) + 1).rjust((2*(_L1+1))-1,'0')
-    
-    if overflow:
-        cond_code = ['0','0','0','1']
-    elif int(t) == 0:
-        cond_code = ['1','0','0','0']
-    elif sign in 'BD':
-        cond_code = ['0','1','0','0']    
-    elif sign in 'ACEF':
-        cond_code = ['0','0','1','0']
-
-    op1 = t + sign
-    
-    z = 0
-    for i in range(0,(_L1+1)*2,2):
-        instrdata_list[addr+z] = op1[i:i+2]
-        z = z + 1    
-        
-    return program_counter + i_field_num_bytes
-
-
-#Store
-def ST():
-    #OC,R1,X2,B2,D2
-    Store_code(4)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Store Character
-def STC():
-    #OC,R1,X2,B2,D2
-    Store_code(1)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Store Halfword
-def STH():
-    #OC,R1,X2,B2,D2
-    Store_code(2)
-    
-    return program_counter + i_field_num_bytes
-
-
-#Store Characters under Mask
-def STCM():
-    global instrdata_list
-    #OC,R1,R2,B2,D2
-        
-    _M3 = _R2
-    
-    mask = list(bin(_M3).lstrip('0b').rjust(4,'0'))
-    numb = mask.count('1')
-    
-    if numb == 0:
-        return program_counter + i_field_num_bytes
-        
-    op1 = cast_to_type(regs[_R1],str)    
-        
-    op1_list = [op1[i:i+2] for i in range(0,8,2)]  #make list of _R1 bytes
-
-    addr = calc_address(_B2, _D2)    
-    
-    j = 0
-    for i in range(0,4):
-        if mask[i] == '1':
-            instrdata_list[addr+j] = op1_list[i]
-            j = j + 1
+            self.cond_code = 1
+
+        return self.program_counter + ins.length
+
+
+    #Translate
+    def TR(self, ins):
+        #OC,LL,B1,D1,B3,D3
+
+        arg_addr = self.calc_address(ins.B1, ins.D1)
+        func_addr = self.calc_address(ins.B3, ins.D3)
+        end = arg_addr + ins.LL + 1
+
+        table = self.translate_table(func_addr)
+        if table is None or end > len(self.storage) or (func_addr < end and arg_addr < func_addr + 256):
+            #the table runs off the end of storage or is changed by the translation - one byte at a time
+            for i in range(0,ins.LL+1):
+                offset = self.storage[arg_addr+i]
+                self.storage[arg_addr+i] = self.storage[func_addr+offset]
+        else:
+            self.storage[arg_addr:end] = self.storage[arg_addr:end].translate(table)
+        self.invalidate_decode_cache(arg_addr, ins.LL+1)
+
+        return self.program_counter + ins.length
+
+
+    #Translate and Test
+    def TRT(self, ins):
+        #OC,LL,B1,D1,B3,D3
+
+        self.cond_code = 0   #assume All function bytes are zero
+
+        arg_addr = self.calc_address(ins.B1, ins.D1)
+        func_addr = self.calc_address(ins.B3, ins.D3)
+
+        pattern = self.test_pattern(func_addr)
+        if pattern is not None and arg_addr + ins.LL + 1 <= len(self.storage):
+            hit = pattern.search(self.storage, arg_addr, arg_addr + ins.LL + 1)
+            if hit is not None:
+                i = hit.start()
+                self.regs[1] = i
+                self.regs[2] = (self.regs[2] & 0xFFFFFF00) | self.translate_tables[func_addr][self.storage[i]]
+                self.cond_code = 1 if i - arg_addr < ins.LL else 2
+            return self.program_counter + ins.length
+
+        #the table or the argument runs off the end of storage - one byte at a time
+        got_hit_on_last = False
+
+        for i in range(0,ins.LL+1):
+            offset = self.storage[arg_addr+i]
+            trans_byte = self.storage[func_addr+offset]
+
+            if trans_byte != 0:
+                self.regs[1] = arg_addr+i
+                self.regs[2] = (self.regs[2] & 0xFFFFFF00) | trans_byte
+                if i == ins.LL:
+                    got_hit_on_last = True
+                break
+
+        if i < ins.LL:
+            self.cond_code = 1
+        elif got_hit_on_last:
+            self.cond_code = 2
+
+        return self.program_counter + ins.length
+
+
+    #UnPack
+    def UNPK(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+
+        addr1 = self.calc_address(ins.B1, ins.D1)
+        addr2 = self.calc_address(ins.B3, ins.D3)
+
+        self.store_bytes(addr1, unpack(self.storage[addr2:addr2+ins.L2+1], ins.L1+1))
+
+        return self.program_counter + ins.length
+
+
+    #XOR
+    def X(self, ins):
+        #OC,R1,X2,B2,D2
+        self.And_Or_Xor_code(ins, ins.format, '^')
+
+        return self.program_counter + ins.length
+
+
+    #XOR Characters
+    def XC(self, ins):
+        #OC,LL,B1,D1,B3,D3
+        self.And_Or_Xor_code(ins, ins.format, '^')
+
+        return self.program_counter + ins.length
+
 
-    return program_counter + i_field_num_bytes
-
-
-#Store Multiple
-def STM():
-    global instrdata_list
-    #OC,R1,R2,B2,D2
-    
-    addr = calc_address(_B2, _D2)
-    
-    starting_reg = _R1
-    ending_reg = _R2
-    
-    j = starting_reg
-
-    while True:
-        reg_contents = cast_to_type(regs[j],str)
-        reg_contents_list = [reg_contents[i:i+2] for i in range(0,8,2)]
-        for k in range(0,4):
-            instrdata_list[addr+k] = reg_contents_list[k]
-        addr = addr + 4
-        j = j + 1
-        if j > 15:
-            j = 0
-        if j == ending_reg+1:
-            break
-
-    return program_counter + i_field_num_bytes    
-
-    
-#Test under Mask
-def TM():
-    global cond_code
-    #OC,I2,B1,D1
-    
-    cond_code = ['1','0','0','0']   #assume Selected bits all zeros, or the mask is all zeros  
-    
-    _M1 = int(_I2,16)
-    
-    mask = list(bin(_M1).lstrip('0b').rjust(8,'0'))
-    numb = mask.count('1')
-    
-    if numb == 0:
-        return program_counter + i_field_num_bytes 
-        
-    addr = calc_address(_B1, _D1)
-    op1 = int(instrdata_list[addr],16)    
-    op1_list = list(bin(op1).lstrip('0b').rjust(8,'0'))
-    
-    zeroct = 0
-    for i in range(0,8):
-        if mask[i] == '1':
-            if op1_list[i] == '0':
-                zeroct = zeroct + 1
-
-    if zeroct == numb:
-        pass
-    elif zeroct == 0:
-        cond_code = ['0','0','0','1']
-    else:
-        cond_code = ['0','1','0','0']    
-        
-    return program_counter + i_field_num_bytes
-    
-    
-#Translate
-def TR():
-    global instrdata_list
-    #OC,LL,B1,D1,B3,D3
-    
-    arg_addr = calc_address(_B1, _D1)
-    func_addr = calc_address(_B3, _D3)
-
-    for i in range(0,_LL+1):
-        offset = int(instrdata_list[arg_addr+i],16)
-        instrdata_list[arg_addr+i] = instrdata_list[func_addr+offset]
-        
-    return program_counter + i_field_num_bytes
-
-
-#Translate and Test
-def TRT():
-    global regs, instrdata_list, cond_code
-    #OC,LL,B1,D1,B3,D3
-    
-    cond_code = ['1','0','0','0']   #assume All function bytes are zero
-    
-    arg_addr = calc_address(_B1, _D1)
-    func_addr = calc_address(_B3, _D3)
-    
-    got_hit_on_last = False
-    
-    for i in range(0,_LL+1):
-        offset = int(instrdata_list[arg_addr+i],16)
-        trans_byte = instrdata_list[func_addr+offset]
-        
-        if trans_byte != '00':
-            regs[1] = arg_addr+i
-            R2_str = cast_to_type(regs[2],str)
-            regs[2] = R2_str[0:6] + trans_byte
-            if i == _LL:
-                got_hit_on_last = True
-            break
-            
-    if i < _LL:
-        cond_code = ['0','1','0','0']
-    elif got_hit_on_last:    
-        cond_code = ['0','0','1','0']  
-
-    return program_counter + i_field_num_bytes
-
-
-#UnPack
-def UNPK():
-    global instrdata_list
-    #OC,L1,L2,B1,D1,B3,D3
-    
-    addr1 = calc_address(_B1, _D1)
-    numb1 = _L1 + 1
-
-    addr2 = calc_address(_B3, _D3)
-    numb2 = _L2 + 1
-    
-    op2 = ''.join(instrdata_list[addr2:addr2+numb2])    
-    
-    digits = op2[0:-1].rjust(numb1,'0')
-
-    sign = op2[-1]
-    
-    unpacked_result = ''
-    
-    for i in range(0,len(digits)-1):
-        unpacked_result = unpacked_result + 'F' + digits[i]
-        
-    unpacked_result = unpacked_result + sign + digits[-1]
-
-    j = 0
-    for i in range(0,numb1*2,2):
-        instrdata_list[addr1+j] = unpacked_result[i:i+2]
-        j = j + 1
-
-    return program_counter + i_field_num_bytes    
-    
-
-#XOR
-def X():
-    #OC,R1,X2,B2,D2
-    And_Or_Xor_code(i_format, ' ^ ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#XOR Characters
-def XC():
-    #OC,LL,B1,D1,B3,D3
-    And_Or_Xor_code(i_format, ' ^ ')
-    
-    return program_counter + i_field_num_bytes 
-
-
-#XOR Immediate
-def XI():
-    #OC,I2,B1,D1
-    And_Or_Xor_code(i_format, ' ^ ')
-    
-    return program_counter + i_field_num_bytes
-
-
-#XOR Register
-def XR():
-    #OC,R1,R2
-    And_Or_Xor_code(i_format, ' ^ ')
-    
-    return program_counter + i_field_num_bytes
-
-    
-#Zero and Add Packed
-def ZAP():
-    #OC,L1,L2,B1,D1,B3,D3
-    Add_Sub_Mul_Packed_code('z')
-    
-    return program_counter + i_field_num_bytes    
-
-
-#Execute
-def EX():
-    global Execute_list, save_program_counter
-    #OC,R1,X2,B2,D2
-    op1 = cast_to_type(regs[_R1],str)
-
-    op1_list = [op1[i:i+2] for i in range(0,8,2)]  #make list of _R1 bytes
-    
-    addr = calc_address(_B2, _D2, _X2)
-    Execute_list = instrdata_list[addr:addr+6]   #copy instruction to be EXECUTEd to a list
-    
-    field1 = int(op1_list[3],16)     #bits 24-31 of the register specified by R1
-    field2 = int(Execute_list[1],16) #Bits 8-15 of the instruction designated by the branch address
-    
-    result = field1 | field2             #OR the two
-    
-    Execute_list[1] = hex(result).lstrip('0x').rjust(2,'0').upper() #and replace Bits 8-15 of the instruction
-    
-    save_program_counter = program_counter + i_field_num_bytes
-    
-    return 999999
-    
-    
-#Supervisor Call
-def SVC(): 
-    global regs, instrdata_list
-    global file_handle_dict
-    global term_output
-    
-    term_output = ''
-    
-    #OC,R1,R2   
-    SVCnum = (_R1 * 16) + _R2
-    
-    if SVCnum == 255:                       #print alphanumeric data to OUTPUT.TXT
-        addr = cast_to_type(regs[0],int)    #register 0 points to data
-        numb = cast_to_type(regs[1],int)    #register 1 is the data length
-        if not Debug:
-            for ebyte in instrdata_list[addr:addr+numb]:
-                print(chr(int(EBC2ASC[int(ebyte,16)],16)), end="")
-            print(' ')
+    #XOR Immediate
+    def XI(self, ins):
+        #OC,I2,B1,D1
+        self.And_Or_Xor_code(ins, ins.format, '^')
+
+        return self.program_counter + ins.length
+
+
+    #XOR Register
+    def XR(self, ins):
+        #OC,R1,R2
+        self.And_Or_Xor_code(ins, ins.format, '^')
+
+        return self.program_counter + ins.length
+
+
+    #Zero and Add Packed
+    def ZAP(self, ins):
+        #OC,L1,L2,B1,D1,B3,D3
+        self.Add_Sub_Mul_Packed_code(ins, 'z')
+
+        return self.program_counter + ins.length
+
+
+    #Execute
+    #the target instruction is run in place of the EX - a branch it takes is taken, otherwise
+    #execution continues after the EX, which is where a BAL / BALR target links back to
+    def EX(self, ins):
+        #OC,R1,X2,B2,D2
+        addr = self.calc_address(ins.B2, ins.D2, ins.X2)
+
+        #bits 24-31 of the register specified by R1 are ORed into bits 8-15 of the target
+        modifier = self.regs[ins.R1] & 0xFF if ins.R1 != 0 else 0
+
+        targets = self.execute_cache.get(addr)
+        target = targets.get(modifier) if targets is not None else None
+        if target is None:
+            target = self.decode_execute_target(addr, modifier)
+
+        #the instruction routines continue at their own address + length
+        program_counter = self.program_counter
+        self.program_counter = program_counter + ins.length - target.length
+        try:
+            return target.handler(target)
+        except Exception:
+            self.program_counter = program_counter
+            raise
+
+
+    #Decode the target of an EX at storage address addr with modifier ORed into its second byte
+    #and add it to execute_cache - raises ProgramException if it cannot be executed
+    def decode_execute_target(self, addr, modifier):
+        if addr >= len(self.storage):
+            raise ProgramException(ADDRESSING_EXCEPTION, 'EX target beyond end of storage')
+        try:
+            i_format, handler = self.mach_inst[self.storage[addr]]
+        except KeyError:
+            raise ProgramException(OPERATION_EXCEPTION, 'invalid EX target') from None
+        if handler.__name__ == 'EX':
+            raise ProgramException(EXECUTE_EXCEPTION, 'EX of an EX instruction')
+
+        i_length = format_length[i_format]
+        mi_bytes = bytearray(self.storage[addr:addr+i_length])
+        if len(mi_bytes) < i_length:
+            raise ProgramException(ADDRESSING_EXCEPTION, 'EX target beyond end of storage')
+        mi_bytes[1] = mi_bytes[1] | modifier
+        target = Instruction(bytes(mi_bytes), i_format, handler)
+
+        self.execute_cache.setdefault(addr, {})[modifier] = target
+        if addr < self.decode_cache_low:
+            self.decode_cache_low = addr
+        if addr + i_length > self.decode_cache_high:
+            self.decode_cache_high = addr + i_length
+        self.watch(addr, addr + i_length)
+        return target
+
+
+    #Supervisor Call
+    def SVC(self, ins):
+        #OC,R1,R2
+        SVCnum = (ins.R1 * 16) + ins.R2
+
+        handler = self.svc_table.get(SVCnum)
+        if handler is None:
+            print('Invalid SVC', file=self.out)
         else:
-            for ebyte in instrdata_list[addr:addr+numb]:
-                term_output += chr(int(EBC2ASC[int(ebyte,16)],16)) #output to debug window
-            
-        
-    elif SVCnum == 254:   #print contents of register 0 to OUTPUT.TXT as signed integer
-        print(cast_to_type(regs[0],int))
-        term_output += str(cast_to_type(regs[0],int)) #output to debug window
-        
-    elif SVCnum == 253:   #print contents of register 0 to terminal as 4 byte hex string to OUTPUT.TXT
-        print(cast_to_type(regs[0],str))
-        term_output += str(cast_to_type(regs[0],str)) #output to debug window
-        
-    elif SVCnum == 252:   #print contents of the cond_code to OUTPUT.TXT
-        print(cond_code)
-        
-    elif SVCnum == 251:   #print the contents of the regs to OUTPUT.TXT
-        print(regs)
-        
-    elif SVCnum == 250:   #sleep for x ms
-        numms = cast_to_type(regs[0],int)    #register 0 is the number of ms to sleep
+            handler()
+
+        return self.program_counter + ins.length
+
+
+    #SVC 255 - print alphanumeric data to OUTPUT.TXT
+    def svc_print_data(self):
+        addr = self.regs[0] & 0xFFFFFF      #register 0 points to data
+        numb = self.regs[1]                 #register 1 is the data length
+        text = self.storage[addr:addr+numb].translate(EBC2ASC_TABLE).decode('latin-1')
+        if not self.debug:
+            print(text, end="", file=self.out)
+            print(' ', file=self.out)
+        else:
+            self.term_output += text + ' ' #output to debug window
+
+
+    #SVC 254 - print contents of register 0 to OUTPUT.TXT as signed integer
+    def svc_print_signed(self):
+        print(signed32(self.regs[0]), file=self.out)
+        if self.debug:
+            self.term_output += '%d ' % signed32(self.regs[0]) #output to debug window
+
+
+    #SVC 253 - print contents of register 0 to terminal as 4 byte hex string to OUTPUT.TXT
+    def svc_print_hex(self):
+        print('%08X' % self.regs[0], file=self.out)
+        if self.debug:
+            self.term_output += '%08X ' % self.regs[0] #output to debug window
+
+
+    #SVC 252 - print contents of the cond_code to OUTPUT.TXT
+    def svc_print_cond_code(self):
+        print(self.cond_code, file=self.out)
+
+
+    #SVC 251 - print the contents of the regs to OUTPUT.TXT
+    def svc_print_regs(self):
+        print(['%08X' % reg for reg in self.regs], file=self.out)
+
+
+    #SVC 250 - sleep for x ms
+    def svc_sleep(self):
+        numms = self.regs[0]                #register 0 is the number of ms to sleep
+        if self.deadline is not None and time.perf_counter() + numms / 1000 > self.deadline:
+            #the sleep would outlast the time limit - sleep until it and end the program
+            time.sleep(max(self.deadline - time.perf_counter(), 0))
+            raise ProgramException('S322', TIME_LIMIT_REASON % self.max_seconds)
         time.sleep(numms / 1000)
-        
-    elif SVCnum == 249:   #open PC file
+
+
+    #SVC 249 - open PC file
+    def svc_open(self):
         rw_dict = {'00': 'r', '01': 'w'}
-        addr = cast_to_type(regs[0],int)    #register 0 points to file name to open
-        R1_str = cast_to_type(regs[1],str)  #register 1 byte 0 = file handle number; byte 1 = r/w indicator; bytes 2-3 = file name length
+        addr = self.regs[0] & 0xFFFFFF      #register 0 points to file name to open
+        R1_str = '%08X' % self.regs[1]      #register 1 byte 0 = file handle number; byte 1 = r/w indicator; bytes 2-3 = file name length
         file_handle_num = R1_str[0:2]       #00 - 99 file handle
-        rw_indicator = R1_str[2:4]          #00 = open for read; 01 = open for write 
-        
+        rw_indicator = R1_str[2:4]          #00 = open for read; 01 = open for write
+
         if rw_indicator not in rw_dict.keys():
-            print('SVC 249 - Open Error: register 1 byte 1 r/w indicator invalid')
-            regs[15] = 1                            #invalid r/w indicator then set rc in register 15 to 1
+            print('SVC 249 - Open Error: register 1 byte 1 r/w indicator invalid', file=self.out)
+            self.regs[15] = 1                       #invalid r/w indicator then set rc in register 15 to 1
         else:
             try:
                 t = int(file_handle_num)            #make sure file handle is valid
                 filename_len = int(R1_str[4:],16)
-                filename = ''
-                for i in range(0,filename_len):
-                    ebyte = instrdata_list[addr+i]
-                    filename = filename + chr(int(EBC2ASC[int(ebyte,16)],16))
+                filename = self.storage[addr:addr+filename_len].translate(EBC2ASC_TABLE).decode('latin-1')
                 #test if filename is an environment variable
                 ext_filename = os.environ.get(filename)
                 if not ext_filename == None:
                     filename = ext_filename     #yes, use value of environment variable as filename
-                try:    
-                    open_string = 'fh' + file_handle_num + ' = open(filename, rw_dict[rw_indicator])'
-                    exec(open_string)
-                    file_handle_dict['fh' + file_handle_num] = eval('fh' + file_handle_num)
-                    regs[15] = 0                    #good file open then set rc in register 15 to 0
+                try:
+                    self.file_handle_dict['fh' + file_handle_num] = open(filename, rw_dict[rw_indicator])
+                    self.regs[15] = 0               #good file open then set rc in register 15 to 0
                 except:
-                    print('SVC 249 - Open Error: general file open error')
-                    regs[15] = 3                    #bad file open then set rc in register 15 to 3
+                    print('SVC 249 - Open Error: general file open error', file=self.out)
+                    self.regs[15] = 3               #bad file open then set rc in register 15 to 3
             except ValueError:
-                print('SVC 249 - Open Error: register 1 byte 0 invalid file handle number')
-                regs[15] = 2                        #invalid file handle then set rc in register 15 to 2
-                
-    elif SVCnum == 248:   #close PC file
-        R1_str = cast_to_type(regs[1],str)          #register 1 byte 0 = file handle number
+                print('SVC 249 - Open Error: register 1 byte 0 invalid file handle number', file=self.out)
+                self.regs[15] = 2                   #invalid file handle then set rc in register 15 to 2
+
+
+    #SVC 248 - close PC file
+    def svc_close(self):
+        R1_str = '%08X' % self.regs[1]              #register 1 byte 0 = file handle number
         file_handle_num = R1_str[0:2]               #00 - 99 file handle
         try:
             t = int(file_handle_num)                #make sure file handle is valid
             try:
-                file_handle_dict['fh' + file_handle_num].close()
-                del file_handle_dict['fh' + file_handle_num]
-                regs[15] = 0                        #indicate good return from close
+                self.file_handle_dict['fh' + file_handle_num].close()
+                del self.file_handle_dict['fh' + file_handle_num]
+                self.regs[15] = 0                   #indicate good return from close
             except:
-                print('SVC 248 - Close Error: general file close error')
-                regs[15] = 2                        #indicate bad return from close
+                print('SVC 248 - Close Error: general file close error', file=self.out)
+                self.regs[15] = 2                   #indicate bad return from close
         except ValueError:
-            print('SVC 248 - Close Error: register 1 byte 0 invalid file handle')
-            regs[15] = 1                            #invalid file handle then set rc in register 15 to 1            
-        
-    elif SVCnum == 247:   #get record from PC file
-        R1_str = cast_to_type(regs[1],str)          #register 1 byte 0 = file handle number
+            print('SVC 248 - Close Error: register 1 byte 0 invalid file handle', file=self.out)
+            self.regs[15] = 1                       #invalid file handle then set rc in register 15 to 1
+
+
+    #SVC 247 - get record from PC file
+    def svc_get(self):
+        R1_str = '%08X' % self.regs[1]              #register 1 byte 0 = file handle number
         file_handle_num = R1_str[0:2]               #00 - 99 file handle
         try:
             t = int(file_handle_num)                #make sure file handle is valid
             try:
-                record = file_handle_dict['fh' + file_handle_num].readline().rstrip('\n')
+                record = self.file_handle_dict['fh' + file_handle_num].readline().rstrip('\n')
                 reclen = len(record)
-                regs[15] = reclen                       #load register 15 with the length of the record read 
+                self.regs[15] = reclen                  #load register 15 with the length of the record read
                 if reclen > 0:                          #a record length of 0 indicates an EOF condition
-                    addr = cast_to_type(regs[0],int)    #register 0 points to data area
-                    for i in range(0,reclen):
-                        instrdata_list[addr+i] = ASC2EBC[ord(record[i])]
+                    addr = self.regs[0] & 0xFFFFFF      #register 0 points to data area
+                    self.store_bytes(addr, record.encode('latin-1').translate(ASC2EBC_TABLE))
             except:
-                print('SVC 247 - Get Error: general file get error')
-                regs[15] = -1                           #indicate bad return from get
+                print('SVC 247 - Get Error: general file get error', file=self.out)
+                self.regs[15] = 0xFFFFFFFF              #indicate bad return from get (-1)
         except ValueError:
-            print('SVC 247 - Get Error: register 1 byte 0 invalid file handle')
-            regs[15] = 1                            #invalid file handle then set rc in register 15 to 1            
-            
-    elif SVCnum == 246:   #put record to PC file
-        addr = cast_to_type(regs[0],int)            #register 0 points to data
-        R1_str = cast_to_type(regs[1],str)          #register 1 byte 0 = file handle number; bytes 2-3 = the data length
+            print('SVC 247 - Get Error: register 1 byte 0 invalid file handle', file=self.out)
+            self.regs[15] = 1                       #invalid file handle then set rc in register 15 to 1
+
+
+    #SVC 246 - put record to PC file
+    def svc_put(self):
+        addr = self.regs[0] & 0xFFFFFF              #register 0 points to data
+        R1_str = '%08X' % self.regs[1]              #register 1 byte 0 = file handle number; bytes 2-3 = the data length
         file_handle_num = R1_str[0:2]               #00 - 99 file handle
         numb = int(R1_str[4:],16)                   #extract data length from register 1 bytes 2-3
         try:
             t = int(file_handle_num)                #make sure file handle is valid
             try:
-                for ebyte in instrdata_list[addr:addr+numb]:
-                    file_handle_dict['fh' + file_handle_num].write(chr(int(EBC2ASC[int(ebyte,16)],16)))
-                file_handle_dict['fh' + file_handle_num].write('\n')
-                regs[15] = 0                        #indicate good return from put
+                self.file_handle_dict['fh' + file_handle_num].write(self.storage[addr:addr+numb].translate(EBC2ASC_TABLE).decode('latin-1'))
+                self.file_handle_dict['fh' + file_handle_num].write('\n')
+                self.regs[15] = 0                   #indicate good return from put
             except:
-                print('SVC 246 - Get Error: general file put error')
-                regs[15] = 2                        #indicate bad return from put
+                print('SVC 246 - Get Error: general file put error', file=self.out)
+                self.regs[15] = 2                   #indicate bad return from put
         except ValueError:
-            print('SVC 246 - Put Error: register 1 byte 1 invalid file handle')
-            regs[15] = 1                            #invalid file handle then set rc in register 15 to 1            
-    else:
-        print('Invalid SVC')
-    
-    return program_counter + i_field_num_bytes
+            print('SVC 246 - Put Error: register 1 byte 1 invalid file handle', file=self.out)
+            self.regs[15] = 1                       #invalid file handle then set rc in register 15 to 1
 
 
 # -------------------------------------------------------------------
-#main
+#Interactive Curses-based debugger
 # -------------------------------------------------------------------
 
-ASC2EBC = ['00', '01', '02', '03', '1A', '09', '1A', '7F', '1A', '1A', '1A', '0B', '0C', '0D', '0E', '0F',    # 00 - 0F
-           '10', '11', '12', '13', '3C', '3D', '32', '26', '18', '19', '3F', '27', '1C', '1D', '1E', '1F',    # 10 - 1F
-           '40', '4F', '7F', '7B', '5B', '6C', '50', '7D', '4D', '5D', '5C', '4E', '6B', '60', '4B', '61',    # 20 - 2F
-           'F0', 'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', '7A', '5E', '4C', '7E', '6E', '6F',    # 30 - 3F
-           '7C', 'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9', 'D1', 'D2', 'D3', 'D4', 'D5', 'D6',    # 40 - 4F
-           'D7', 'D8', 'D9', 'E2', 'E3', 'E4', 'E5', 'E6', 'E7', 'E8', 'E9', '4A', 'E0', '5A', '5F', '6D',    # 50 - 5F
-           '79', '81', '82', '83', '84', '85', '86', '87', '88', '89', '91', '92', '93', '94', '95', '96',    # 60 - 6F
-           '97', '98', '99', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'A9', 'C0', '6A', 'D0', 'A1', '07',    # 70 - 7F
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # 80 - 8F
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # 90 - 9F
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # A0 - AF
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # B0 - BF
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # C0 - CF
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # D0 - DF
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F',    # E0 - EF
-           '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F', '3F']    # F0 - FF
+# Function to wrap text and add it to the window
+# text beyond the last row inside the window's border is not shown
+def wrap_and_addstr(window, y, x, text, width):
+    last_row = window.getmaxyx()[0] - 2
+    start = 0
+    while start < len(text) and y <= last_row:
+        window.addstr(y, x, text[start:start + width])
+        y += 1
+        start += width
+
+
+#Return the register number given as a single hex digit 0-F
+#raises ValueError for any other form
+def parse_breakpoint_register(text):
+    text = text.strip()
+    if len(text) != 1:
+        raise ValueError('invalid register')
+    return int(text, 16)
+
+
+#Return the value of a register breakpoint given as '0D1234' (decimal) or '0X12FF' (hex)
+#raises ValueError for any other form
+def parse_breakpoint_value(text):
+    if text.startswith('0D'):
+        return int(text[2:]) & 0xFFFFFFFF
+    if text.startswith('0X'):
+        return int(text[2:], 16) & 0xFFFFFFFF
+    raise ValueError('invalid breakpoint value type')
+
+
+#Return a function of the register list that is True when a register holds its breakpoint
+#value, or None if there are no register breakpoints - reg_breakpoints is {register: value}
+def register_breakpoint_check(reg_breakpoints):
+    checks = tuple(reg_breakpoints.items())     #(register, value) pairs
+    if not checks:
+        return None
+    if len(checks) == 1:
+        (r, v), = checks
+        return lambda regs: regs[r] == v
+    return lambda regs: any(regs[r] == v for r, v in checks)
+
+
+#Return the addresses of breakpoints as text for the command window
+def format_breakpoints(breakpoints):
+    return ' '.join('%06X' % addr for addr in sorted(breakpoints))
+
+
+#Return the register breakpoints as text for the command window
+def format_reg_breakpoints(reg_breakpoints):
+    return ' '.join('R%d:0X%08X' % (r, v) for r, v in sorted(reg_breakpoints.items()))
+
+
+#g, r and s N run this many instructions between looks at the keyboard and the clock
+DEBUG_RUN_CHUNK = 1000
+
+#While g, r or s N runs, the panels are repainted once every DEBUG_REFRESH_MS ms
+DEBUG_REFRESH_MS = 100
+
+#Heights of the status (PC, condition code and registers) and command panels - the rows
+#left between them are shared by the source and storage panels
+DEBUG_STATUS_ROWS = 7
+DEBUG_COMMAND_ROWS = 6
+
+#The storage panel shows this many bytes a row
+DEBUG_STORAGE_ROW_BYTES = 16
+
+#EBCDIC -> the character the storage panel shows, '.' for one that does not print
+EBC2DISPLAY_TABLE = bytes(c if 0x20 <= c < 0x7F else 0x2E for c in EBC2ASC_TABLE)
+
+
+#A bordered debugger window that remembers the text and highlighting of each cell it
+#was given, so painting it again only writes the cells that changed
+class DebugPanel:
+    def __init__(self, window, title):
+        self.window = window
+        self.cells = {}             #(y, x) -> (text, highlighted)
+        window.border(0)
+        window.addstr(0, 2, ' %s ' % title)
+
+    #Put text at y, x - highlighted if highlight, or by default if the cell held other text
+    #the text must be as long as what it replaces
+    def put(self, y, x, text, highlight=None):
+        old = self.cells.get((y, x))
+        if highlight is None:
+            highlight = old is not None and old[0] != text
+        if old != (text, highlight):
+            self.window.addstr(y, x, text, curses.A_STANDOUT if highlight else curses.A_NORMAL)
+            self.cells[(y, x)] = (text, highlight)
+
+    #Forget the cells, so what is put next is not highlighted - for when the panel scrolls
+    def forget(self):
+        self.cells = {}
+
+
+#Run machine under the interactive debugger - s steps one instruction, s N, g and r
+#run at full speed until a breakpoint, the address given or a key press stops them
+def debugger(machine):
+    breakpoints = set()         #storage addresses
+
+    reg_breakpoints = {}        #register number -> value
+    reg_check = None            #register_breakpoint_check(reg_breakpoints)
+
+    refresh_ms = DEBUG_REFRESH_MS
 
-EBC2ASC = ['00', '01', '02', '03', '1A', '09', '1A', '7F', '1A', '1A', '1A', '0B', '0C', '0D', '0E', '0F',    # 00 - 0F
-           '10', '11', '12', '13', '1A', '1A', '08', '1A', '18', '19', '1A', '1A', '1C', '1D', '1E', '1F',    # 10 - 1F
-           '1A', '1A', '1A', '1A', '1A', '0A', '17', '1B', '1A', '1A', '1A', '1A', '1A', '05', '06', '07',    # 20 - 2F
-           '1A', '1A', '16', '1A', '1A', '1A', '1A', '04', '1A', '1A', '1A', '1A', '14', '15', '1A', '1A',    # 30 - 3F
-           '20', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '5B', '2E', '3C', '28', '2B', '21',    # 40 - 4F
-           '26', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '5D', '24', '2A', '29', '3B', '5E',    # 50 - 5F
-           '2D', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '7C', '2C', '25', '5F', '3E', '3F',    # 60 - 6F
-           '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '60', '3A', '23', '40', '27', '3D', '22',    # 70 - 7F
-           '1A', '61', '62', '63', '64', '65', '66', '67', '68', '69', '1A', '1A', '1A', '1A', '1A', '1A',    # 80 - 8F
-           '1A', '6A', '6B', '6C', '6D', '6E', '6F', '70', '71', '72', '1A', '1A', '1A', '1A', '1A', '1A',    # 90 - 9F
-           '1A', '7E', '73', '74', '75', '76', '77', '78', '79', '7A', '1A', '1A', '1A', '1A', '1A', '1A',    # A0 - AF
-           '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A', '1A',    # B0 - BF
-           '7B', '41', '42', '43', '44', '45', '46', '47', '48', '49', '1A', '1A', '1A', '1A', '1A', '1A',    # C0 - CF
-           '7D', '4A', '4B', '4C', '4D', '4E', '4F', '50', '51', '52', '1A', '1A', '1A', '1A', '1A', '1A',    # D0 - DF
-           '5C', '1A', '53', '54', '55', '56', '57', '58', '59', '5A', '1A', '1A', '1A', '1A', '1A', '1A',    # E0 - EF
-           '30', '31', '32', '33', '34', '35', '36', '37', '38', '39', '1A', '1A', '1A', '1A', '1A', '1A']    # F0 - FF
-           
-#Here are the machine instructions that are emulated
-mach_inst = { '05': ('RR',BALR), '46': ('RX',BCT),   '06': ('RR',BCTR), '47': ('RX',BC),  '07': ('RR',BCR), 
-              '45': ('RX',BAL),  '58': ('RX',L),     '48': ('RX',LH),   '18': ('RR',LR),  '41': ('RX',LA),
-              'D2': ('SS',MVC),  '92': ('SI',MVI),   '5A': ('RX',A),    '4A': ('RX',AH),  '1A': ('RR',AR),
-              '5B': ('RX',S),    '4B': ('RX',SH),    '1B': ('RR',SR),   '59': ('RX',C),   '49': ('RX',CH),
-              '55': ('RX',CL),   '15': ('RR',CLR),   '95': ('SI',CLI),  'D5': ('SS',CLC), 'BD': ('RS',CLM),
-              '50': ('RX',ST),   '42': ('RX',STC),   '40': ('RX',STH),  '4F': ('RX',CVB), '4E': ('RX',CVD),
-              '14': ('RR',NR),   '54': ('RX',N),     '94': ('SI',NI),   'D4': ('SS',NC),  '5D': ('RX',D),   
-              '16': ('RR',OR),   '56': ('RX',O),     '96': ('SI',OI),   'D6': ('SS',OC),  '1D': ('RR',DR), 
-              '17': ('RR',XR),   '57': ('RX',X),     '97': ('SI',XI),   'D7': ('SS',XC),  '5C': ('RX',M),
-              '43': ('RX',IC),   'BF': ('RS',ICM),   'BE': ('RS',STCM), '12': ('RR',LTR), '44': ('RX',EX),
-              '0A': ('RR',SVC),  '19': ('RR',CR),    '91': ('SI',TM),   'DC': ('SS',TR),  'DD': ('SS',TRT), 
-              'FA': ('SS2',AP),  'FB': ('SS2',SP),   'FC': ('SS2',MP),  'F8': ('SS2',ZAP),'4C': ('RX',MH),
-              '1C': ('RR',MR),   'F2': ('SS2',PACK), 'F3': ('SS2',UNPK),'F9': ('SS2',CP), 'FD': ('SS2',DP),
-              '90': ('RS',STM),  '98': ('RS',LM),    '10': ('RR',LPR),  '11': ('RR',LNR), '13': ('RR',LCR),
-              '5E': ('RX',AL),   '1E': ('RR',ALR),   '5F': ('RX',SL),   '1F': ('RR',SLR), '8B': ('RX',SLA),
-              '8F': ('RX',SLDA), '8D': ('RX',SLDL),  '89': ('RX',SLL),  '8A': ('RX',SRA), '8E': ('RX',SRDA),
-              '8C': ('RX',SRDL), '88': ('RX',SRL),   'D1': ('SS',MVN),  'F1': ('SS2',MVO),'D3': ('SS',MVZ),
-              '0F': ('RR',CLCL), '0E': ('RR',MVCL),  'BA': ('RS',CS),   'BB': ('RS',CDS), 'F0': ('SS2',SRP),
-              'DE': ('SS',ED),   'DF': ('SS',EDMK),  '86': ('RS',BXH),  '87': ('RS',BXLE) }
-
-OC = '_OC = mi_slice[0:2]'
-R1 = '_R1 = int(mi_slice[2:3],16)'
-R2 = '_R2 = int(mi_slice[3:4],16)'
-X2 = '_X2 = int(mi_slice[3:4],16)'
-B1 = '_B1 = int(mi_slice[4:5],16)'
-B2 = '_B2 = int(mi_slice[4:5],16)'
-D1 = '_D1 = int(mi_slice[5:8],16)'
-D2 = '_D2 = int(mi_slice[5:8],16)'
-LL = '_LL = int(mi_slice[2:4],16)'
-L1 = '_L1 = int(mi_slice[2:3],16)'
-L2 = '_L2 = int(mi_slice[3:4],16)'
-B3 = '_B3 = int(mi_slice[8:9],16)'
-D3 = '_D3 = int(mi_slice[9:12],16)'
-I2 = '_I2 = mi_slice[2:4]'
-
-format = { 'RR': [2,(OC,R1,R2)], 'RX': [4,(OC,R1,X2,B2,D2)], 'SI': [4,(OC,I2,B1,D1)], 'SS': [6,(OC,LL,B1,D1,B3,D3)],
-           'RS': [4,(OC,R1,R2,B2,D2)], 'SS2': [6,(OC,L1,L2,B1,D1,B3,D3)] }
-           
-file_handle_dict = {}           
-
-breakpoints = []
-hit_on_breakpoint = False
-
-reg_breakpoints = {}
-hit_on_reg_breakpoint = False
-
-last_command = ''
-
-napms_delay = 1000
-
-if Debug:
     # create Main Window
     screen = curses.initscr()
 
     num_rows, num_cols = screen.getmaxyx()
     if num_rows < 23 or num_cols < 76:
-        print("Screen too small")
-        print("You must have > 23 rows and > 76 cols")
-        print("Your current Rows:    %d" % num_rows)
-        print("Your current Columns: %d" % num_cols)
-        print("Aborting")
-        exit()
-    
-    # create Command Window
-    cmd_window = curses.newwin(10, 75, 12, 1) # lines, columns, start line, start column
-
-# Fetch - Decode - Execute Loop
-while True:
-
-    if program_counter == 978670:   #handle a 'BR    14' to normally exit this program
-        print('Normal Program End')
-        break
-        
-    if program_counter == 999999:   #handle a staged EXECUTE instruction
+        curses.endwin()
+        print("Screen too small", file=machine.out)
+        print("You must have > 23 rows and > 76 cols", file=machine.out)
+        print("Your current Rows:    %d" % num_rows, file=machine.out)
+        print("Your current Columns: %d" % num_cols, file=machine.out)
+        print("Aborting", file=machine.out)
+        return
+
+    # create the panels - status at the top, then source and storage, then the command window
+    panel_rows = num_rows - DEBUG_STATUS_ROWS - DEBUG_COMMAND_ROWS
+    source_rows = panel_rows // 2
+    storage_rows = panel_rows - source_rows
+    status = DebugPanel(curses.newwin(DEBUG_STATUS_ROWS, num_cols, 0, 0), "S/370 BAL Emulator and Debugger")
+    source = DebugPanel(curses.newwin(source_rows, num_cols, DEBUG_STATUS_ROWS, 0), "Source")
+    storage = DebugPanel(curses.newwin(storage_rows, num_cols, DEBUG_STATUS_ROWS + source_rows, 0), "Storage")
+    cmd_window = curses.newwin(DEBUG_COMMAND_ROWS, num_cols, num_rows - DEBUG_COMMAND_ROWS, 0)
+
+    for r, row_label in enumerate(("R0-R3", "R4-R7", "R8-R11", "R12-R15")):
+        status.put(r + 2, 2, row_label)
+
+    source_addrs = sorted(int(addr, 16) for addr in machine.source_code_dict)
+    source_top = 0              #index in source_addrs of the first line of the source panel
+    storage_addr = 0            #address of the first row of the storage panel
+
+    #Paint the source lines around addr, which is highlighted - the panel scrolls
+    #to put addr back in the middle once it reaches the first or last line shown
+    def paint_source(addr):
+        nonlocal source_top
+        rows = source_rows - 2
+        i = bisect.bisect_left(source_addrs, addr)
+        margin = 1 if rows > 2 else 0
+        if not source_top + margin <= i < source_top + rows - margin:
+            source_top = max(0, min(i - rows // 2, len(source_addrs) - rows))
+        for row in range(rows):
+            line, line_addr = '', None
+            if source_top + row < len(source_addrs):
+                line_addr = source_addrs[source_top + row]
+                line = '%s%06X %s' % ('*' if line_addr in breakpoints else ' ', line_addr,
+                                      machine.source_code_dict['%06X' % line_addr])
+            source.put(row + 1, 1, line[:num_cols - 2].ljust(num_cols - 2), line_addr == addr)
+
+    #Paint the rows of storage the storage panel shows - address, hex and EBCDIC
+    def paint_storage():
+        for row in range(storage_rows - 2):
+            addr = storage_addr + row * DEBUG_STORAGE_ROW_BYTES
+            data = machine.storage[addr:addr + DEBUG_STORAGE_ROW_BYTES]
+            storage.put(row + 1, 2, '%06X' % addr if data else ' ' * 6, False)
+            for w in range(DEBUG_STORAGE_ROW_BYTES // 4):
+                storage.put(row + 1, 10 + w * 9, data[w * 4:w * 4 + 4].hex().upper().ljust(8))
+            text = '*%s*' % data.translate(EBC2DISPLAY_TABLE).decode('latin-1') if data else ''
+            storage.put(row + 1, 47, text.ljust(DEBUG_STORAGE_ROW_BYTES + 2))
+
+    #Move the storage panel to addr
+    def show_storage(addr):
+        nonlocal storage_addr
+        storage_addr = max(0, min(addr, len(machine.storage) - 1))
+        storage.forget()
+
+    #Paint the panels for the instruction at addr - what changed since the last paint is highlighted
+    def paint(label, addr):
+        status.put(1, 2, '%s Instruction: %06X' % (label, addr), False)
+        status.put(1, 29, 'Program Counter: %06X' % machine.program_counter, False)
+        status.put(1, 55, 'Condition Code: %d' % machine.cond_code)
+        for r in range(16):
+            status.put(r // 4 + 2, 11 + r % 4 * 10, '%08X' % machine.regs[r])
+        paint_source(addr)
+        paint_storage()
+
+        # Changes go in to the window buffers and only get
+        # displayed after calling `doupdate()` to update
+        for panel in (status, source, storage):
+            panel.window.noutrefresh()
+        curses.doupdate()
+
+    #Execute up to numb instructions (no limit if numb is None) and paint the last one
+    #the instruction at an address in stop_at is executed and then the run stops, as it
+    #does after an instruction that hits a register breakpoint or when a key is pressed
+    #all but the last instruction run through machine.run(), with a stop_check only when
+    #something can stop them - returns False once the program has ended
+    def execute(numb, stop_at):
+        last_addr = [machine.program_counter]   #the instruction stop_check() was called after
+
+        def stop_check(m):
+            if m.program_counter in stop_at or (reg_check is not None and reg_check(m.regs)):
+                return True
+            last_addr[0] = m.program_counter
+            return False
+
+        machine.stop_check = stop_check if stop_at or reg_check is not None else None
+        next_paint = time.perf_counter() + refresh_ms / 1000
+        cmd_window.nodelay(True)
         try:
-            instr = Execute_list[0]
-        except IndexError:
-            print('Abnormal Program End from EXECUTE')
-            break
-    else:
-        try:
-            instr = instrdata_list[program_counter]
-        except IndexError:
-            print('Abnormal Program End')
-            break
-        
-    try:    
-        i_format = mach_inst[instr][0]
-    except KeyError:
-        print('Abnormal Program End')
-        break
-        
-    i_fields = format[i_format]
-    i_field_num_bytes = i_fields[0]
-    i_field_parts = i_fields[1]
-    
-    if program_counter == 999999:   #handle a staged EXECUTE instruction
-        mi_slice = ''.join(Execute_list[0:i_field_num_bytes])
-    else:
-        mi_slice = ''.join(instrdata_list[program_counter:program_counter + i_field_num_bytes])
-
-    for part in i_field_parts:
-       exec(part)
-
-    screen_program_counter = hex(program_counter).lstrip('0x').rjust(6,'0').upper()
-    try:
-        screen_last_instr = source_code_dict[screen_program_counter]
-    except KeyError:
-        screen_last_instr = '????'
-
-    if Trace:
-        print('** Trace **: ', screen_program_counter, screen_last_instr)    
-
-    if screen_program_counter in breakpoints:
-        hit_on_breakpoint = True
-        
-    program_counter = mach_inst[_OC][1]()
-    
-    if program_counter > 999999:    #if we returned from an EXECUTEd instruction, restore program_counter
-        program_counter = save_program_counter
-        
+            while machine.program_counter not in stop_at and (numb is None or numb > 1):
+                chunk = DEBUG_RUN_CHUNK if numb is None else min(DEBUG_RUN_CHUNK, numb - 1)
+                last_addr[0] = machine.program_counter
+                executed = machine.run(chunk)
+                if numb is not None:
+                    numb = numb - executed
+                if not machine.running:
+                    return False
+                if machine.stopped and machine.program_counter not in stop_at:
+                    paint("Last", last_addr[0])         #a register breakpoint was hit
+                    return True
+                if time.perf_counter() >= next_paint:
+                    paint("Next", machine.program_counter)
+                    next_paint = time.perf_counter() + refresh_ms / 1000
+                if cmd_window.getch() != -1:
+                    break
+        finally:
+            machine.stop_check = None
+            cmd_window.nodelay(False)
+
+        addr = machine.program_counter
+        if not machine.step():
+            return False
+        paint("Last", addr)
+        return True
+
     try:
-        screen_cond_code = str(cond_code.index('1'))
-    except ValueError:
-        screen_cond_code = 'Not Set'
-
-    if len(reg_breakpoints) > 0:
-        for k in reg_breakpoints.keys():
-            if reg_breakpoints[k].startswith('0D'):
-                v_bp = int(reg_breakpoints[k][2:])
-            elif reg_breakpoints[k].startswith('0X'):
-                v_bp = int(reg_breakpoints[k][2:], 16)
-            else:
-                print('Invalid breakpoint value type')
-            v_reg = regs[int(k)]
-            if isinstance(v_reg, str):
-                v_reg = int(v_reg, 16)
-            if v_reg == v_bp:
-                hit_on_reg_breakpoint = True
-                break
-                
-    if not Debug:
-        continue
-        
-    screen.clear()
-    screen.border(0)
-    screen.addstr(1, 24, "S/370 BAL Emulator and Debugger")
-    
-    screen.addstr(2, 2, "Program Counter:")
-    screen.addstr(2, 19, screen_program_counter)
-
-    screen.addstr(3, 2, "Last Instruction:")
-    screen.addstr(3, 20, screen_last_instr)
-
-    screen.addstr(4, 2, "Condition Code after Last Instruction:")
-    screen.addstr(4, 41, screen_cond_code)
-
-    screen.addstr(6, 2, "Registers after Last Instruction:")
-    screen.addstr(7, 2, "R0-R3 ")
-    screen.addstr(8, 2, "R4-R7 ")
-    screen.addstr(9, 2, "R8-R11 ")
-    screen.addstr(10, 2, "R12-R15 ")
-    
-    # Send the registers to the screen
-    k = 0
-    c = 11
-    for r in range(0,4):
-        for j in range(0,4):
-            screen.addstr(r+7, c, cast_to_type(regs[k],str))
-            k = k + 1
-            c = c + 10
-        c = 11    
-        
-    # Changes go in to the screen buffer and only get
-    # displayed after calling `refresh()` to update
-    screen.refresh()
-    
-    # Handle Debug Commands
-    while True:
-        cmd_window.clear()
-        cmd_window.border(0)
-        cmd_window.addstr(1, 2, "Command: ")
-        term_output = term_output.replace('\0', '')  # Remove null characters
-        cmd_window.addstr(2, 13, term_output)
-        term_output = ''
-        cmd_window.refresh()
-        
-        #if no hit on breakpoint and no hit on register breakpoint and last command = go (g) then keep going
-        if not hit_on_breakpoint and not hit_on_reg_breakpoint: 
-            if last_command == 'g':
-                curses.napms(napms_delay)
-                break
-        else:
-            if hit_on_breakpoint:
-                hit_on_breakpoint = False
-            if hit_on_reg_breakpoint:
-                hit_on_reg_breakpoint = False
-            last_command = ''
-
-        #if no hit on register breakpoint and last command = go (g) then keep going
-        #if not hit_on_reg_breakpoint: 
-        #    if last_command == 'g':
-        #        curses.napms(napms_delay)
-        #        break
-        #else:
-        #    hit_on_reg_breakpoint = False
-        #    last_command = ''
-            
-        #read the command     
-        screen_str = cmd_window.getstr(1, 11, 30).decode("utf-8")
-        cmd_window.border(0)  #so that border will stay intact after ENTER
-       
-       #decode changes byte object to string object
-        
-        #handle single step (s) command - format:  s
-        if screen_str.lower() == 's':
-            break
-            
-        #handle go (g) command - format:  g
-        elif screen_str.lower()  == 'g':
-            last_command = 'g'
-            break
-            
-        #exit back to shell
-        elif screen_str.lower()  == 'x':
-            curses.endwin()
-            sys.stdout = sys.__stdout__
-            exit()
-            
-        #handle set execution delay (sd) command - format:  sd delay_in_ms
-        elif screen_str.lower().startswith('sd '):
-            napms_delay = int(screen_str[3:])
-            cmd_window.addstr(2, 2, "Delay set to "+screen_str[3:]+" ms")
-            
-        #handle set breakpoint (sb) command - format:  sb breakpoint_address_to_stop_at
-        #address is in form of string of 1-6 hex digits
-        elif screen_str.lower().startswith('sb '):
-            addr = screen_str[3:].rjust(6,'0').upper()
-            breakpoints.append(addr)
-            cmd_window.addstr(2, 2, "Breakpoints: ")
-            cmd_window.addstr(2, 15, str(breakpoints))
-
-        #handle set reg breakpoint (srb) command - format:  srb breakpoint_reg_to_check:breakpoint_reg_value
-        #register in the form of single hex digit 0-F
-        #value in the form of '0d1234' for decimal value or '0x12ff' for hex value
-        elif screen_str.lower().startswith('srb '):
-            (r, v) = screen_str[4:].upper().split(':')
-            reg_breakpoints[r] = v
-            cmd_window.addstr(2, 2, "Reg Breakpoints: ")
-            cmd_window.addstr(2, 19, str(reg_breakpoints))
-
-        #handle clear breakpoint (cb) command - format:  cb breakpoint_address_to_clear
-        #or   cb all   to clear ALL breakpoints
-        #address is in form of string of 1-6 hex digits
-        elif screen_str.lower().startswith('cb '):
-            addr = screen_str[3:].rjust(6,'0').upper()
-            try:
-                if addr != '000ALL':
-                    breakpoints.remove(addr)
+        numb, stop_at = 1, set()
+        while execute(numb, stop_at):
+
+            # Handle Debug Commands
+            while True:
+                cmd_window.erase()
+                cmd_window.border(0)
+                cmd_window.addstr(1, 2, "Command: ")
+                #term_output holds everything the SVCs printed since the last stop
+                #when it does not fit, show its end
+                output = machine.term_output.replace('\0', '')  # Remove null characters
+                width = num_cols - 15
+                rows = cmd_window.getmaxyx()[0] - 3
+                wrap_and_addstr(cmd_window, 2, 13, output[-rows * width:], width)
+                machine.term_output = ''
+                cmd_window.refresh()
+
+                #read the command
+                screen_str = cmd_window.getstr(1, 11, 30).decode("utf-8")
+                cmd_window.border(0)  #so that border will stay intact after ENTER
+
+               #decode changes byte object to string object
+
+                #handle single step (s) command - format:  s
+                if screen_str.lower() == 's':
+                    numb, stop_at = 1, set()
+                    break
+
+                #handle step (s) command - format:  s number_of_instructions
+                #stops early at a breakpoint
+                elif screen_str.lower().startswith('s '):
+                    try:
+                        numb, stop_at = max(int(screen_str[2:]), 1), breakpoints
+                        break
+                    except ValueError:
+                        cmd_window.addstr(2, 2, "Invalid Number of Instructions")
+
+                #handle go (g) command - format:  g
+                elif screen_str.lower()  == 'g':
+                    numb, stop_at = None, breakpoints
+                    break
+
+                #handle run to address (r) command - format:  r address_to_stop_at
+                #address is in form of string of 1-6 hex digits, stops early at a breakpoint
+                elif screen_str.lower().startswith('r '):
+                    try:
+                        numb, stop_at = None, breakpoints | {int(screen_str[2:], 16)}
+                        break
+                    except ValueError:
+                        cmd_window.addstr(2, 2, "Invalid Address")
+
+                #exit back to shell
+                elif screen_str.lower()  == 'x':
+                    return
+
+                #handle set display refresh (sd) command - format:  sd refresh_interval_in_ms
+                #while g, r or s N runs the screen is repainted once every refresh interval
+                elif screen_str.lower().startswith('sd '):
+                    try:
+                        refresh_ms = max(int(screen_str[3:]), 0)
+                        cmd_window.addstr(2, 2, "Refresh set to %d ms" % refresh_ms)
+                    except ValueError:
+                        cmd_window.addstr(2, 2, "Invalid Refresh Interval")
+
+                #handle set breakpoint (sb) command - format:  sb breakpoint_address_to_stop_at
+                #address is in form of string of 1-6 hex digits
+                elif screen_str.lower().startswith('sb '):
+                    try:
+                        breakpoints.add(int(screen_str[3:], 16))
+                        cmd_window.addstr(2, 2, "Breakpoints: ")
+                        wrap_and_addstr(cmd_window, 2, 15, format_breakpoints(breakpoints), 56)
+                    except ValueError:
+                        cmd_window.addstr(2, 2, "Invalid Breakpoint Address")
+
+                #handle set reg breakpoint (srb) command - format:  srb breakpoint_reg_to_check:breakpoint_reg_value
+                #register in the form of single hex digit 0-F
+                #value in the form of '0d1234' for decimal value or '0x12ff' for hex value
+                elif screen_str.lower().startswith('srb '):
+                    try:
+                        (r, v) = screen_str[4:].upper().split(':')
+                        reg_breakpoints[parse_breakpoint_register(r)] = parse_breakpoint_value(v)
+                        reg_check = register_breakpoint_check(reg_breakpoints)
+                        cmd_window.addstr(2, 2, "Reg Breakpoints: ")
+                        wrap_and_addstr(cmd_window, 2, 19, format_reg_breakpoints(reg_breakpoints), 52)
+                    except ValueError:
+                        cmd_window.addstr(2, 2, "Invalid Reg Breakpoint")
+
+                #handle clear breakpoint (cb) command - format:  cb breakpoint_address_to_clear
+                #or   cb all   to clear ALL breakpoints
+                #address is in form of string of 1-6 hex digits
+                elif screen_str.lower().startswith('cb '):
+                    addr = screen_str[3:].upper()
+                    try:
+                        if addr != 'ALL':
+                            breakpoints.remove(int(addr, 16))
+                        else:
+                            breakpoints = set()
+                        cmd_window.addstr(2, 2, "Breakpoints: ")
+                        wrap_and_addstr(cmd_window, 2, 15, format_breakpoints(breakpoints), 56)
+                    except (ValueError, KeyError):
+                        cmd_window.addstr(2, 2, "Breakpoint Not Found")
+
+                #handle clear reg breakpoint (crb) command - format:  crb breakpoint_reg_to_clear
+                #or   crb all   to clear ALL register breakpoints
+                #register in the form of single hex digit 0-F
+                elif screen_str.lower().startswith('crb '):
+                    r = screen_str[4:].upper()
+                    try:
+                        if r != 'ALL':
+                            del(reg_breakpoints[parse_breakpoint_register(r)])
+                        else:
+                            reg_breakpoints = {}
+                        reg_check = register_breakpoint_check(reg_breakpoints)
+                        cmd_window.addstr(2, 2, "Reg Breakpoints: ")
+                        wrap_and_addstr(cmd_window, 2, 19, format_reg_breakpoints(reg_breakpoints), 52)
+                    except (ValueError, KeyError):
+                        cmd_window.addstr(2, 2, "Reg Breakpoint Not Found")
+
+                #handle display breakpoints (db) command - format:  db
+                elif screen_str.lower() == 'db':
+                    cmd_window.addstr(2, 2, "Breakpoints: ")
+                    wrap_and_addstr(cmd_window, 2, 15, format_breakpoints(breakpoints), 56)
+
+                #handle display register breakpoints (drb) command - format:  drb
+                elif screen_str.lower() == 'drb':
+                    cmd_window.addstr(2, 2, "Reg Breakpoints: ")
+                    wrap_and_addstr(cmd_window, 2, 19, format_reg_breakpoints(reg_breakpoints), 52)
+
+                #handle display memory (dm) command - format:  dm start_address_to_display
+                #address is in form of string of 1-6 hex digits
+                #the storage panel moves to the address - a number of bytes after it is ignored
+                elif screen_str.lower().startswith('dm '):
+                    try:
+                        show_storage(int(screen_str[3:].split()[0], 16))
+                        paint_storage()
+                        storage.window.refresh()
+                        cmd_window.addstr(2, 2, "Storage at %06X" % storage_addr)
+                    except (ValueError, IndexError):
+                        cmd_window.addstr(2, 2, "Invalid Address")
+
+                #handle page storage forward (pf) and back (pb) commands - format:  pf  -or-  pb
+                elif screen_str.lower() in ('pf', 'pb'):
+                    page = (storage_rows - 2) * DEBUG_STORAGE_ROW_BYTES
+                    show_storage(storage_addr + (page if screen_str.lower() == 'pf' else -page))
+                    paint_storage()
+                    storage.window.refresh()
+                    cmd_window.addstr(2, 2, "Storage at %06X" % storage_addr)
+
+                #handle display field (df) command - format:  df valid_field_name or df valid_field_name(dsect_reg)
+                #example: assume FIELDA is addressed directly off the CSECT base register then 'df FIELDA' means
+                #means lookup FIELDA in symbol_dict, then find its start_address
+                #example: assume FIELD1 is in a DSECT pointed to by R10 then 'df FIELD1(10)'  means lookup FIELD1
+                #in symbol_dict, find its start_address, then add contents of dsect pointer R10 to start_address
+                #valid_field_name is a data area defined by a DS or DC
+                #and is a key in the symbol_dict dictionary
+                #the storage panel moves to the start of the field
+                elif screen_str.lower().startswith('df '):
+                    field_list = screen_str[3:].rstrip(')').split('(')
+                    field = field_list[0]
+                    try:
+                        st_addr, field_len = machine.symbol_dict[field.ljust(8).upper()]
+                        if len(field_list) == 2:
+                            st_addr_int = cvthex2int(st_addr) + machine.regs[int(field_list[1])]
+                        else:
+                            st_addr_int = cvthex2int(st_addr)
+                        show_storage(st_addr_int)
+                        paint_storage()
+                        storage.window.refresh()
+                        cmd_window.addstr(2, 2, "%s at %06X, %d bytes" % (field, st_addr_int, cvthex2int(field_len)))
+
+                    except KeyError:
+                        cmd_window.addstr(2, 2, "Field Name Not Found ")
                 else:
-                    breakpoints = []
-                cmd_window.addstr(2, 2, "Breakpoints: ")
-                cmd_window.addstr(2, 15, str(breakpoints))
-            except ValueError:
-                cmd_window.addstr(2, 2, "Breakpoint Not Found")
+                    cmd_window.addstr(2, 2, "Invalid Command")
 
-        #handle clear reg breakpoint (crb) command - format:  crb breakpoint_reg_to_clear
-        #or   crb all   to clear ALL register breakpoints
-        #register in the form of single hex digit 0-F
-        elif screen_str.lower().startswith('crb '):
-            r = screen_str[4:].upper()
-            try:
-                if r != 'ALL':
-                    del(reg_breakpoints[r])
-                else:
-                    reg_breakpoints = {}
-                cmd_window.addstr(2, 2, "Reg Breakpoints: ")
-                cmd_window.addstr(2, 19, str(reg_breakpoints))
-            except ValueError:
-                cmd_window.addstr(2, 2, "Reg Breakpoint Not Found")
-                
-        #handle display breakpoints (db) command - format:  db
-        elif screen_str.lower() == 'db':
-            cmd_window.addstr(2, 2, "Breakpoints: ")
-            cmd_window.addstr(2, 15, str(breakpoints))
-
-        #handle display register breakpoints (drb) command - format:  drb
-        elif screen_str.lower() == 'drb':
-            cmd_window.addstr(2, 2, "Reg Breakpoints: ")
-            cmd_window.addstr(2, 19, str(reg_breakpoints))
-
-        #handle display memory (dm) command - format:  dm start_address_to_display num_of_bytes
-        #address is in form of string of 1-6 hex digits
-        #number of bytes in form of 1-2 dec digits
-        elif screen_str.lower().startswith('dm '):
-            addr, num_of_bytes = screen_str[3:].split(' ')
-            addr_int = int(addr,16)
-            num_of_bytes_int = int(num_of_bytes)
-            #clamp to a max of 96 bytes
-            if num_of_bytes_int > 96: # you can see 96 bytes of memory at once
-                num_of_bytes_int = 96
-            memory_contents = ' ' + ' '.join(instrdata_list[addr_int:addr_int+num_of_bytes_int]) + ' '
-            wrap_and_addstr(cmd_window, 2, 2, memory_contents, 48) # each row can display 16 bytes
-            
-        #handle display field (df) command - format:  df valid_field_name or df valid_field_name(dsect_reg)
-        #example: assume FIELDA is addressed directly off the CSECT base register then 'df FIELDA' means
-        #means lookup FIELDA in symbol_dict, then find its start_address
-        #example: assume FIELD1 is in a DSECT pointed to by R10 then 'df FIELD1(10)'  means lookup FIELD1 
-        #in symbol_dict, find its start_address, then add contents of dsect pointer R10 to start_address
-        #valid_field_name is a data area defined by a DS or DC 
-        #and is a key in the symbol_dict dictionary
-        elif screen_str.lower().startswith('df '):
-            field_list = screen_str[3:].rstrip(')').split('(')
-            field = field_list[0]
-            try:
-                st_addr, field_len = symbol_dict[field.ljust(8).upper()]
-                if len(field_list) == 2:
-                    st_addr_int = cvthex2int(st_addr) + regs[int(field_list[1])]
-                else:
-                    st_addr_int = cvthex2int(st_addr)
-                field_len_int = cvthex2int(field_len)
-                #clamp to a max of 30 bytes
-                if field_len_int > 30:
-                    field_len_int = 30
-                field_contents = ' ' + ' '.join(instrdata_list[st_addr_int:st_addr_int+field_len_int]) + ' '
-                cmd_window.addstr(2, 2, field+" = ")
-                wrap_and_addstr(cmd_window, 2, 13, field_contents, 48) 
-
-            except KeyError:
-                cmd_window.addstr(2, 2, "Field Name Not Found ")
+                cmd_window.addstr(1, 2, "Press <ENTER> to Continue")
+                cmd_window.getch()
+                cmd_window.refresh()
+    finally:
+        curses.endwin()
+
+
+# -------------------------------------------------------------------
+#main
+# -------------------------------------------------------------------
+
+# Process Command Line parameters
+#  -debug  enables the interactive Curses-based debugger
+#  -trace  enables the trace facility
+# the program is loaded from the pickles in the current directory and
+# its output is written to OUTPUT.TXT
+def main(argv):
+    Debug = '-debug' in argv[1:]
+    Trace = '-trace' in argv[1:]
+    Translate = '-notranslate' not in argv[1:]     #-notranslate runs every instruction through the interpreter
+    Fuse = '-nofuse' not in argv[1:]               #-nofuse stops the interpreter running superinstructions
+    Fusions = '-fusions' in argv[1:]               #-fusions reports how often each superinstruction ran
+
+    #an optional program image or object deck file name - by default the program in the current directory is run
+    Program_Filename = None
+    for arg in argv[1:]:
+        if not arg.startswith('-'):
+            Program_Filename = arg
+
+    #-maxinstr=n and -maxtime=seconds limit a run - exceeding either ends the program with an S322 abend
+    Max_Instructions = None
+    Max_Seconds = None
+    for arg in argv[1:]:
+        if arg.startswith('-maxinstr='):
+            Max_Instructions = int(arg[10:])
+        elif arg.startswith('-maxtime='):
+            Max_Seconds = float(arg[9:])
+
+    with open("OUTPUT.TXT", 'w') as out:
+        machine = Machine(out=out, debug=Debug, trace=Trace,
+                          max_instructions=Max_Instructions, max_seconds=Max_Seconds, translate=Translate,
+                          fuse=Fuse)
+        if Program_Filename is None:
+            machine.load_directory()
+        else:
+            machine.load_file(Program_Filename)
+        if Debug:
+            debugger(machine)
         else:
-            cmd_window.addstr(2, 2, "Invalid Command")
-            
-        cmd_window.addstr(1, 2, "Press <ENTER> to Continue")
-        cmd_window.getch()
-        cmd_window.refresh()
-        
-if Debug:        
-    curses.endwin()
-sys.stdout = sys.__stdout__
-exit()
+            machine.run()
+        if Fusions:
+            for line in machine.fusion_report():
+                print(line, file=out)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,162 @@
+#
+# S370Batch - run many assembled programs through S370BALEmulator in parallel
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from S370BALEmulator import Machine, signed32
+from S370Image import IMAGE_FILENAME
+
+
+# A program (job) is a program image file (.img), an object deck (.obj) or a
+# directory holding the program image file program.img written by
+# Z390-ProcessPRN_OBJ.py or MVS38J-ProcessPRN_OBJ.py, or the 3 pickles
+# created by S370BALAsm: instrdata.p, sourcecode.p and symdict.p
+#
+# Each job runs in a worker process with the job directory (the directory of
+# an image file or object deck) as its current working directory, so files opened by SVC 249
+# are relative to the job.
+# The SVC output that the emulator would write to OUTPUT.TXT is collected
+# in the report together with the completion message, the abend code, the
+# return code (R15), the final registers, the instruction count and the
+# elapsed time. A program that exceeds the instruction or time limit is
+# ended by the emulator with an S322 abend.
+#
+# usage:
+#   python S370Batch.py [-w workers] [-i max_instructions] [-t max_seconds]
+#                       [-r report.json | report.csv] program_dir_or_parent_dir ...
+#
+# or from Python:
+#   results = run_batch(['job1', 'job2'], workers=4, max_instructions=10000000)
+#   write_report(results, 'report.json')
+
+#Return True if directory holds an assembled program
+def is_program_dir(directory):
+    return (os.path.isfile(os.path.join(directory, IMAGE_FILENAME)) or
+            os.path.isfile(os.path.join(directory, 'instrdata.p')))
+
+
+#Expand the given paths into a sorted list of program files and directories
+#a path that is not itself a program is searched one level down
+def find_programs(paths):
+    programs = []
+    for path in paths:
+        if os.path.isfile(path) or is_program_dir(path):
+            programs.append(path)
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                sub_path = os.path.join(path, name)
+                if is_program_dir(sub_path) or (name.lower().endswith(('.img', '.obj')) and os.path.isfile(sub_path)):
+                    programs.append(sub_path)
+    return programs
+
+
+#Run one program to completion or until a limit is reached and return its report entry
+#this is the function executed in the worker processes
+def run_job(program, max_instructions=None, max_seconds=None):
+    result = {'program': program}
+    out = io.StringIO()
+    machine = Machine(out=out, max_instructions=max_instructions, max_seconds=max_seconds)
+    save_cwd = os.getcwd()
+    start = time.perf_counter()
+    try:
+        if os.path.isfile(program):
+            os.chdir(os.path.dirname(os.path.abspath(program)))
+            machine.load_file(os.path.basename(program))
+        else:
+            os.chdir(program)
+            machine.load_directory()
+        machine.run()
+        result['completion'] = machine.completion
+    except Exception as e:
+        result['completion'] = 'Emulator Error: %s: %s' % (type(e).__name__, e)
+    finally:
+        os.chdir(save_cwd)
+        for fh in machine.file_handle_dict.values():
+            fh.close()
+
+    result['abend_code'] = machine.abend_code
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    result['instructions'] = machine.instruction_count
+    result['rc'] = signed32(machine.regs[15])
+    result['regs'] = ['%08X' % reg for reg in machine.regs]
+    result['output'] = out.getvalue()
+    return result
+
+
+#Run every program over a pool of worker processes
+#returns the report entries in the same order as programs
+def run_batch(programs, workers=None, max_instructions=None, max_seconds=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, program, max_instructions, max_seconds) for program in programs]
+        return [future.result() for future in futures]
+
+
+#Write the report as JSON, or as CSV if filename ends in .csv
+def write_report(results, filename):
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['program', 'completion', 'abend_code', 'rc', 'instructions', 'seconds'] +
+                            ['R%d' % i for i in range(16)] + ['output'])
+            for result in results:
+                writer.writerow([result['program'], result['completion'], result['abend_code'], result['rc'],
+                                 result['instructions'], result['seconds']] +
+                                result['regs'] + [result['output']])
+    else:
+        with open(filename, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='S370Batch.py',
+                                     description='Run assembled S/370 BAL programs in parallel.')
+    parser.add_argument('paths', nargs='+',
+                        help='program image files, object decks or directories, or directories containing them')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-i', '--max-instructions', type=int, default=None,
+                        help='maximum instructions executed per program')
+    parser.add_argument('-t', '--max-seconds', type=float, default=None,
+                        help='maximum wall clock seconds per program')
+    parser.add_argument('-r', '--report', default='REPORT.json',
+                        help='report file - .json or .csv (default: REPORT.json)')
+    args = parser.parse_args(argv[1:])
+
+    programs = [os.path.abspath(program) for program in find_programs(args.paths)]
+    if not programs:
+        print('No programs found', file=sys.stderr)
+        return 1
+
+    results = run_batch(programs, args.workers, args.max_instructions, args.max_seconds)
+    write_report(results, args.report)
+
+    for result in results:
+        print('%-40s RC=%-6d %s' % (result['program'], result['rc'], result['completion']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
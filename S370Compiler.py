@@ -0,0 +1,320 @@
+#
+# S370Compiler - compile an assembled program ahead of time into a Python module
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sys
+import zlib
+import base64
+import argparse
+
+from S370BALEmulator import (Machine, BLOCK_END, END_OF_PROGRAM, block_function, block_globals)
+
+
+# The compiler loads a program the way the emulator does, finds the code that
+# can be reached from its entry point and writes every basic block found as a
+# Python function - the same source Machine.translate_block() would generate at
+# run time, with the BAL source lines from source_code_dict as comments.
+# The generated module also holds the storage image, so it runs the program
+# without the program files:
+#
+#   python S370Compiler.py [-o program_aot.py] [program.img | prog.OBJ | program_dir]
+#   python program_aot.py                   (writes OUTPUT.TXT like S370BALEmulator.py)
+#
+# or from Python:
+#   import program_aot
+#   machine = program_aot.run(out=sys.stdout)
+#
+# The module's run() loads the storage image into a Machine and adds the compiled
+# blocks to it before running. A branch to an address that was not compiled (an
+# indirect branch that could not be resolved here, or code that has been modified)
+# drops into the Machine, which translates or interprets it, so the output is the
+# same as running the program under S370BALEmulator.py.
+#
+# The module is not a standalone program - it is the emulator's block cache saved
+# ahead of time. It imports Machine and block_globals from S370BALEmulator.py, the
+# compiled blocks call the Machine's instruction routines for the instructions that
+# are not written inline, and load() decodes each block's instructions again to
+# hand them to Machine.add_block(). What it saves is the search for blocks and
+# their translation, not the emulator.
+#
+# Branch targets are found by following the fall through and branch addresses of
+# each block. A branch address D(X,B) is resolved when its base and index registers
+# are set to the same constant everywhere in the code found - BALR R12,0 or
+# LA R12,BASE - or are never set and keep their initial value.
+
+#the module name written when no -o is given
+COMPILED_FILENAME = 'program_aot.py'
+
+#Instructions that leave the general registers unchanged
+NO_REGISTER_SET = frozenset(('BC', 'BCR', 'C', 'CH', 'CR', 'CL', 'CLR', 'CLI', 'CLC', 'CLM', 'CP',
+                             'ST', 'STH', 'STC', 'STM', 'STCM', 'MVI', 'MVC', 'MVN', 'MVZ', 'MVO',
+                             'NC', 'NI', 'OC', 'OI', 'XC', 'XI', 'TM', 'TR', 'AP', 'SP', 'MP', 'ZAP',
+                             'DP', 'PACK', 'UNPK', 'CVD', 'SRP', 'ED'))
+
+#Instructions that set the even/odd register pair R1, R1+1
+PAIR_SET = frozenset(('D', 'DR', 'M', 'MR', 'SLDA', 'SLDL', 'SRDA', 'SRDL', 'CDS'))
+
+#Registers an SVC routine may set
+SVC_REGISTERS = (0, 1, 15)
+
+#bytes of the storage image per line of the generated module
+IMAGE_LINE_LENGTH = 57
+
+
+#Return the registers set by the decoded instruction ins
+def registers_set(ins):
+    name = ins.handler.__name__
+    if name in NO_REGISTER_SET:
+        return ()
+    if name in PAIR_SET:
+        return (ins.R1, (ins.R1 + 1) & 15)
+    if name in ('CLCL', 'MVCL'):
+        return (ins.R1, ins.R1 + 1, ins.R2, ins.R2 + 1)
+    if name == 'LM':
+        numb = (ins.R2 - ins.R1) % 16 + 1
+        return tuple((ins.R1 + i) % 16 for i in range(numb))
+    if name == 'TRT':
+        return (1, 2)
+    if name == 'EDMK':
+        return (1,)
+    if name == 'SVC':
+        return SVC_REGISTERS
+    if name == 'EX':
+        return tuple(range(16))
+    return (ins.R1,)
+
+
+#Return the integer address D(X,B) if its registers hold the known values in static, otherwise None
+def static_address(static, B, D, X=0):
+    addr = D
+    for R in (X, B):
+        if R != 0:
+            if static.get(R) is None:
+                return None
+            addr = addr + static[R]
+    return addr & 0xFFFFFF
+
+
+#Return the address the branch instruction ins goes to if taken, or None
+#if it cannot be resolved from the known register values in static
+def branch_target(ins, static):
+    name = ins.handler.__name__
+    if ins.format == 'RR':
+        if ins.R2 == 0 or name == 'SVC':
+            return None
+        value = static.get(ins.R2)
+        return None if value is None else value & 0xFFFFFF
+    if name in ('BXH', 'BXLE'):
+        return static_address(static, ins.B2, ins.D2)
+    if name == 'EX':
+        return None
+    return static_address(static, ins.B2, ins.D2, ins.X2)
+
+
+#Return the addresses execution can continue at after a block whose last
+#instruction ins ends at address end
+def block_successors(ins, end, static):
+    name = ins.handler.__name__
+    if name not in BLOCK_END:
+        return [end]
+
+    #an unconditional branch (mask 15) does not fall through, a NOP (mask 0 or R2 = 0) does not branch
+    if name in ('BC', 'BCR'):
+        if ins.R1 == 0 or (name == 'BCR' and ins.R2 == 0):
+            return [end]
+        successors = [] if ins.R1 == 15 else [end]
+    else:
+        successors = [end]
+
+    target = branch_target(ins, static)
+    if target is not None:
+        successors.append(target)
+    return successors
+
+
+#Return {start address: block_source() result} for the blocks reachable from entry
+#using the register values in static to resolve the branch addresses
+def find_blocks(machine, entry, static):
+    blocks = {}
+    pending = [entry]
+    while pending:
+        addr = pending.pop()
+        if addr in blocks or addr == END_OF_PROGRAM or addr >= len(machine.storage):
+            continue
+        block = machine.block_source(addr)
+        if block is None:
+            continue
+        blocks[addr] = block
+        lines, instructions, calls, end = block
+        pending.extend(block_successors(instructions[-1], end, static))
+    return blocks
+
+
+#Return the registers that hold one known value wherever they are used in blocks
+#a register set by BALR R,0, BAL, BALR or LA to a single constant keeps that value,
+#a register that is never set keeps its initial value in initial
+def find_static_registers(blocks, initial, static):
+    values = {}
+    for lines, instructions, calls, end in blocks.values():
+        pc = end - sum(ins.length for ins in instructions)
+        for ins in instructions:
+            name = ins.handler.__name__
+            next_address = pc + ins.length
+            if name in ('BAL', 'BALR'):
+                value = next_address
+            elif name == 'LA':
+                value = static_address(static, ins.B2, ins.D2, ins.X2)
+            else:
+                value = None
+            for R in registers_set(ins):
+                values.setdefault(R, set()).add(value if R == ins.R1 else None)
+            pc = next_address
+
+    result = {}
+    for R in range(16):
+        if R not in values:
+            result[R] = initial[R]
+        elif len(values[R]) == 1 and None not in values[R]:
+            result[R] = next(iter(values[R]))
+    return result
+
+
+#Return {start address: block_source() result} for the code reachable from the
+#entry point of the program loaded in machine
+def discover_blocks(machine):
+    entry = machine.program_counter
+    initial = list(machine.regs)
+    static = dict(enumerate(initial))
+
+    #the register values and the code found depend on each other - start by assuming every
+    #register is known and repeat until the registers known are the same as the last time
+    for i in range(16):
+        blocks = find_blocks(machine, entry, static)
+        new_static = find_static_registers(blocks, initial, static)
+        if new_static == static:
+            break
+        static = new_static
+    return find_blocks(machine, entry, static)
+
+
+#Return the source of the compiled module for the program loaded in machine
+#program is the name of the program file or directory, written in the heading
+def compile_program(machine, program):
+    blocks = discover_blocks(machine)
+    image = base64.b64encode(zlib.compress(bytes(machine.storage), 9)).decode('ascii')
+    line_length = IMAGE_LINE_LENGTH * 4 // 3
+
+    source = ['#',
+              '# Generated by S370Compiler.py from %s - do not edit' % program,
+              '#',
+              '# %d basic blocks of the program compiled ahead of time, with the program' % len(blocks),
+              '# storage image. Run it with python, or call run() - S370BALEmulator.py',
+              '# has to be importable. This is not a standalone program: the blocks run',
+              '# on a Machine and use its instruction routines, and code not compiled',
+              '# here is run by the Machine.',
+              '#',
+              '',
+              'import zlib',
+              'import base64',
+              '',
+              'from S370BALEmulator import Machine, block_globals',
+              '']
+    for name in sorted(block_globals):
+        source.append("%s = block_globals['%s']" % (name, name))
+
+    source.extend(['',
+                   '#the program storage image',
+                   'STORAGE = zlib.decompress(base64.b64decode('])
+    for i in range(0, len(image), line_length):
+        source.append("    '%s'" % image[i:i+line_length])
+    source.extend(['    ))',
+                   '',
+                   'ENTRY = 0x%06X' % machine.program_counter])
+
+    for addr in sorted(blocks):
+        lines, instructions, calls, end = blocks[addr]
+        source.extend(['', '', '#block %06X - %06X, %d instructions' % (addr, end - 1, len(instructions))])
+        source.extend(block_function('block_%06X' % addr, lines, calls, len(instructions)))
+
+    source.extend(['', '',
+                   '#start address -> (function returning the block, address following the block)',
+                   'BLOCKS = {'])
+    for addr in sorted(blocks):
+        source.append('    0x%06X: (block_%06X, 0x%06X),' % (addr, addr, blocks[addr][3]))
+    source.append('}')
+
+    source.extend(['', '',
+                   '#Load the program into machine and add the compiled blocks',
+                   'def load(machine):',
+                   '    machine.load(STORAGE)',
+                   '    machine.program_counter = ENTRY',
+                   '    for addr, (make_block, end) in BLOCKS.items():',
+                   '        instructions = []',
+                   '        pc = addr',
+                   '        while pc < end:',
+                   '            instructions.append(machine.decode(machine.storage, pc))',
+                   '            pc = pc + instructions[-1].length',
+                   '        machine.add_block(addr, make_block, instructions, end)',
+                   '',
+                   '',
+                   '#Run the program - returns the Machine it ran on',
+                   'def run(out=None, max_instructions=None, max_seconds=None):',
+                   '    machine = Machine(out=out, max_instructions=max_instructions, max_seconds=max_seconds)',
+                   '    load(machine)',
+                   '    machine.run()',
+                   '    return machine',
+                   '',
+                   '',
+                   "if __name__ == '__main__':",
+                   "    with open('OUTPUT.TXT', 'w') as out:",
+                   '        run(out)',
+                   ''])
+    return '\n'.join(source)
+
+
+#Compile the program file or directory program and write the module to filename
+#returns the number of basic blocks compiled
+def compile_file(program, filename):
+    machine = Machine()
+    if os.path.isdir(program):
+        machine.load_directory(program)
+    else:
+        machine.load_file(program)
+    source = compile_program(machine, os.path.basename(os.path.abspath(program)))
+    with open(filename, 'w') as f:
+        f.write(source)
+    return source.count('\ndef block_')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='S370Compiler.py',
+                                     description='Compile an assembled S/370 BAL program into a Python module.')
+    parser.add_argument('program', nargs='?', default='.',
+                        help='program image file, object deck or program directory (default: current directory)')
+    parser.add_argument('-o', '--output', default=COMPILED_FILENAME,
+                        help='module to write (default: %s)' % COMPILED_FILENAME)
+    args = parser.parse_args(argv[1:])
+
+    numb = compile_file(args.program, args.output)
+    print('%s: %d basic blocks compiled' % (args.output, numb))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,259 @@
+#
+# S370Decimal - packed decimal arithmetic for the S370BALEmulator instruction routines
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import sys
+import time
+import argparse
+
+
+# A packed decimal field of n bytes holds 2n-1 digits, two to a byte, followed by
+# the sign in the rightmost 4 bits: A, C, E or F is plus, B or D is minus and the
+# result of an instruction gets the preferred sign C or D. A 16 byte field holds
+# 31 digits.
+#
+# Each operation works on the operand fields as bytes-like objects and returns the
+# bytes to store (and the condition code where the instruction sets one) - the
+# instruction routines in S370BALEmulator.py fetch and store them. The fields are
+# converted to and from Python ints whole, by bytes.hex() / int() and '%d' / bytes.fromhex(),
+# which do the digit work in C; the 256 entry SIGNS table checks the sign byte.
+#
+# An invalid digit or sign raises DecimalException with the abend code of the
+# program interruption (S0C7 data exception, ...), which ends the program.
+# A result too long for its field is stored with its high-order digits lost and
+# condition code 3 (decimal overflow).
+#
+#   python S370Decimal.py [-n count]    times AP, SP, MP, DP, CP, ZAP, CVB and CVD on
+#                                       8 to 16 byte fields
+
+#Abend codes of the program interruptions
+SPECIFICATION_EXCEPTION = 'S0C6'
+DATA_EXCEPTION = 'S0C7'
+FIXED_POINT_DIVIDE_EXCEPTION = 'S0C9'
+DECIMAL_DIVIDE_EXCEPTION = 'S0CB'
+
+#the longest multiplier / divisor field in bytes
+MAX_MP_DP_LENGTH = 8
+
+
+#A program interruption raised by an operation - code is the abend code
+class DecimalException(Exception):
+    def __init__(self, code, reason):
+        super().__init__('%s %s' % (code, reason))
+        self.code = code
+        self.reason = reason
+
+
+#Sign byte (rightmost byte of a field) -> 1 plus, -1 minus, 0 invalid digit or sign
+SIGNS = tuple(0 if b >> 4 > 9 or b & 0x0F < 0x0A else -1 if b & 0x0F in (0x0B, 0x0D) else 1
+              for b in range(256))
+
+#10 ** n - a field of n bytes holds magnitudes below POWERS_OF_TEN[2n-1]
+POWERS_OF_TEN = tuple(10 ** n for n in range(64))
+
+
+#Return (magnitude, negative) of the packed decimal field
+#raises DecimalException for an invalid digit or sign
+def decimal_operand(field):
+    sign = SIGNS[field[-1]]
+    if sign == 0:
+        raise DecimalException(DATA_EXCEPTION, 'invalid sign')
+    try:
+        magnitude = int(field.hex()[:-1])       #hex() digits a - f are not decimal digits
+    except ValueError:
+        raise DecimalException(DATA_EXCEPTION, 'invalid digit') from None
+    return magnitude, sign < 0
+
+
+#Return the signed value of the packed decimal field
+#raises DecimalException for an invalid digit or sign
+def decimal_value(field):
+    magnitude, negative = decimal_operand(field)
+    return -magnitude if negative else magnitude
+
+
+#Return the numb byte packed decimal field holding magnitude with the preferred sign
+#only the low-order 2*numb-1 digits are kept
+def decimal_field(magnitude, negative, numb):
+    digits = numb * 2 - 1
+    if magnitude >= POWERS_OF_TEN[digits]:
+        magnitude = magnitude % POWERS_OF_TEN[digits]
+    return bytes.fromhex('%0*d%s' % (digits, magnitude, 'D' if negative else 'C'))
+
+
+#Return (numb byte field, condition code) for the signed result of AP, SP or ZAP
+#a zero result is plus, a result too long for the field keeps its low-order digits and sets CC 3
+def decimal_result(value, numb):
+    digits = numb * 2 - 1
+    if value < 0:
+        magnitude, sign, cond_code = -value, 'D', 1
+    else:
+        magnitude, sign, cond_code = value, 'C', 2 if value else 0
+    if magnitude >= POWERS_OF_TEN[digits]:
+        magnitude, cond_code = magnitude % POWERS_OF_TEN[digits], 3
+    return bytes.fromhex('%0*d%s' % (digits, magnitude, sign)), cond_code
+
+
+# -------- #
+# Operations - op1 and op2 are the first and second operand fields
+# -------- #
+
+#Add Packed / Subtract Packed - returns (result, condition code)
+def add_packed(op1, op2, subtract=False):
+    value1 = decimal_value(op1)
+    value2 = decimal_value(op2)
+    return decimal_result(value1 - value2 if subtract else value1 + value2, len(op1))
+
+
+#Zero and Add Packed - only the second operand is checked
+def zero_and_add_packed(op1, op2):
+    return decimal_result(decimal_value(op2), len(op1))
+
+
+#Compare Packed - returns the condition code, minus zero equals plus zero
+def compare_packed(op1, op2):
+    value1 = decimal_value(op1)
+    value2 = decimal_value(op2)
+    return 0 if value1 == value2 else 1 if value1 < value2 else 2
+
+
+#Check the operand lengths of MP and DP
+def check_mp_dp_lengths(op1, op2):
+    if len(op2) > MAX_MP_DP_LENGTH or len(op2) >= len(op1):
+        raise DecimalException(SPECIFICATION_EXCEPTION, 'invalid operand length')
+
+
+#Multiply Packed - the multiplicand must have as many bytes of leftmost zeros as the multiplier
+#has bytes, so the product always fits. Its sign follows the rules of algebra, even for zero
+def multiply_packed(op1, op2):
+    check_mp_dp_lengths(op1, op2)
+    magnitude1, negative1 = decimal_operand(op1)
+    magnitude2, negative2 = decimal_operand(op2)
+    if magnitude1 >= POWERS_OF_TEN[(len(op1) - len(op2)) * 2 - 1]:
+        raise DecimalException(DATA_EXCEPTION, 'multiplicand too long')
+    return decimal_field(magnitude1 * magnitude2, negative1 != negative2, len(op1))
+
+
+#Divide Packed - the quotient followed by the remainder, in the length of the divisor
+#the quotient's sign follows the rules of algebra and the remainder has the sign of the dividend
+def divide_packed(op1, op2):
+    check_mp_dp_lengths(op1, op2)
+    dividend, dividend_negative = decimal_operand(op1)
+    divisor, divisor_negative = decimal_operand(op2)
+    numb = len(op1) - len(op2)
+    if divisor == 0:
+        raise DecimalException(DECIMAL_DIVIDE_EXCEPTION, 'divide by zero')
+    quotient, remainder = divmod(dividend, divisor)
+    if quotient >= POWERS_OF_TEN[numb * 2 - 1]:
+        raise DecimalException(DECIMAL_DIVIDE_EXCEPTION, 'quotient too long')
+    return (decimal_field(quotient, dividend_negative != divisor_negative, numb) +
+            decimal_field(remainder, dividend_negative, len(op2)))
+
+
+#Shift and Round Decimal - shift is the signed number of digits to shift left, rounding
+#the digit added to the last digit shifted out on a right shift. Returns (result, condition code)
+def shift_packed(op1, shift, rounding):
+    magnitude, negative = decimal_operand(op1)
+    if rounding > 9:
+        raise DecimalException(DATA_EXCEPTION, 'invalid rounding digit')
+    if shift >= 0:
+        magnitude = magnitude * POWERS_OF_TEN[shift]
+    else:
+        magnitude = (magnitude // POWERS_OF_TEN[-shift - 1] + rounding) // 10
+    if magnitude >= POWERS_OF_TEN[len(op1) * 2 - 1]:
+        return decimal_field(magnitude, negative, len(op1)), 3
+    if magnitude == 0:
+        return decimal_field(0, False, len(op1)), 0
+    return decimal_field(magnitude, negative, len(op1)), 1 if negative else 2
+
+
+#Convert to Binary - returns the signed value of the 8 byte field and whether it fits in 32 bits
+def convert_to_binary(op2):
+    value = decimal_value(op2)
+    return value, -0x80000000 <= value <= 0x7FFFFFFF
+
+
+#Convert to Decimal - the 8 byte field for the signed 32 bit value
+def convert_to_decimal(value):
+    return decimal_field(abs(value), value < 0, 8)
+
+
+#Pack - the numeric digits of the zoned op2 with the zone of its last byte as the sign,
+#right aligned in numb bytes. Neither operand is checked
+def pack(op2, numb):
+    digits = op2.hex()
+    result = digits[1::2] + digits[-2]
+    return bytes.fromhex(result.rjust(numb * 2, '0')[-numb * 2:])
+
+
+#Unpack - the digits of the packed op2 as zoned decimal (zone F, the sign as the zone of the
+#last byte) right aligned in numb bytes. Neither operand is checked
+def unpack(op2, numb):
+    digits = op2.hex()
+    result = 'f' + 'f'.join(digits[:-2]) + digits[-1] + digits[-2] if len(digits) > 2 else digits[::-1]
+    return bytes.fromhex(('f0' * numb + result)[-numb * 2:])
+
+
+# -------- #
+# Benchmark
+# -------- #
+
+#The operations timed and their operand pairs - 8 to 16 byte fields like the amounts, rates
+#and totals of business arithmetic
+def benchmark_operations():
+    amount = decimal_field(123456789012345, False, 8)
+    total = decimal_field(9876543210987654321098765, True, 16)
+    rate = decimal_field(98765432, False, 5)
+    product = decimal_field(123456789012345, False, 16)
+    return [('AP', add_packed, [(amount, rate), (total, amount)]),
+            ('SP', lambda op1, op2: add_packed(op1, op2, True), [(amount, rate), (total, amount)]),
+            ('ZAP', zero_and_add_packed, [(total, amount), (amount, rate)]),
+            ('CP', compare_packed, [(amount, rate), (total, amount)]),
+            ('MP', multiply_packed, [(product, rate), (product, amount[4:])]),
+            ('DP', divide_packed, [(total, rate), (total, amount)]),
+            ('CVB', lambda op1, op2: convert_to_binary(op2), [(None, decimal_field(1234567, True, 8))]),
+            ('CVD', lambda op1, op2: convert_to_decimal(op2), [(None, -1234567), (None, 2147483647)])]
+
+
+#Time count runs of each operation on each of its operand pairs
+#returns [(name, microseconds per operation)]
+def benchmark(count):
+    results = []
+    for name, operation, operands in benchmark_operations():
+        start = time.perf_counter()
+        for i in range(count):
+            for op1, op2 in operands:
+                operation(op1, op2)
+        results.append((name, (time.perf_counter() - start) * 1e6 / (count * len(operands))))
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='S370Decimal.py',
+                                     description='Time the packed decimal operations on 8 to 16 byte fields.')
+    parser.add_argument('-n', '--count', type=int, default=100000,
+                        help='times to run each operation on each operand pair (default: 100000)')
+    args = parser.parse_args(argv[1:])
+
+    for name, microseconds in benchmark(args.count):
+        print('%-4s %8.3f us' % (name, microseconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
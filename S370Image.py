@@ -0,0 +1,143 @@
+#
+# S370Image - the program image file read by S370BALEmulator
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import struct
+
+
+# A program image holds everything the emulator needs to run a program in one
+# file - it replaces the 3 pickles instrdata.p, sourcecode.p and symdict.p.
+# All integers are big-endian:
+#
+#   header      8s  magic 'S370IMG\0'
+#               H   format version (IMAGE_VERSION)
+#               H   flags (reserved, 0)
+#               I   main storage length in bytes
+#               I   number of source table entries
+#               I   number of symbol table entries
+#               I   entry address - where execution starts (version 2 on)
+#   storage     the raw main storage image
+#   source      per entry: I address, then the source line as a string
+#   symbols     per entry: the symbol name, its address and its length as strings
+#
+# a string is an H byte count followed by the string encoded in UTF-8
+#
+# The source table is keyed by address and is returned as the source_code_dict
+# the emulator uses ({'00000A': "LOOP     MVI   0(R3),C'0'", ...}); the symbol
+# table is returned as symbol_dict ({'AREA1   ': ('0000001C', '00000004'), ...}).
+# A version 1 image has no entry address - its programs start at address 0.
+
+IMAGE_MAGIC = b'S370IMG\0'
+IMAGE_VERSION = 2
+
+#the image file name written by the pre-processors and looked for by the emulator
+IMAGE_FILENAME = 'program.img'
+
+IMAGE_HEADER = struct.Struct('>8sHHIIII')
+IMAGE_HEADER_V1 = struct.Struct('>8sHHIII')
+SOURCE_ADDRESS = struct.Struct('>I')
+STRING_LENGTH = struct.Struct('>H')
+
+
+def pack_string(text):
+    data = text.encode('utf-8')
+    return STRING_LENGTH.pack(len(data)) + data
+
+
+#Return the string at offset of buf and the offset following it
+def unpack_string(buf, offset):
+    numb = STRING_LENGTH.unpack_from(buf, offset)[0]
+    offset = offset + STRING_LENGTH.size
+    if offset + numb > len(buf):
+        raise ValueError('program image is truncated')
+    return str(buf[offset:offset+numb], 'utf-8'), offset + numb
+
+
+#Return the image of storage (a bytes-like object), source_code_dict, symbol_dict
+#and the entry address as bytes
+def build_image(storage, source_code_dict, symbol_dict, entry=0):
+    parts = [IMAGE_HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, 0, len(storage),
+                               len(source_code_dict), len(symbol_dict), entry),
+             bytes(storage)]
+
+    for addr, line in source_code_dict.items():
+        parts.append(SOURCE_ADDRESS.pack(int(addr, 16)))
+        parts.append(pack_string(line))
+
+    for sym, (symloc, symlen) in symbol_dict.items():
+        parts.append(pack_string(sym))
+        parts.append(pack_string(symloc))
+        parts.append(pack_string(symlen))
+
+    return b''.join(parts)
+
+
+#Parse an image - returns (storage, source_code_dict, symbol_dict, entry)
+#raises ValueError if buf is not an image this version can read
+def parse_image(buf):
+    if len(buf) < IMAGE_HEADER_V1.size:
+        raise ValueError('program image is too short')
+    magic, version, flags, storage_len, source_count, symbol_count = IMAGE_HEADER_V1.unpack_from(buf, 0)
+    if magic != IMAGE_MAGIC:
+        raise ValueError('not a program image')
+    if version == 1:
+        entry = 0
+        offset = IMAGE_HEADER_V1.size
+    elif version == IMAGE_VERSION:
+        if len(buf) < IMAGE_HEADER.size:
+            raise ValueError('program image is too short')
+        entry = IMAGE_HEADER.unpack_from(buf, 0)[6]
+        offset = IMAGE_HEADER.size
+    else:
+        raise ValueError('unsupported program image version %d' % version)
+
+    storage = buf[offset:offset+storage_len]
+    if len(storage) != storage_len:
+        raise ValueError('program image is truncated')
+    offset = offset + storage_len
+
+    try:
+        source_code_dict = {}
+        for i in range(source_count):
+            addr = SOURCE_ADDRESS.unpack_from(buf, offset)[0]
+            line, offset = unpack_string(buf, offset + SOURCE_ADDRESS.size)
+            source_code_dict['%06X' % addr] = line
+
+        symbol_dict = {}
+        for i in range(symbol_count):
+            sym, offset = unpack_string(buf, offset)
+            symloc, offset = unpack_string(buf, offset)
+            symlen, offset = unpack_string(buf, offset)
+            symbol_dict[sym] = (symloc, symlen)
+    except struct.error:
+        raise ValueError('program image is truncated')
+
+    return storage, source_code_dict, symbol_dict, entry
+
+
+#Write storage, source_code_dict, symbol_dict and the entry address to the image file filename
+def write_image(filename, storage, source_code_dict, symbol_dict, entry=0):
+    with open(filename, 'wb') as f:
+        f.write(build_image(storage, source_code_dict, symbol_dict, entry))
+
+
+#Read the image file filename with a single read - returns (storage, source_code_dict, symbol_dict, entry)
+def read_image(filename):
+    with open(filename, 'rb') as f:
+        buf = f.read()
+    return parse_image(memoryview(buf))
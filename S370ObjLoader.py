@@ -0,0 +1,197 @@
+#
+# S370ObjLoader - load an S/370 object deck (ESD, TXT, RLD and END card images)
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import struct
+
+
+# An object deck is a sequence of 80 byte EBCDIC card images, as punched by
+# IFOX00 (PARM=DECK) or written to the .OBJ file by the Z390 assembler.
+# Every card starts with X'02' followed by its type in columns 2-4:
+#
+#   ESD  col 11-12 byte count, col 15-16 ESDID of the first item,
+#        col 17-64 up to 3 16 byte items: name(8) type(1) address(3) flag(1) length(3)
+#   TXT  col 6-8 address, col 11-12 byte count, col 15-16 ESDID, col 17-72 the text
+#   RLD  col 11-12 byte count, col 17-72 the relocation items:
+#        relocation ESDID(2) position ESDID(2) - omitted when the previous item's
+#        flag had its last bit on - then flag(1) and address(3) of the address constant
+#   END  col 6-8 entry address (blank if none), col 15-16 ESDID of the entry address
+#
+# A deck copied as text (IND$FILE with CRLF, FTP in ASCII mode) has a record
+# terminator after each card. Every card starts with X'02', so CR and LF bytes
+# between cards are skipped.
+#
+# Each control section is loaded at its assembled address plus origin. The text
+# is copied straight into a bytearray at its address, so an ORG back over earlier
+# text overlays it and any gap (DS areas, alignment) is left as binary zeros.
+# Address constants listed on the RLD cards are then relocated.
+
+CARD_LENGTH = 80
+
+CARD_ESD = b'\x02\xC5\xE2\xC4'     #X'02' 'ESD'
+CARD_TXT = b'\x02\xE3\xE7\xE3'     #X'02' 'TXT'
+CARD_RLD = b'\x02\xD9\xD3\xC4'     #X'02' 'RLD'
+CARD_END = b'\x02\xC5\xD5\xC4'     #X'02' 'END'
+
+#ESD item types
+ESD_SD = 0x00      #section definition
+ESD_LD = 0x01      #label definition - does not take an ESDID
+ESD_ER = 0x02      #external reference
+ESD_PC = 0x04      #private code (unnamed section)
+ESD_CM = 0x05      #common
+ESD_XD = 0x06      #external dummy section
+ESD_WX = 0x0A      #weak external reference
+
+CARD_ADDRESS = struct.Struct('>5x3s2xH2xH')      #address, byte count and ESDID of an ESD/TXT/END card
+ESD_ITEM = struct.Struct('>8sB3sB3s')
+RLD_IDS = struct.Struct('>HH')
+RLD_ITEM = struct.Struct('>B3s')
+
+BLANK_ADDRESS = b'\x40\x40\x40'
+
+#CR and LF - the record terminators skipped between cards
+RECORD_TERMINATORS = frozenset(b'\r\n')
+
+
+def int24(b):
+    return int.from_bytes(b, 'big')
+
+
+#Split data into its 80 byte cards, skipping record terminators between them
+#raises ValueError if the last card is short
+def split_cards(data):
+    cards = []
+    offset = 0
+    while offset < len(data):
+        if data[offset] in RECORD_TERMINATORS:
+            offset = offset + 1
+            continue
+        card = data[offset:offset+CARD_LENGTH]
+        if len(card) != CARD_LENGTH:
+            raise ValueError('object deck ends with a card of %d bytes' % len(card))
+        cards.append(card)
+        offset = offset + CARD_LENGTH
+    return cards
+
+
+#Load the object deck in data (a bytes-like object) with its sections relocated by origin
+#returns (storage, symbols, entry) - storage is a bytearray, symbols maps each section,
+#label and common name to its loaded address and entry is the END card entry address or None
+#raises ValueError if data is not an object deck
+def read_object_deck(data, origin=0):
+    cards = split_cards(data)
+
+    esd_types = {}         #ESDID -> ESD type
+    esd_names = {}         #ESDID -> name of an external reference
+    relocation = {}        #ESDID -> relocation factor of a section
+    symbols = {}           #name -> loaded address
+    commons = []           #(ESDID, name, length) of common sections - allocated after the text
+    storage_len = 0
+
+    #pass 1 - the external symbol dictionary
+    for card in cards:
+        if card[0:4] != CARD_ESD:
+            continue
+        address, numb, esdid = CARD_ADDRESS.unpack_from(card)
+        for offset in range(16, 16 + numb, ESD_ITEM.size):
+            name, esd_type, address, flag, length = ESD_ITEM.unpack_from(card, offset)
+            name = name.decode('cp037').rstrip()
+            address = int24(address)
+            if esd_type == ESD_LD:
+                symbols[name] = address + origin
+                continue
+            esd_types[esdid] = esd_type
+            if esd_type in (ESD_SD, ESD_PC):
+                relocation[esdid] = origin
+                storage_len = max(storage_len, address + int24(length) + origin)
+                if esd_type == ESD_SD:
+                    symbols[name] = address + origin
+            elif esd_type == ESD_CM:
+                commons.append((esdid, name, int24(length)))
+            else:
+                esd_names[esdid] = name
+            esdid = esdid + 1
+
+    #pass 2 - the text
+    storage = bytearray(storage_len)
+    for card in cards:
+        if card[0:4] != CARD_TXT:
+            continue
+        address, numb, esdid = CARD_ADDRESS.unpack_from(card)
+        address = int24(address) + relocation.get(esdid, origin)
+        end = address + numb
+        if end > len(storage):
+            storage.extend(bytes(end - len(storage)))
+        storage[address:end] = card[16:16+numb]
+
+    #common sections go after the text on a doubleword boundary
+    for esdid, name, length in commons:
+        address = (len(storage) + 7) & ~7
+        storage.extend(bytes(address + length - len(storage)))
+        relocation[esdid] = address
+        symbols[name] = address
+
+    #pass 3 - the relocation dictionary
+    for card in cards:
+        if card[0:4] != CARD_RLD:
+            continue
+        numb = CARD_ADDRESS.unpack_from(card)[1]
+        offset = 16
+        same_ids = False
+        while offset < 16 + numb:
+            if not same_ids:
+                relocation_id, position_id = RLD_IDS.unpack_from(card, offset)
+                offset = offset + RLD_IDS.size
+            flag, address = RLD_ITEM.unpack_from(card, offset)
+            offset = offset + RLD_ITEM.size
+            same_ids = flag & 0x01
+
+            if relocation_id in relocation:
+                value = relocation[relocation_id]
+            elif esd_names.get(relocation_id) in symbols:
+                value = symbols[esd_names[relocation_id]]
+            else:
+                continue    #unresolved external reference - leave the constant as assembled
+
+            length = ((flag >> 2) & 0x03) + 1
+            mask = (1 << (length * 8)) - 1
+            position = int24(address) + relocation.get(position_id, origin)
+            constant = int.from_bytes(storage[position:position+length], 'big')
+            if flag & 0x02:
+                constant = constant - value
+            else:
+                constant = constant + value
+            storage[position:position+length] = (constant & mask).to_bytes(length, 'big')
+
+    #the END card entry address
+    entry = None
+    for card in cards:
+        if card[0:4] == CARD_END:
+            if card[5:8] != BLANK_ADDRESS:
+                address, numb, esdid = CARD_ADDRESS.unpack_from(card)
+                entry = int24(address) + relocation.get(esdid, origin)
+            break
+
+    return storage, symbols, entry
+
+
+#Read and load the object deck file filename - returns (storage, symbols, entry)
+def load_object_file(filename, origin=0):
+    with open(filename, 'rb') as f:
+        data = f.read()
+    return read_object_deck(data, origin)
@@ -0,0 +1,565 @@
+#
+# test_S370BALEmulator - tests for the S370BALEmulator instruction routines
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#   python -m pytest test_S370BALEmulator.py
+#
+
+import io
+import os
+import time
+import random
+
+import pytest
+
+from S370BALEmulator import (Machine, signed32, signed64, unsigned32, unsigned64, cvthex2int,
+                              shift_left_arithmetic, shift_right_arithmetic, MAX_BLOCK_DROPS,
+                              parse_breakpoint_register, COMPARE_COPY_LIMIT)
+from S370Image import IMAGE_HEADER_V1, IMAGE_MAGIC, write_image
+from S370ObjLoader import CARD_LENGTH, load_object_file
+
+SAMPLE_DECK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SampleZ390test.OBJ')
+
+
+#Run code followed by a 'BR    14' - data is a list of (address, bytes) stored first and
+#regs a dictionary of register values. Returns the machine once the program has ended
+def run_program(code, data=(), regs=None):
+    program = bytearray(0x400)
+    program[:len(code) + 2] = code + b'\x07\xFE'
+    for addr, field in data:
+        program[addr:addr + len(field)] = field
+    machine = Machine(out=io.StringIO())
+    machine.load(program)
+    for r, value in (regs or {}).items():
+        machine.regs[r] = value
+    machine.run()
+    assert machine.abend_code is None
+    return machine
+
+
+#An RS instruction with base register 0, so the displacement is the address (or shift count)
+def rs_instruction(oc, r1, r3, d2):
+    return bytes([oc, r1 << 4 | r3, d2 >> 8, d2 & 0xFF])
+
+
+#An SS instruction with base register 0, so the displacements are the addresses
+def ss_instruction(oc, ll, d1, d2):
+    return bytes([oc, ll, d1 >> 8, d1 & 0xFF, d2 >> 8, d2 & 0xFF])
+
+
+# -------- #
+# Two's complement conversion layer
+# -------- #
+
+#The bit string formulas the conversion layer replaced - the hex string of a negative
+#value has its bits flipped and 1 added. The old test for a negative string left out
+#the first digit '9', which is a negative value too, so it is included here
+def old_cvthex2int(x):
+    if x[0] not in '89ABCDEF':
+        return int(x, 16)
+    b = bin(int(x, 16))[2:]
+    num1 = ''.join('1' if bit == '0' else '0' for bit in b)
+    return (int(num1, 2) + 1) * -1
+
+
+def old_cvtint2hex(x, numb=32):
+    if x >= 0:
+        return hex(x)[2:].rjust(numb // 4, '0').upper()
+    t = bin(x)[3:]
+    b = '0' * (numb - len(t)) + t
+    num1 = ''.join('1' if bit == '0' else '0' for bit in b)
+    return hex(int(num1, 2) + 1)[2:].upper()
+
+
+BOUNDARIES_32 = [0, 1, 2, 0x7FFFFFFE, 0x7FFFFFFF, 0x80000000, 0x80000001, 0x90000000,
+                 0xFFFFFFFE, 0xFFFFFFFF]
+BOUNDARIES_64 = [0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, 0x100000000, 0x7FFFFFFFFFFFFFFF,
+                 0x8000000000000000, 0x8000000000000001, 0xFFFFFFFFFFFFFFFE, 0xFFFFFFFFFFFFFFFF]
+
+
+#The unsigned bit patterns tested - the boundaries and random values of numb bits
+def patterns(boundaries, numb, count=2000):
+    rng = random.Random(numb)
+    return boundaries + [rng.getrandbits(numb) for i in range(count)]
+
+
+def test_signed32_matches_bit_string_formula():
+    for x in patterns(BOUNDARIES_32, 32):
+        assert signed32(x) == old_cvthex2int('%08X' % x)
+        assert cvthex2int('%08X' % x) == signed32(x)
+
+
+def test_signed64_matches_bit_string_formula():
+    for x in patterns(BOUNDARIES_64, 64):
+        assert signed64(x) == old_cvthex2int('%016X' % x)
+        assert cvthex2int('%016X' % x) == signed64(x)
+
+
+def test_unsigned32_matches_bit_string_formula():
+    for x in patterns(BOUNDARIES_32, 32) + [-1, -2, -0x7FFFFFFF, -0x80000000]:
+        value = signed32(x)
+        assert unsigned32(value) == int(old_cvtint2hex(value), 16)
+        assert unsigned32(value) == x & 0xFFFFFFFF
+
+
+def test_unsigned64_matches_bit_string_formula():
+    for x in patterns(BOUNDARIES_64, 64) + [-1, -2, -0x7FFFFFFFFFFFFFFF, -0x8000000000000000]:
+        value = signed64(x)
+        assert unsigned64(value) == int(old_cvtint2hex(value, 64), 16)
+        assert unsigned64(value) == x & 0xFFFFFFFFFFFFFFFF
+
+
+def test_signed_unsigned_round_trip():
+    for value in (0, 1, -1, 0x7FFFFFFF, -0x80000000):
+        assert signed32(unsigned32(value)) == value
+    for value in (0, 1, -1, 0x7FFFFFFFFFFFFFFF, -0x8000000000000000):
+        assert signed64(unsigned64(value)) == value
+    #results that overflow wrap around
+    assert signed32(0x7FFFFFFF + 1) == -0x80000000
+    assert signed64(-0x8000000000000000 - 1) == 0x7FFFFFFFFFFFFFFF
+
+
+def test_cvthex2int_halfword():
+    assert cvthex2int('0000') == 0
+    assert cvthex2int('7FFF') == 0x7FFF
+    assert cvthex2int('8000') == -0x8000
+    assert cvthex2int('FFFD') == -3
+
+
+# -------- #
+# ED / EDMK
+# -------- #
+
+PATTERN = 0x100
+SOURCE = 0x200
+
+
+#Edit the packed source with pattern - returns (result, condition code, R1)
+def edit(pattern, source, oc=0xDE, r1=0x12000000):
+    machine = run_program(ss_instruction(oc, len(pattern) - 1, PATTERN, SOURCE),
+                          [(PATTERN, bytes(pattern)), (SOURCE, bytes(source))], {1: r1})
+    return bytes(machine.storage[PATTERN:PATTERN + len(pattern)]), machine.cond_code, machine.regs[1]
+
+
+#fill ' ', digit selectors, ',' and '.' message bytes, significance starter and '-'
+AMOUNT_PATTERN = [0x40, 0x20, 0x20, 0x6B, 0x20, 0x21, 0x20, 0x4B, 0x20, 0x20, 0x60]
+
+
+def test_ed_fill_and_digit_selectors():
+    result, cc, r1 = edit(AMOUNT_PATTERN, [0x01, 0x23, 0x45, 0x6D])
+    assert result == bytes([0x40, 0x40, 0xF1, 0x6B, 0xF2, 0xF3, 0xF4, 0x4B, 0xF5, 0xF6, 0x60])
+    assert cc == 1
+    assert r1 == 0x12000000
+
+
+def test_ed_plus_sign_replaces_message_bytes_with_fill():
+    result, cc, r1 = edit(AMOUNT_PATTERN, [0x01, 0x23, 0x45, 0x6C])
+    assert result == bytes([0x40, 0x40, 0xF1, 0x6B, 0xF2, 0xF3, 0xF4, 0x4B, 0xF5, 0xF6, 0x40])
+    assert cc == 2
+
+
+def test_ed_sign_controls_credit_message():
+    pattern = [0x5C, 0x20, 0x20, 0x20, 0x40, 0xC3, 0xD9]       #fill '*', 3 digits, ' CR'
+    assert edit(pattern, [0x01, 0x2D])[0] == bytes([0x5C, 0x5C, 0xF1, 0xF2, 0x40, 0xC3, 0xD9])
+    assert edit(pattern, [0x01, 0x2C])[0] == bytes([0x5C, 0x5C, 0xF1, 0xF2, 0x5C, 0x5C, 0x5C])
+
+
+def test_ed_significance_starter_with_zero_source():
+    result, cc, r1 = edit([0x40, 0x20, 0x21, 0x20, 0x4B, 0x20, 0x20], [0x00, 0x00, 0x0C])
+    assert result == bytes([0x40, 0x40, 0x40, 0xF0, 0x4B, 0xF0, 0xF0])
+    assert cc == 0
+
+
+def test_ed_field_separator_resets_significance():
+    #without the reset the zeros after the separator would be F0
+    result, cc, r1 = edit([0x40, 0x20, 0x20, 0x22, 0x20, 0x20, 0x20], [0x01, 0x00, 0x5D])
+    assert result == bytes([0x40, 0x40, 0xF1, 0x40, 0x40, 0x40, 0xF5])
+    assert cc == 1
+
+
+def test_ed_condition_code_is_for_the_last_field():
+    pattern = [0x40, 0x20, 0x20, 0x22, 0x20, 0x20, 0x20]
+    assert edit(pattern, [0x01, 0x00, 0x0D])[1] == 0
+    assert edit(pattern, [0x00, 0x00, 0x5C])[1] == 2
+
+
+def test_edmk_records_first_significant_digit():
+    result, cc, r1 = edit(AMOUNT_PATTERN, [0x01, 0x23, 0x45, 0x6D], oc=0xDF)
+    assert r1 == 0x12000000 | (PATTERN + 2)
+    #a nonzero digit followed by a plus sign is significant too
+    result, cc, r1 = edit([0x40, 0x20, 0x20, 0x20], [0x00, 0x5C], oc=0xDF)
+    assert result == bytes([0x40, 0x40, 0x40, 0xF5])
+    assert r1 == 0x12000000 | (PATTERN + 3)
+
+
+def test_edmk_leaves_r1_when_no_digit_is_significant():
+    #all zeros
+    result, cc, r1 = edit([0x40, 0x20, 0x21, 0x20, 0x4B, 0x20, 0x20], [0x00, 0x00, 0x0C], oc=0xDF)
+    assert r1 == 0x12000000
+    #significance turned on by the significance starter before the nonzero digits
+    result, cc, r1 = edit([0x40, 0x21, 0x20, 0x20], [0x01, 0x2C], oc=0xDF)
+    assert result == bytes([0x40, 0x40, 0xF1, 0xF2])
+    assert r1 == 0x12000000
+
+
+def test_ed_invalid_digit_is_a_data_exception():
+    machine = Machine(out=io.StringIO())
+    program = bytearray(0x400)
+    program[:6] = ss_instruction(0xDE, 2, PATTERN, SOURCE)
+    program[PATTERN:PATTERN + 3] = bytes([0x40, 0x20, 0x20])
+    program[SOURCE:SOURCE + 2] = bytes([0xA1, 0x2C])
+    machine.load(program)
+    machine.run()
+    assert machine.abend_code == 'S0C7'
+
+
+# -------- #
+# Packed decimal
+# -------- #
+
+FIELD1 = 0x100
+FIELD2 = 0x200
+
+
+#The numb byte packed decimal field holding value with the preferred sign
+def packed(value, numb):
+    return bytes.fromhex('%0*d%s' % (numb * 2 - 1, abs(value), 'D' if value < 0 else 'C'))
+
+
+#The decimal instruction oc with op1 at FIELD1 and op2 at FIELD2
+def decimal_instruction(oc, op1, op2):
+    return ss_instruction(oc, (len(op1) - 1) << 4 | (len(op2) - 1), FIELD1, FIELD2)
+
+
+#Run the decimal instruction oc - returns (first operand after it, condition code)
+def decimal(oc, op1, op2):
+    machine = run_program(decimal_instruction(oc, op1, op2), [(FIELD1, op1), (FIELD2, op2)])
+    return bytes(machine.storage[FIELD1:FIELD1 + len(op1)]), machine.cond_code
+
+
+#Run the decimal instruction oc - returns the abend code
+def decimal_abend(oc, op1, op2):
+    program = bytearray(0x400)
+    program[:6] = decimal_instruction(oc, op1, op2)
+    program[FIELD1:FIELD1 + len(op1)] = op1
+    program[FIELD2:FIELD2 + len(op2)] = op2
+    machine = Machine(out=io.StringIO())
+    machine.load(program)
+    machine.run()
+    return machine.abend_code
+
+
+#SRP of op1 by shift digits (negative to the right) with the rounding digit
+def shift_and_round(op1, shift, rounding):
+    machine = run_program(ss_instruction(0xF0, (len(op1) - 1) << 4 | rounding, FIELD1, shift & 0x3F),
+                          [(FIELD1, op1)])
+    return bytes(machine.storage[FIELD1:FIELD1 + len(op1)]), machine.cond_code
+
+
+def test_decimal_overflow_keeps_low_order_digits_and_sets_cc3():
+    assert decimal(0xFA, packed(999, 2), packed(1, 2)) == (packed(0, 2), 3)          #AP
+    assert decimal(0xFB, packed(-999, 2), packed(1, 2)) == (bytes.fromhex('000D'), 3)    #SP
+    assert decimal(0xF8, packed(0, 2), packed(12345, 3)) == (packed(345, 2), 3)       #ZAP
+
+
+def test_decimal_invalid_digit_or_sign_is_a_data_exception():
+    assert decimal_abend(0xFA, packed(1, 2), bytes([0xA1, 0x2C])) == 'S0C7'          #digit
+    assert decimal_abend(0xFA, packed(1, 2), bytes([0x01, 0x23])) == 'S0C7'          #sign
+    assert decimal_abend(0xF9, bytes([0x01, 0x23]), packed(1, 2)) == 'S0C7'          #CP op1
+    assert decimal_abend(0xFD, packed(10, 4), bytes([0x01, 0x2F, 0x3C])) == 'S0C7'   #DP
+
+
+def test_decimal_31_digit_operands():
+    nines = 10 ** 31 - 1
+    assert decimal(0xFA, packed(1234567890123456789012345678901, 16),
+                   packed(8765432109876543210987654321098, 16)) == (packed(nines, 16), 2)
+    assert decimal(0xFA, packed(nines, 16), packed(1, 16)) == (packed(0, 16), 3)
+    assert decimal(0xF9, packed(nines, 16), packed(nines - 1, 16))[1] == 2           #CP
+    #MP of 15 digits by 15 digits and DP of the 30 digit product back again
+    product = 999999999999999 * 999999999999999
+    assert decimal(0xFC, packed(999999999999999, 16), packed(-999999999999999, 8))[0] == packed(-product, 16)
+    result = packed(999999999999999, 8) + packed(5, 8)     #quotient and remainder
+    assert decimal(0xFD, packed(product + 5, 16), packed(999999999999999, 8))[0] == result
+
+
+def test_dp_divide_exception():
+    assert decimal_abend(0xFD, packed(100, 4), packed(0, 2)) == 'S0CB'              #divide by zero
+    assert decimal_abend(0xFD, packed(1000000, 4), packed(1, 2)) == 'S0CB'          #quotient too long
+    assert decimal_abend(0xFD, packed(100, 2), packed(1, 2)) == 'S0C6'              #L2 not below L1
+
+
+def test_dp_remainder_has_the_sign_of_the_dividend():
+    assert decimal(0xFD, packed(-17, 4), packed(5, 2))[0] == packed(-3, 2) + packed(-2, 2)
+    assert decimal(0xFD, packed(17, 4), packed(-5, 2))[0] == packed(-3, 2) + packed(2, 2)
+    assert decimal(0xFD, packed(-17, 4), packed(-5, 2))[0] == packed(3, 2) + packed(-2, 2)
+
+
+def test_srp_rounding():
+    assert shift_and_round(packed(12345, 3), -1, 5) == (packed(1235, 3), 2)
+    assert shift_and_round(packed(12344, 3), -1, 5) == (packed(1234, 3), 2)
+    assert shift_and_round(packed(12345, 3), -1, 0) == (packed(1234, 3), 2)
+    assert shift_and_round(packed(-12350, 3), -2, 5) == (packed(-124, 3), 1)
+    assert shift_and_round(packed(4, 3), -1, 5) == (packed(0, 3), 0)
+    assert shift_and_round(packed(12345, 3), 2, 0) == (packed(34500, 3), 3)
+    #the largest right shift, 32 digits
+    assert shift_and_round(packed(10 ** 31 - 1, 16), -32, 5) == (packed(0, 16), 0)
+
+
+# -------- #
+# Arithmetic shifts
+# -------- #
+
+#The bit list formulas the integer shifts replaced - returns (result, condition code)
+def bit_list_shift(value, shift, numb, left):
+    bits = [(value >> (numb - 1 - i)) & 1 for i in range(numb)]
+    sign, numeric = bits[0], bits[1:]
+    overflow = False
+    for i in range(shift):
+        if left:
+            if numeric.pop(0) != sign:
+                overflow = True
+            numeric.append(0)
+        else:
+            numeric.pop()
+            numeric.insert(0, sign)
+    result = int(''.join(str(bit) for bit in [sign] + numeric), 2)
+    if overflow:
+        return result, 3
+    return result, 0 if result == 0 else 1 if sign else 2
+
+
+SHIFT_VALUES_32 = [0, 1, 0x40000000, 0x7FFFFFFF, 0x80000000, 0x80000001, 0xC0000000, 0xFFFFFFFF]
+SHIFT_VALUES_64 = [0, 1, 0x4000000000000000, 0x7FFFFFFFFFFFFFFF, 0x8000000000000000,
+                   0xC000000000000000, 0xFFFFFFFFFFFFFFFF, 0x00000000FFFFFFFF]
+
+
+def test_shifts_match_bit_list_formula():
+    rng = random.Random(19)
+    for numb, values in ((32, SHIFT_VALUES_32), (64, SHIFT_VALUES_64)):
+        values = values + [rng.getrandbits(numb) for i in range(50)]
+        for value in values:
+            for shift in range(64):
+                assert shift_left_arithmetic(value, shift, numb) == bit_list_shift(value, shift, numb, True)
+                assert shift_right_arithmetic(value, shift, numb) == bit_list_shift(value, shift, numb, False)
+
+
+#Run the shift instruction oc on R2 (and R3) - returns (registers, condition code)
+def shift(oc, count, r2, r3=0):
+    machine = run_program(rs_instruction(oc, 2, 0, count), regs={2: r2, 3: r3})
+    return machine.regs[2:4], machine.cond_code
+
+
+SLA, SRA, SLDA, SRDA = 0x8B, 0x8A, 0x8F, 0x8E
+
+
+def test_sla_overflow_sets_cc3_and_keeps_sign():
+    assert shift(SLA, 1, 0x40000000) == ([0x00000000, 0], 3)
+    assert shift(SLA, 1, 0x80000001) == ([0x80000002, 0], 3)
+    assert shift(SLA, 4, 0xFFFFFFFF) == ([0xFFFFFFF0, 0], 1)
+    assert shift(SLA, 3, 0x00000005) == ([0x00000028, 0], 2)
+    assert shift(SLA, 0, 0x00000000) == ([0x00000000, 0], 0)
+
+
+def test_sra_propagates_sign():
+    assert shift(SRA, 31, 0x80000000) == ([0xFFFFFFFF, 0], 1)
+    assert shift(SRA, 63, 0x7FFFFFFF) == ([0x00000000, 0], 0)
+    assert shift(SRA, 2, 0x00000010) == ([0x00000004, 0], 2)
+
+
+def test_shift_count_is_low_6_bits_of_address():
+    assert shift(SLA, 0x41, 0x00000001) == ([0x00000002, 0], 2)
+
+
+def test_double_shifts_use_register_pair():
+    assert shift(SLDA, 1, 0x00000000, 0x80000000) == ([0x00000001, 0x00000000], 2)
+    assert shift(SLDA, 1, 0x40000000, 0x00000000) == ([0x00000000, 0x00000000], 3)
+    assert shift(SLDA, 8, 0xFFFFFFFF, 0xFFFFFF00) == ([0xFFFFFFFF, 0xFFFF0000], 1)
+    assert shift(SRDA, 63, 0x80000000, 0x00000000) == ([0xFFFFFFFF, 0xFFFFFFFF], 1)
+    assert shift(SRDA, 32, 0x00000001, 0x00000000) == ([0x00000000, 0x00000001], 2)
+
+
+# -------- #
+# Limits
+# -------- #
+
+#Run program with a time limit of seconds - returns (machine, wall clock seconds)
+def run_with_time_limit(program, seconds):
+    machine = Machine(out=io.StringIO(), max_seconds=seconds)
+    machine.load(program)
+    start = time.perf_counter()
+    machine.run()
+    return machine, time.perf_counter() - start
+
+
+def test_time_limit_cuts_sleep_short():
+    #LOOP LA R0,1000 / SVC 250 / B LOOP - each sleep would take a second
+    machine, seconds = run_with_time_limit(bytes.fromhex('410003E8' '0AFA' '47F00000'), 0.2)
+    assert machine.abend_code == 'S322'
+    assert seconds < 0.5
+
+
+def test_time_limit_with_short_sleeps():
+    #LOOP LA R0,5 / SVC 250 / B LOOP - 10000 instructions would take over 15 seconds
+    machine, seconds = run_with_time_limit(bytes.fromhex('41000005' '0AFA' '47F00000'), 0.2)
+    assert machine.abend_code == 'S322'
+    assert seconds < 0.5
+
+
+def test_time_limit_in_tight_loop():
+    machine, seconds = run_with_time_limit(bytes.fromhex('47F00000'), 0.2)
+    assert machine.abend_code == 'S322'
+    assert seconds < 0.5
+
+
+# -------- #
+# CLCL
+# -------- #
+
+#CLCL R2,R4 of op1 with op2 padded with pad - returns (condition code, R2 - R5)
+def compare_long(op1, op2, pad=0x40):
+    addr1, addr2 = 0x100, 0x100 + len(op1)
+    machine = Machine(out=io.StringIO())
+    machine.load(bytes.fromhex('0F24' '07FE') + bytes(0xFC) + op1 + op2)
+    machine.regs[2:6] = [addr1, len(op1), addr2, pad << 24 | len(op2)]
+    machine.run()
+    return machine.cond_code, machine.regs[2:6]
+
+
+def test_clcl_long_operands_are_compared_in_place():
+    numb = COMPARE_COPY_LIMIT * 5 + 3
+    field = bytes(random.Random(1).randrange(256) for _ in range(numb))
+    assert compare_long(field, field)[0] == 0
+    for at in (0, COMPARE_COPY_LIMIT + 1, numb - 1):
+        op2 = bytearray(field)
+        op2[at] = field[at] ^ 0x80
+        cc, regs = compare_long(field, bytes(op2))
+        assert cc == (1 if field[at] < op2[at] else 2)
+        assert regs == [0x100 + at, numb - at, 0x100 + numb + at, 0x40000000 | numb - at]
+
+
+def test_clcl_long_padding():
+    numb = COMPARE_COPY_LIMIT * 3
+    assert compare_long(b'AB' + b'\x40' * numb, b'AB')[0] == 0
+    cc, regs = compare_long(b'AB' + b'\x40' * numb + b'\x41', b'AB')
+    assert cc == 2
+    assert regs == [0x100 + numb + 2, 1, 0x100 + numb + 5, 0x40000000]
+    assert compare_long(b'AB', b'AB' + b'\x40' * numb + b'\x00')[0] == 2
+
+def test_self_modifying_loop_is_left_to_the_interpreter():
+    #LA R4,1000 / LOOP STC R4,LA+3 / LA LA R6,0 / AR R7,R6 / BCT R4,LOOP - each pass stores
+    #the low byte of the count into the displacement of the LA
+    program = bytes.fromhex('414003E8' '4240000B' '41600000' '1A76' '46400004')
+    expected = 7 + sum(count & 0xFF for count in range(1, 1001))
+    for translate in (True, False):
+        machine = Machine(out=io.StringIO(), translate=translate)
+        machine.load(program + b'\x07\xFE')
+        machine.run()
+        assert machine.regs[7] == expected
+        assert all(len(starts) == 1 for starts in machine.block_map.values())
+        assert 4 not in machine.blocks
+        if translate:
+            assert machine.block_drops[4] == MAX_BLOCK_DROPS
+
+
+# -------- #
+# TR / TRT tables
+# -------- #
+
+def test_store_into_translate_table_is_seen_by_next_tr():
+    #TR 0x100(4),TABLE / MVI TABLE+1,X'AA' / TR 0x104(4),TABLE
+    code = (ss_instruction(0xDC, 3, 0x100, 0x300) + bytes.fromhex('92AA0301') +
+            ss_instruction(0xDC, 3, 0x104, 0x300))
+    machine = run_program(code, [(0x100, bytes([1, 2, 1, 2, 1, 2, 1, 2])), (0x300, bytes(range(256)))])
+    assert bytes(machine.storage[0x100:0x108]) == bytes([1, 2, 1, 2, 0xAA, 2, 0xAA, 2])
+    #the table does not widen the range of cached code
+    assert machine.decode_cache_high < 0x100
+
+
+# -------- #
+# Superinstructions
+# -------- #
+
+def test_storage_clears_are_fused():
+    #LA R4,3 / LOOP XC 0x100(16),0x100 / MVI 0x200,C'*' / MVC 0x201(15),0x200 / BCT R4,LOOP
+    program = bytearray(0x400)
+    program[:24] = (bytes.fromhex('41400003') + ss_instruction(0xD7, 15, 0x100, 0x100) + bytes.fromhex('925C0200') +
+                    ss_instruction(0xD2, 14, 0x201, 0x200) + bytes.fromhex('46400004'))
+    program[24:26] = b'\x07\xFE'
+    program[0x100:0x110] = bytes(range(1, 17))
+    for fuse in (True, False):
+        machine = Machine(out=io.StringIO(), translate=False, fuse=fuse)
+        machine.load(program)
+        machine.run()
+        assert bytes(machine.storage[0x100:0x110]) == bytes(16)
+        assert bytes(machine.storage[0x200:0x210]) == b'\x5C' * 16
+        assert machine.cond_code == 0
+        counts = machine.fusion_counts()
+        assert (counts['XC_CLEAR'], counts['MVC_FILL']) == ((3, 3) if fuse else (0, 0))
+
+def test_debug_output_is_kept_for_the_whole_run():
+    #LA R0,5 / SVC 254 / LA R0,255 / SVC 253 - the debugger shows it when the run stops
+    machine = Machine(out=io.StringIO(), debug=True)
+    machine.load(bytes.fromhex('41000005' '0AFE' '410000FF' '0AFD' '07FE'))
+    machine.run()
+    assert machine.term_output == '5 000000FF '
+    assert machine.out.getvalue().startswith('5\n000000FF\n')
+
+
+def test_no_debug_output_is_kept_without_the_debugger():
+    machine = run_program(bytes.fromhex('41000005' '0AFE'))
+    assert machine.term_output == ''
+    assert machine.out.getvalue().startswith('5\n')
+
+
+# -------- #
+# Object decks and program images
+# -------- #
+
+def test_object_deck_with_record_terminators(tmp_path):
+    with open(SAMPLE_DECK, 'rb') as f:
+        deck = f.read()
+    cards = [deck[i:i+CARD_LENGTH] for i in range(0, len(deck), CARD_LENGTH)]
+    for terminator in (b'\r\n', b'\n'):
+        copy = tmp_path / ('copy%d.OBJ' % len(terminator))
+        copy.write_bytes(b''.join(card + terminator for card in cards))
+        assert load_object_file(str(copy)) == load_object_file(SAMPLE_DECK)
+
+
+def test_image_keeps_the_entry_address(tmp_path):
+    storage = bytes.fromhex('47F00008' '07FE' '07FE')
+    image = str(tmp_path / 'program.img')
+    write_image(image, storage, {}, {}, entry=4)
+    machine = Machine(out=io.StringIO())
+    machine.load_image(image)
+    assert machine.program_counter == 4
+    #a version 1 image has no entry address
+    with open(image, 'wb') as f:
+        f.write(IMAGE_HEADER_V1.pack(IMAGE_MAGIC, 1, 0, len(storage), 0, 0) + storage)
+    machine.load_image(image)
+    assert machine.program_counter == 0
+
+
+# -------- #
+# Debugger commands
+# -------- #
+
+def test_breakpoint_register_is_one_hex_digit():
+    assert parse_breakpoint_register('0') == 0
+    assert parse_breakpoint_register('F') == 15
+    for text in ('10', '1F', '', '-1'):
+        with pytest.raises(ValueError):
+            parse_breakpoint_register(text)
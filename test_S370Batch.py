@@ -0,0 +1,33 @@
+#
+# test_S370Batch - tests for the S370Batch batch runner
+#
+# This file is part of the S370BALEmulator distribution.
+# Copyright (c) 2024 James Salvino.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#   python -m pytest test_S370Batch.py
+#
+
+import os
+
+from S370Batch import run_job
+
+
+#A program given by a bare file name is loaded from the current directory
+def test_run_job_relative_file_name(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    result = run_job('SampleZ390test.OBJ', max_instructions=100000)
+    assert result['completion'] == 'Normal Program End'
+    assert result['output'].startswith('EQUAL')
+    assert os.getcwd() == os.path.dirname(os.path.abspath(__file__))